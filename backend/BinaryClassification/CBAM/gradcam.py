@@ -48,8 +48,10 @@ class GradCAM:
         activations = self.activations[0] * pooled_grads[:, None, None]  # [C, H, W]
 
         # Compute heatmap
-        heatmap = torch.relu(torch.sum(activations, dim=0))  # [H, W]
-        heatmap /= torch.max(heatmap)
+        heatmap = torch.relu(torch.sum(activations, dim=0)).detach()  # [H, W]
+        max_val = torch.max(heatmap)
+        if max_val > 0:
+            heatmap /= max_val
         heatmap = heatmap.cpu().numpy()  # convert to NumPy for OpenCV
 
         return heatmap
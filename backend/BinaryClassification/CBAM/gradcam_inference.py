@@ -20,10 +20,11 @@ DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 # HYPERPARAMETERS
 FRAME_INTERVAL = 1
 THRESHOLD = 0.5
+INPUT_SIZE = (512, 384)  # (height, width); training resolution, smaller is faster on CPU
 
 # Define transforms (same as used during training)
 transform = transforms.Compose([
-    transforms.Resize((512, 384)),
+    transforms.Resize(INPUT_SIZE),
     transforms.ToTensor(),
     transforms.Normalize(mean=[0.485, 0.456, 0.406], 
                          std=[0.229, 0.224, 0.225])
@@ -262,13 +262,13 @@ def resnet101_cbam(pretrained=False, **kwargs):
         pretrained (bool): If True, returns a model pre-trained on ImageNet
     """
     model = ResNet(Bottleneck, [3, 4, 23, 3], **kwargs)
-    
-    pretrained_state_dict = model_zoo.load_url(model_urls['resnet101'])
-    now_state_dict      = model.state_dict()
-    for k in pretrained_state_dict.keys():
-        if k in now_state_dict:
-            now_state_dict[k] = pretrained_state_dict[k]
-    model.load_state_dict(now_state_dict)
+    if pretrained:
+        pretrained_state_dict = model_zoo.load_url(model_urls['resnet101'])
+        now_state_dict      = model.state_dict()
+        for k in pretrained_state_dict.keys():
+            if k in now_state_dict:
+                now_state_dict[k] = pretrained_state_dict[k]
+        model.load_state_dict(now_state_dict)
     return model
 
 
@@ -285,3 +285,37 @@ def resnet152_cbam(pretrained=False, **kwargs):
         now_state_dict.update(pretrained_state_dict)
         model.load_state_dict(now_state_dict)
     return model
+
+
+# Architectures a checkpoint may name in its 'arch' entry: factory, block type, blocks per stage
+ARCHITECTURES = {
+    'resnet18_cbam': (resnet18_cbam, BasicBlock, [2, 2, 2, 2]),
+    'resnet34_cbam': (resnet34_cbam, BasicBlock, [3, 4, 6, 3]),
+    'resnet50_cbam': (resnet50_cbam, Bottleneck, [3, 4, 6, 3]),
+    'resnet101_cbam': (resnet101_cbam, Bottleneck, [3, 4, 23, 3]),
+    'resnet152_cbam': (resnet152_cbam, Bottleneck, [3, 8, 36, 3]),
+}
+
+
+def save_checkpoint(model, path, arch, **extra):
+    """Saves a checkpoint in the format the backend loads: {'arch', 'state_dict', **extra}
+    (e.g. epoch, best_prec1, optimizer)."""
+    if arch not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture {arch!r}, expected one of {sorted(ARCHITECTURES)}")
+    torch.save({'arch': arch, 'state_dict': model.state_dict(), **extra}, path)
+
+
+def arch_from_state_dict(state_dict):
+    """Architecture name matching the layer layout of a state dict (for checkpoints saved
+    without 'arch'), or None if it matches none of ARCHITECTURES."""
+    keys = [k[len('module.'):] if k.startswith('module.') else k for k in state_dict]
+    block = Bottleneck if 'layer1.0.conv3.weight' in keys else BasicBlock
+    layers = []
+    for stage in range(1, 5):
+        prefix = f'layer{stage}.'
+        indices = {int(k[len(prefix):].split('.', 1)[0]) for k in keys if k.startswith(prefix)}
+        layers.append(max(indices) + 1 if indices else 0)
+    for name, (_, arch_block, arch_layers) in ARCHITECTURES.items():
+        if arch_block is block and arch_layers == layers:
+            return name
+    return None
@@ -0,0 +1,163 @@
+# /backend/async_crud.py
+#
+# Async counterparts of crud.py for the FastAPI routes. Reads are written
+# against AsyncSession directly. Functions that also do CPU or file work
+# (track tier builds, spatial-index rebuilds, CSV parsing, artifact removal)
+# run the crud.py function on a worker thread with its own sync Session, so
+# both layers share one implementation and none of it runs on the event loop.
+# `AsyncSession.run_sync` is kept for plain DB round-trips.
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import crud, database, models
+
+
+def _with_session(func, *args):
+    db = database.SessionLocal()
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+async def _in_thread(func, *args):
+    """Run a crud.py function in a thread with a fresh sync Session."""
+    return await asyncio.to_thread(_with_session, func, *args)
+
+
+# --- Videos ---
+async def create_video(db: AsyncSession, name: str, file_path: str, duration: float, content_hash: str = None):
+    return await db.run_sync(crud.create_video, name, file_path, duration, content_hash)
+
+async def get_video(db: AsyncSession, video_id: int):
+    return await db.get(models.Video, video_id)
+
+async def get_video_with_gps(db: AsyncSession, video_id: int):
+    """Video with `gps_points` loaded up front (lazy loads are not possible on an AsyncSession)."""
+    result = await db.execute(
+        select(models.Video)
+        .options(selectinload(models.Video.gps_points))
+        .where(models.Video.id == video_id)
+    )
+    return result.scalars().first()
+
+async def get_video_by_hash(db: AsyncSession, content_hash: str):
+    result = await db.execute(
+        select(models.Video).where(models.Video.content_hash == content_hash).order_by(models.Video.id).limit(1)
+    )
+    return result.scalars().first()
+
+async def get_all_videos(db: AsyncSession):
+    result = await db.execute(select(models.Video))
+    return result.scalars().all()
+
+async def get_gps_ids_by_video(db: AsyncSession):
+    """{video_id: [gps point ids]} for all videos, in one query."""
+    result = await db.execute(select(models.GPSPoint.video_id, models.GPSPoint.id).order_by(models.GPSPoint.id))
+    ids = {}
+    for video_id, gps_id in result:
+        ids.setdefault(video_id, []).append(gps_id)
+    return ids
+
+async def update_video_path(db: AsyncSession, video, file_path: str):
+    video.file_path = file_path
+    await db.commit()
+    return video
+
+async def delete_video(db: AsyncSession, video_id: int):
+    return await _in_thread(crud.delete_video, video_id)
+
+
+# --- GPS points and tracks ---
+async def create_gps_points(db: AsyncSession, video_id: int, gps_data: list):
+    await _in_thread(crud.create_gps_points, video_id, gps_data)
+
+async def get_gps_point(db: AsyncSession, gps_point_id: int):
+    return await db.get(models.GPSPoint, gps_point_id)
+
+async def delete_gps_point(db: AsyncSession, gps_point_id: int):
+    return await _in_thread(crud.delete_gps_point, gps_point_id)
+
+async def get_gps_timestamps(db: AsyncSession, video_id: int):
+    result = await db.execute(
+        select(models.GPSPoint.timestamp)
+        .where(models.GPSPoint.video_id == video_id, models.GPSPoint.timestamp.isnot(None))
+        .order_by(models.GPSPoint.timestamp)
+    )
+    return list(result.scalars().all())
+
+async def get_track_segments(db: AsyncSession, video_id: int, zoom: int = None, tolerance: float = None):
+    return await _in_thread(crud.get_track_segments, video_id, zoom, tolerance)
+
+async def search_gps_bbox(db: AsyncSession, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+    return await _in_thread(crud.search_gps_bbox, min_lon, min_lat, max_lon, max_lat)
+
+
+# --- Inference results ---
+async def get_inference_results_by_video(db: AsyncSession, video_id: int):
+    result = await db.execute(
+        select(models.InferenceResult).where(models.InferenceResult.video_id == video_id)
+    )
+    return result.scalars().all()
+
+async def get_latest_cam_result(db: AsyncSession, video_id: int):
+    result = await db.execute(
+        select(models.InferenceResult)
+        .where(models.InferenceResult.video_id == video_id, models.InferenceResult.cam_path.isnot(None))
+        .order_by(models.InferenceResult.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def reuse_inference_results(db: AsyncSession, source_video_id: int, video_id: int):
+    return await _in_thread(crud.reuse_inference_results, source_video_id, video_id)
+
+async def save_inference_outputs(db: AsyncSession, video_id: int, results: dict):
+    return await _in_thread(crud.save_inference_outputs, video_id, results)
+
+
+# --- Road-quality segments and grid ---
+async def get_road_segments(
+    db: AsyncSession, label: str = None, min_length_m: float = None, video_id: int = None,
+    limit: int = 100, offset: int = 0,
+):
+    query = select(models.RoadSegment)
+    if label is not None:
+        query = query.where(models.RoadSegment.label == label)
+    if min_length_m is not None:
+        query = query.where(models.RoadSegment.length_m >= min_length_m)
+    if video_id is not None:
+        query = query.where(models.RoadSegment.video_id == video_id).order_by(models.RoadSegment.start_time)
+    else:
+        query = query.order_by(models.RoadSegment.length_m.desc())
+    result = await db.execute(query.offset(offset).limit(limit))
+    return result.scalars().all()
+
+async def get_quality_cells(
+    db: AsyncSession, precision: int, min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+):
+    result = await db.execute(
+        select(models.RoadQualityCell).where(
+            models.RoadQualityCell.precision == precision,
+            models.RoadQualityCell.lat.between(min_lat, max_lat),
+            models.RoadQualityCell.lon.between(min_lon, max_lon),
+        )
+    )
+    return result.scalars().all()
+
+
+# --- Checkpoint evaluations ---
+async def get_model_evaluation(db: AsyncSession, job_id: str):
+    result = await db.execute(select(models.ModelEvaluation).where(models.ModelEvaluation.job_id == job_id))
+    return result.scalars().first()
+
+async def get_model_evaluations_by_video(db: AsyncSession, video_id: int):
+    result = await db.execute(
+        select(models.ModelEvaluation)
+        .where(models.ModelEvaluation.video_id == video_id)
+        .order_by(models.ModelEvaluation.id)
+    )
+    return result.scalars().all()
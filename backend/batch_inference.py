@@ -0,0 +1,357 @@
+# /backend/batch_inference.py
+#
+# Batch inference over many videos with one resident model:
+#     python -m backend.batch_inference --ids 12 13 14
+#     python -m backend.batch_inference --dir /data/drives --no-db
+#
+# Decoder threads read and preprocess frames of several videos at once; the
+# main thread scores them in batches that mix videos, so the model never waits
+# on a single slow file. Finished videos are appended to a JSON-lines manifest:
+# rerunning with the same manifest skips them, so an interrupted backfill
+# resumes where it stopped. A throughput report is written at the end.
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import torch
+
+from .batch_jobs import jobs_from_directory, jobs_from_video_ids
+from .inference_utils import (
+    CASCADE_MODEL_PATH, DEFAULT_CASCADE_BAND, DEFAULT_MODEL_PATH, DEFAULT_PROFILE, DEVICE, INFERENCE_PROFILES,
+    CascadeScorer, CascadeStats, artifact_stem, frame_transform, get_model, preprocess, write_label_outputs,
+)
+from .progress import progress_bus
+from . import metrics
+from .utils.smoothing import SMOOTHING_METHODS, smooth
+
+
+# --- Resumable manifest ---
+class Manifest:
+    """Append-only JSON-lines log of finished (or failed) videos, keyed by job key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of a crashed run
+                    self.entries[entry["key"]] = entry
+
+    def is_done(self, key: str) -> bool:
+        return self.entries.get(key, {}).get("status") == "done"
+
+    def record(self, key: str, **entry):
+        entry = {"key": key, **entry}
+        with self.lock:
+            self.entries[key] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def save_to_database(job: dict, results: dict):
+    """Persist a finished video the same way the single-video API job does."""
+    from . import crud, database
+
+    if job["video_id"] is None:
+        return
+    db = database.SessionLocal()
+    try:
+        crud.save_inference_outputs(db, job["video_id"], results)
+    finally:
+        db.close()
+
+
+# --- Decode workers ---
+def _decode_worker(work: queue.Queue, frames: queue.Queue, inference_profile: str):
+    while True:
+        try:
+            job = work.get_nowait()
+        except queue.Empty:
+            frames.put(("exit",))
+            return
+        try:
+            cap = cv2.VideoCapture(job["path"])
+            if not cap.isOpened():
+                raise ValueError(f"Cannot open video: {job['path']}")
+            frames.put(("open", job, cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))))
+            while True:
+                with metrics.stage("decode"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                with metrics.stage("preprocess"):
+                    tensor = preprocess(frame, inference_profile)
+                frames.put(("frame", job, tensor))
+                metrics.queue_depth.set(frames.qsize(), queue="batch_frames")
+            cap.release()
+            frames.put(("end", job))
+        except Exception as e:
+            frames.put(("error", job, str(e)))
+
+
+# --- Batch runner ---
+def run_batch(
+    jobs: list,
+    manifest_path: str,
+    report_path: str = None,
+    model_path: str = DEFAULT_MODEL_PATH,
+    smoothing: str = "ema",
+    batch_size: int = 8,
+    decode_workers: int = None,
+    save=save_to_database,
+    progress_id: str = None,
+    cascade_model_path: str = None,
+    cascade_band: float = DEFAULT_CASCADE_BAND,
+    inference_profile: str = DEFAULT_PROFILE,
+) -> dict:
+    """
+    Score every job ({"key", "path", "video_id"}) not already done in the
+    manifest. Writes the same CSV / label sidecars as the single-video job
+    (render_mode="overlay": no re-encoded video) and calls `save(job, results)`
+    per finished video. Returns the throughput report.
+
+    With cascade_model_path, that small checkpoint scores every frame and
+    model_path only the uncertain ones (inference_utils.CascadeScorer);
+    escalation and agreement are reported per video and for the batch.
+
+    inference_profile sets the model input resolution (inference_utils.INFERENCE_PROFILES).
+    """
+    frame_transform(inference_profile)  # reject unknown profiles before decoding
+    manifest = Manifest(manifest_path)
+    pending = [j for j in jobs if not manifest.is_done(j["key"])]
+    skipped = len(jobs) - len(pending)
+    decode_workers = decode_workers or max(1, min(len(pending), (os.cpu_count() or 2) // 2))
+    print(f"🚀 Batch: {len(pending)} videos to score, {skipped} already done, "
+          f"{decode_workers} decoders, batch size {batch_size}, profile {inference_profile} on {DEVICE}")
+
+    if progress_id:
+        progress_bus.start(progress_id, total=max(1, len(pending)))
+
+    model = get_model(model_path)
+    scorer = CascadeScorer(get_model(cascade_model_path), model, cascade_band) if cascade_model_path else None
+    work = queue.Queue()
+    for job in pending:
+        work.put(job)
+    frames = queue.Queue(maxsize=batch_size * 4)
+    workers = [threading.Thread(target=_decode_worker, args=(work, frames, inference_profile), daemon=True)
+               for _ in range(decode_workers)]
+
+    states = {}  # key -> per-video accumulators
+    per_video, failures = [], []
+    batch = []  # (state, tensor)
+    totals = {"frames": 0, "inference_s": 0.0, "wait_s": 0.0}
+    t_start = time.perf_counter()
+
+    def flush():
+        if not batch:
+            return
+        t0 = time.perf_counter()
+        inputs = torch.stack([t for _, t in batch]).to(DEVICE)
+        if scorer:
+            probs = scorer(inputs, [state["cascade"] for state, _ in batch])
+        else:
+            with torch.no_grad():
+                probs = torch.sigmoid(model(inputs)).view(-1).tolist()
+        elapsed = time.perf_counter() - t0
+        metrics.stage_seconds.observe(elapsed, stage="forward_batch")
+        metrics.frames_total.inc(len(batch), source="batch")
+        totals["inference_s"] += elapsed
+        totals["frames"] += len(batch)
+        for (state, _), prob in zip(batch, probs):
+            state["probs"].append(prob)
+            if state["job"]["video_id"] is not None:
+                progress_bus.update(str(state["job"]["video_id"]), len(state["probs"]))
+        batch.clear()
+
+    def finish(state):
+        job = state["job"]
+        fps = state["fps"]
+        raw_probs = state["probs"]
+        timestamps = [i / fps for i in range(len(raw_probs))] if fps > 0 else [0.0] * len(raw_probs)
+        base_dir = os.path.dirname(job["path"])
+        base_name = os.path.splitext(os.path.basename(job["path"]))[0]
+        if job["video_id"] is not None:
+            base_name = artifact_stem(job["path"])  # stored rows may share files with duplicate uploads
+        outputs = write_label_outputs(
+            base_dir, base_name, fps, timestamps, raw_probs, smooth(raw_probs, smoothing), smoothing
+        )
+        cascade = state["cascade"].report() if state["cascade"] else None
+        results = {"output_video": None, "heatmap_video": None, "cam_path": None, "cascade": cascade,
+                   "inference_profile": inference_profile, **outputs}
+        if save:
+            save(job, results)
+
+        seconds = time.perf_counter() - state["started"]
+        manifest.record(job["key"], status="done", frames=len(raw_probs), seconds=round(seconds, 3),
+                        csv_output=results["csv_output"], overlay=results["overlay"], cascade=cascade)
+        per_video.append({"key": job["key"], "frames": len(raw_probs), "seconds": round(seconds, 3),
+                          "fps": round(len(raw_probs) / seconds, 2) if seconds > 0 else None,
+                          "cascade": cascade})
+        if job["video_id"] is not None:
+            progress_bus.finish(str(job["video_id"]), "done")
+        print(f"✅ {job['key']}: {len(raw_probs)} frames in {seconds:.1f}s")
+
+    def fail(job, error):
+        manifest.record(job["key"], status="failed", error=error)
+        failures.append({"key": job["key"], "error": error})
+        if job["video_id"] is not None:
+            progress_bus.finish(str(job["video_id"]), f"error: {error}")
+        print(f"[ERROR] Batch inference failed for {job['key']}: {error}")
+
+    for w in workers:
+        w.start()
+    exited = 0
+    while exited < len(workers):
+        t0 = time.perf_counter()
+        try:
+            # Partial batches run as soon as the decoders fall behind
+            item = frames.get(timeout=0.05) if batch else frames.get()
+        except queue.Empty:
+            flush()
+            continue
+        finally:
+            if not batch:
+                totals["wait_s"] += time.perf_counter() - t0
+
+        kind = item[0]
+        if kind == "frame":
+            batch.append((states[item[1]["key"]], item[2]))
+            if len(batch) >= batch_size:
+                flush()
+        elif kind == "open":
+            job, fps, total = item[1], item[2], item[3]
+            states[job["key"]] = {"job": job, "fps": fps, "probs": [], "started": time.perf_counter(),
+                                  "cascade": CascadeStats(cascade_band) if scorer else None}
+            if job["video_id"] is not None:
+                progress_bus.start(str(job["video_id"]), total=total)
+        elif kind in ("end", "error"):
+            flush()
+            job = item[1]
+            state = states.pop(job["key"], None)
+            try:
+                if kind == "error":
+                    fail(job, item[2])
+                else:
+                    finish(state)
+            except Exception as e:
+                fail(job, str(e))
+            if progress_id:
+                progress_bus.update(progress_id, len(per_video) + len(failures))
+        elif kind == "exit":
+            exited += 1
+    flush()
+
+    wall = time.perf_counter() - t_start
+    metrics.queue_depth.set(0, queue="batch_frames")
+    if wall > 0:
+        metrics.job_fps.set(totals["frames"] / wall, source="batch")
+    report = {
+        "videos_total": len(jobs),
+        "videos_done": len(per_video),
+        "videos_skipped": skipped,
+        "videos_failed": len(failures),
+        "frames": totals["frames"],
+        "wall_seconds": round(wall, 3),
+        "frames_per_second": round(totals["frames"] / wall, 2) if wall > 0 else None,
+        "videos_per_hour": round(len(per_video) / wall * 3600, 1) if wall > 0 else None,
+        # Share of wall time the model ran vs. sat idle waiting for decoded frames
+        "inference_seconds": round(totals["inference_s"], 3),
+        "decode_wait_seconds": round(totals["wait_s"], 3),
+        "batch_size": batch_size,
+        "decode_workers": decode_workers,
+        "device": str(DEVICE),
+        "smoothing": smoothing,
+        "inference_profile": inference_profile,
+        "cascade": _cascade_summary(per_video, cascade_band) if scorer else None,
+        "per_video": per_video,
+        "failures": failures,
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if progress_id:
+        progress_bus.finish(progress_id, "done" if not failures else f"error: {len(failures)} videos failed")
+    print(f"📊 Batch finished: {report['videos_done']} videos, {report['frames']} frames, "
+          f"{report['frames_per_second']} frames/s")
+    return report
+
+
+def _cascade_summary(per_video: list, band: float) -> dict:
+    """Batch-wide escalation rate and frame-weighted label agreement."""
+    reports = [v["cascade"] for v in per_video if v["cascade"] and v["cascade"]["frames"]]
+    frames = sum(r["frames"] for r in reports)
+    escalated = sum(r["escalated"] for r in reports)
+    agreed = [r for r in reports if r["label_agreement"] is not None]
+    agreed_frames = sum(r["frames"] for r in agreed)
+    return {
+        "band": band,
+        "frames": frames,
+        "escalated": escalated,
+        "escalated_fraction": round(escalated / frames, 4) if frames else 0.0,
+        "label_agreement": (
+            round(sum(r["label_agreement"] * r["frames"] for r in agreed) / agreed_frames, 4)
+            if agreed_frames else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch road-quality inference over many videos")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--ids", type=int, nargs="+", help="Video IDs from the database")
+    source.add_argument("--dir", help="Directory of video files")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Checkpoint path")
+    parser.add_argument("--smoothing", default="ema", choices=SMOOTHING_METHODS)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--decode-workers", type=int, default=None)
+    parser.add_argument("--manifest", default="batch_manifest.jsonl", help="Resume log (reuse to resume)")
+    parser.add_argument("--report", default="batch_report.json")
+    parser.add_argument("--no-db", action="store_true", help="Only write result files, do not update the database")
+    parser.add_argument("--cascade-model", default=None,
+                        help=f"Small checkpoint scoring every frame; --model only scores uncertain ones (e.g. {CASCADE_MODEL_PATH})")
+    parser.add_argument("--cascade-band", type=float, default=DEFAULT_CASCADE_BAND,
+                        help="Escalate frames whose probability is within this distance of 0.5")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(INFERENCE_PROFILES),
+                        help="Model input resolution (see backend.benchmarks.bench_profiles)")
+    args = parser.parse_args()
+
+    if args.ids:
+        from . import database
+
+        db = database.SessionLocal()
+        try:
+            jobs = jobs_from_video_ids(db, args.ids)
+        finally:
+            db.close()
+    else:
+        jobs = jobs_from_directory(args.dir)
+
+    run_batch(
+        jobs,
+        manifest_path=args.manifest,
+        report_path=args.report,
+        model_path=args.model,
+        smoothing=args.smoothing,
+        batch_size=args.batch_size,
+        decode_workers=args.decode_workers,
+        save=None if args.no_db else save_to_database,
+        cascade_model_path=args.cascade_model,
+        cascade_band=args.cascade_band,
+        inference_profile=args.profile,
+    )
+
+
+if __name__ == "__main__":
+    main()
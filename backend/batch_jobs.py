@@ -0,0 +1,36 @@
+# /backend/batch_jobs.py
+#
+# Job discovery for batch inference (see batch_inference.py). Kept free of
+# torch/OpenCV imports so the API process can list jobs without loading the
+# inference engine.
+
+import os
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+# Outputs written next to the inputs; never picked up as inputs themselves
+_OUTPUT_SUFFIXES = ("_inference", "_heatmap")
+
+
+# --- Job discovery ---
+def jobs_from_directory(directory: str) -> list:
+    jobs = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in VIDEO_EXTENSIONS or stem.endswith(_OUTPUT_SUFFIXES):
+            continue
+        path = os.path.abspath(os.path.join(directory, name))
+        jobs.append({"key": f"file:{path}", "path": path, "video_id": None})
+    return jobs
+
+
+def jobs_from_video_ids(db, video_ids: list) -> list:
+    from . import crud
+
+    jobs = []
+    for video_id in video_ids:
+        video = crud.get_video_with_gps(db, video_id)
+        if not video:
+            print(f"⚠️ Video {video_id} not found, skipping")
+            continue
+        jobs.append({"key": f"video:{video_id}", "path": video.file_path, "video_id": video_id})
+    return jobs
@@ -0,0 +1,277 @@
+"""
+Load test of the API's database paths: concurrent uploads and queries against
+the async routes (backend.main:app) and against the previous synchronous
+handlers (`legacy_app` below: blocking crud, transcode and OpenCV calls).
+
+    python -m backend.benchmarks.bench_db_load --concurrency 32 --seconds 20
+
+Each variant runs in its own uvicorn process on the same database (a
+throwaway SQLite file unless DATABASE_URL is set), seeded with synthetic
+videos and GPS tracks. Requests/sec and latency percentiles per request kind
+are printed as JSON. Requires uvicorn, httpx and ffmpeg.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+_WORK_DIR = tempfile.mkdtemp(prefix="rahi_load_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_WORK_DIR, 'load.db')}")
+os.environ.setdefault("RAHI_JOB_STORE", "memory")
+
+from fastapi import Depends, FastAPI, File, HTTPException, Query, UploadFile  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend import crud, database, main  # noqa: E402
+from backend.benchmarks.synthetic import make_gps_csv, make_video  # noqa: E402
+from backend.inference_utils import UPLOAD_DIR  # noqa: E402
+
+UPLOAD_PREFIX = "loadtest_"
+
+
+# --- Previous synchronous handlers (the baseline) ---
+legacy_app = FastAPI()
+
+
+@legacy_app.on_event("startup")
+def _legacy_init():
+    database.init_db()
+
+
+@legacy_app.post("/upload/")
+async def legacy_upload(video: UploadFile = File(...), csv_file: UploadFile = File(None),
+                        db: Session = Depends(database.get_db)):
+    # async def with blocking calls: every step below stalls the event loop
+    video_path = main.UPLOAD_DIR / os.path.basename(video.filename)
+    video_path.write_bytes(await video.read())
+    video_path = main.transcode_upload(video_path)
+    duration = main.probe_duration(video_path)
+    new_video = crud.create_video(db, name=video_path.name, file_path=str(video_path), duration=duration)
+    if csv_file:
+        crud.create_gps_points(db, video_id=new_video.id, gps_data=main.parse_gps_csv(await csv_file.read()))
+    return {"video_id": new_video.id}
+
+
+@legacy_app.get("/video/{video_id}")
+def legacy_get_video(video_id: int, zoom: int = Query(default=None), db: Session = Depends(database.get_db)):
+    video = crud.get_video_with_gps(db, video_id)
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    response = {"id": video.id, "name": video.name, "inferences": [
+        {"id": inf.id, "created_at": inf.created_at} for inf in crud.get_inference_results_by_video(db, video_id)
+    ]}
+    if zoom is not None:
+        response["segments"] = crud.get_track_segments(db, video_id, zoom=zoom)
+    else:
+        response["gps_points"] = [
+            {"lat": p.lat, "lon": p.lon, "highlight": p.highlight, "timestamp": p.timestamp} for p in video.gps_points
+        ]
+    return response
+
+
+@legacy_app.get("/videos/")
+def legacy_list_videos(db: Session = Depends(database.get_db)):
+    return [{"id": v.id, "name": v.name, "gps_ids": [p.id for p in v.gps_points]} for v in crud.get_all_videos(db)]
+
+
+@legacy_app.get("/api/segments")
+def legacy_segments(limit: int = Query(default=100), db: Session = Depends(database.get_db)):
+    return [{"id": s.id, "length_m": s.length_m} for s in crud.get_road_segments(db, limit=limit)]
+
+
+# --- Fixtures ---
+def seed(n_videos: int, track_seconds: int) -> list:
+    """Insert videos with scored GPS tracks and road segments; returns their ids."""
+    from backend.utils.overlay import label_segments
+
+    database.init_db()
+    csv_path = os.path.join(_WORK_DIR, "seed.csv")
+    db = database.SessionLocal()
+    try:
+        ids = []
+        for i in range(n_videos):
+            make_gps_csv(csv_path, track_seconds, seed=i)
+            with open(csv_path, "rb") as f:
+                gps_data = main.parse_gps_csv(f.read())
+            video = crud.create_video(db, name=f"seed_{i}.mp4", file_path=f"seed_{i}.mp4", duration=track_seconds)
+            crud.create_gps_points(db, video.id, gps_data)
+            ts = [p["timestamp"] for p in gps_data]
+            probs = [0.5 + 0.45 * ((k // 20) % 2 * 2 - 1) for k in range(len(ts))]
+            crud.save_inference_outputs(db, video.id, {
+                "frame_timestamps": ts, "raw_probs": probs, "smoothed_probs": probs,
+                "segments": label_segments(ts, probs, 1.0), "csv_output": "seed.csv", "output_video": None,
+                "overlay": None, "cam_path": None, "heatmap_video": None, "created_at": "2026-01-01 00:00:00",
+            })
+            ids.append(video.id)
+        return ids
+    finally:
+        db.close()
+
+
+def cleanup(video_ids: list):
+    db = database.SessionLocal()
+    try:
+        for video_id in video_ids:
+            crud.delete_video(db, video_id)
+    finally:
+        db.close()
+    for leftover in glob.glob(os.path.join(UPLOAD_DIR, f"{UPLOAD_PREFIX}*")):
+        if os.path.isfile(leftover):
+            os.remove(leftover)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_path: str, port: int):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(), stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{app_path} exited with code {proc.returncode}")
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return proc
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{app_path} did not start")
+
+
+# --- Load generator ---
+async def run_load(base_url: str, video_ids: list, concurrency: int, seconds: float,
+                   upload_share: float, upload_files: tuple) -> dict:
+    import httpx
+
+    video_bytes, csv_bytes = upload_files
+    latencies = {}
+    errors = {}
+    uploaded = []
+    deadline = time.perf_counter() + seconds
+
+    async def one_request(client, rng, worker, n):
+        if rng.random() < upload_share:
+            name = f"{UPLOAD_PREFIX}{worker}_{n}.mp4"
+            r = await client.post("/upload/", files={"video": (name, video_bytes, "video/mp4"),
+                                                     "csv_file": (f"{name}.csv", csv_bytes, "text/csv")})
+            if r.status_code == 200:
+                uploaded.append(r.json()["video_id"])
+            return "upload", r
+        kind = rng.choice(["video", "video_lod", "videos", "segments"])
+        if kind == "video":
+            return kind, await client.get(f"/video/{rng.choice(video_ids)}")
+        if kind == "video_lod":
+            return kind, await client.get(f"/video/{rng.choice(video_ids)}", params={"zoom": 14})
+        if kind == "videos":
+            return kind, await client.get("/videos/")
+        return kind, await client.get("/api/segments", params={"limit": 50})
+
+    async def worker(client, worker_id):
+        rng = random.Random(worker_id)
+        n = 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                kind, r = await one_request(client, rng, worker_id, n)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                kind, ok = "transport", False
+            if ok:
+                latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+            else:
+                errors[kind] = errors.get(kind, 0) + 1
+            n += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    def pct(values, q):
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_second": round(total / elapsed, 1),
+        "latency_ms": {
+            kind: {"count": len(v), "p50": pct(v, 0.5), "p95": pct(v, 0.95), "p99": pct(v, 0.99)}
+            for kind, v in sorted(latencies.items())
+        },
+        "uploaded": uploaded,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20.0, help="Duration of each variant's run")
+    parser.add_argument("--videos", type=int, default=20, help="Seeded videos")
+    parser.add_argument("--track-seconds", type=int, default=600, help="Length of each seeded GPS track (1 Hz)")
+    parser.add_argument("--upload-share", type=float, default=0.1, help="Fraction of requests that are uploads")
+    parser.add_argument("--variants", default="sync,async")
+    parser.add_argument("--out", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args()
+
+    video_ids = seed(args.videos, args.track_seconds)
+    video_path = os.path.join(_WORK_DIR, "upload.mp4")
+    csv_path = os.path.join(_WORK_DIR, "upload.csv")
+    make_video(video_path, 320, 180, 2, 10)
+    make_gps_csv(csv_path, 2)
+    with open(video_path, "rb") as v, open(csv_path, "rb") as c:
+        upload_files = (v.read(), c.read())
+
+    apps = {"sync": "backend.benchmarks.bench_db_load:legacy_app", "async": "backend.main:app"}
+    results = {}
+    try:
+        for variant in args.variants.split(","):
+            port = _free_port()
+            proc = start_server(apps[variant], port)
+            try:
+                result = asyncio.run(run_load(f"http://127.0.0.1:{port}", video_ids, args.concurrency,
+                                              args.seconds, args.upload_share, upload_files))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            cleanup(result.pop("uploaded"))
+            print(f"⏱️ {variant}: {result['requests_per_second']} requests/s "
+                  f"({result['requests']} requests, {sum(result['errors'].values())} errors)", file=sys.stderr)
+            results[variant] = result
+    finally:
+        cleanup(video_ids)
+
+    report = {
+        "database": database.get_engine().url.render_as_string(hide_password=True),
+        "concurrency": args.concurrency,
+        "seconds": args.seconds,
+        "upload_share": args.upload_share,
+        "seeded_videos": args.videos,
+        "gps_points_per_video": args.track_seconds + 1,
+        "variants": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
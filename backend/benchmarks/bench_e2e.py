@@ -0,0 +1,188 @@
+"""
+End-to-end pipeline benchmark: upload -> transcode -> inference -> GPS match -> fetch.
+
+Generates synthetic videos (plus GPS CSVs) at several resolutions and lengths,
+runs them through the real API app against a throwaway SQLite database with a
+randomly initialized CBAM ResNet (no weights needed), and prints per-stage
+timings, frames/sec and peak RSS as JSON:
+
+    python -m backend.benchmarks.bench_e2e --resolutions 640x360,1280x720 \\
+        --seconds 2,10 --arch resnet18_cbam --out bench_e2e.json
+
+Requires ffmpeg in PATH and `httpx` (for FastAPI's TestClient).
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+# The app binds its database at import time: point it at SQLite first
+_WORK_DIR = tempfile.mkdtemp(prefix="rahi_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_WORK_DIR, 'bench.db')}")
+os.environ.setdefault("RAHI_JOB_STORE", "memory")
+
+import torch  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import backend.BinaryClassification.CBAM.resnet_cbam as resnet_cbam  # noqa: E402
+from backend import crud, database, main  # noqa: E402
+from backend.inference_utils import UPLOAD_DIR, run_inference_on_video_async  # noqa: E402
+from backend.benchmarks.synthetic import make_gps_csv, make_video  # noqa: E402
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes on macOS, KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1)
+
+
+def random_checkpoint(arch: str, path: str) -> str:
+    torch.manual_seed(0)
+    model = getattr(resnet_cbam, arch)(pretrained=False)
+    torch.save({"arch": arch, "state_dict": model.state_dict()}, path)
+    return path
+
+
+def run_case(client, model_path, width, height, seconds, fps, generate_heatmap, smoothing):
+    name = f"bench_{width}x{height}_{seconds:g}s"
+    src_video = os.path.join(_WORK_DIR, f"{name}.mp4")
+    src_csv = os.path.join(_WORK_DIR, f"{name}.csv")
+    stages = {}
+
+    t0 = time.perf_counter()
+    n_frames = make_video(src_video, width, height, seconds, fps)
+    n_gps = make_gps_csv(src_csv, seconds)
+    stages["generate_s"] = time.perf_counter() - t0
+
+    # --- Upload (includes the H.264 transcode and previews, timed separately below) ---
+    transcode_s = []
+    original_transcode = main.transcode_upload
+
+    def timed_transcode(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return original_transcode(*args, **kwargs)
+        finally:
+            transcode_s.append(time.perf_counter() - t)
+
+    main.transcode_upload = timed_transcode
+    try:
+        t0 = time.perf_counter()
+        with open(src_video, "rb") as v, open(src_csv, "rb") as c:
+            r = client.post("/upload/", files={"video": (f"{name}.mp4", v, "video/mp4"),
+                                               "csv_file": (f"{name}.csv", c, "text/csv")})
+        r.raise_for_status()
+        upload_total = time.perf_counter() - t0
+    finally:
+        main.transcode_upload = original_transcode
+    video_id = r.json()["video_id"]
+    stages["transcode_s"] = sum(transcode_s)
+    stages["upload_s"] = upload_total - stages["transcode_s"]
+    rss_after_upload = _peak_rss_mb()
+
+    # --- Inference ---
+    db = database.SessionLocal()
+    try:
+        video = crud.get_video_with_gps(db, video_id)
+        stored_stem = os.path.splitext(os.path.basename(video.file_path))[0]  # <sha256> of the upload
+        t0 = time.perf_counter()
+        results = asyncio.run(run_inference_on_video_async(
+            video.file_path, str(video_id), model_path,
+            generate_heatmap=generate_heatmap, smoothing=smoothing,
+        ))
+        stages["inference_s"] = time.perf_counter() - t0
+        rss_after_inference = _peak_rss_mb()
+
+        # --- GPS match + persist ---
+        t0 = time.perf_counter()
+        crud.save_inference_outputs(db, video_id, results)
+        stages["gps_match_s"] = time.perf_counter() - t0
+    finally:
+        db.close()
+
+    # --- Fetch (what the frontend requests after a job) ---
+    t0 = time.perf_counter()
+    client.get(f"/video/{video_id}").raise_for_status()
+    stages["fetch_points_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    client.get(f"/video/{video_id}", params={"zoom": 16}).raise_for_status()
+    stages["fetch_segments_s"] = time.perf_counter() - t0
+
+    scored = len(results["raw_probs"])
+    client.delete(f"/video/{video_id}")
+    for leftover in glob.glob(os.path.join(UPLOAD_DIR, f"{stored_stem}*")):
+        if os.path.isdir(leftover):
+            shutil.rmtree(leftover, ignore_errors=True)
+        else:
+            os.remove(leftover)
+
+    return {
+        "case": name,
+        "width": width,
+        "height": height,
+        "seconds": seconds,
+        "fps": fps,
+        "frames": n_frames,
+        "frames_scored": scored,
+        "gps_points": n_gps,
+        "stages": {k: round(v, 4) for k, v in stages.items()},
+        "inference_frames_per_second": round(scored / stages["inference_s"], 2) if stages["inference_s"] else None,
+        "end_to_end_s": round(sum(v for k, v in stages.items() if k != "generate_s"), 4),
+        "peak_rss_mb": {"after_upload": rss_after_upload, "after_inference": rss_after_inference,
+                        "end": _peak_rss_mb()},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default="640x360,1280x720")
+    parser.add_argument("--seconds", default="2,5", help="Comma-separated video lengths")
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--arch", default="resnet18_cbam", choices=["resnet18_cbam", "resnet101_cbam"])
+    parser.add_argument("--heatmap", action="store_true", help="Also render Grad-CAM heatmap videos")
+    parser.add_argument("--smoothing", default="ema")
+    parser.add_argument("--out", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args()
+
+    resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions.split(",")]
+    lengths = [float(s) for s in args.seconds.split(",")]
+
+    database.init_db()
+    model_path = random_checkpoint(args.arch, os.path.join(_WORK_DIR, f"{args.arch}.pth"))
+
+    cases = []
+    # Entering the client keeps one event loop (and async DB pool) for the whole run
+    with TestClient(main.app) as client:
+        for width, height in resolutions:
+            for seconds in lengths:
+                case = run_case(client, model_path, width, height, seconds, args.fps, args.heatmap, args.smoothing)
+                print(f"⏱️ {case['case']}: {case['end_to_end_s']}s end to end, "
+                      f"{case['inference_frames_per_second']} frames/s", file=sys.stderr)
+                cases.append(case)
+
+    report = {
+        "arch": args.arch,
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "torch_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "database": database.engine.url.render_as_string(hide_password=True),
+        "cases": cases,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
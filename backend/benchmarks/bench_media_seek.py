@@ -0,0 +1,103 @@
+"""
+Concurrent seeking clients vs. API latency.
+
+Simulates N video players that seek to random positions (range requests of
+`--chunk` bytes) while a probe measures latency of a cheap API call. Run it
+against a live server, once with media served by the API process and once
+with the standalone media app, and compare the API latency percentiles:
+
+    uvicorn backend.main:app --port 8000
+    uvicorn backend.media:app --port 8001            # optional, separate process
+    python -m backend.benchmarks.bench_media_seek --api http://localhost:8000 \
+        --media http://localhost:8001 --file sample.mp4 --clients 32
+
+Requires `httpx`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+
+async def seeking_client(client, url, size, chunk, stop, stats):
+    while not stop.is_set():
+        start = random.randrange(0, max(1, size - chunk))
+        t0 = time.perf_counter()
+        r = await client.get(url, headers={"Range": f"bytes={start}-{start + chunk - 1}"})
+        stats["latencies"].append(time.perf_counter() - t0)
+        stats["bytes"] += len(r.content)
+
+
+async def api_probe(client, url, stop, latencies, interval):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await client.get(url)
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(interval)
+
+
+async def run_phase(api, media_url, size, clients, chunk, duration, probe_path):
+    stop = asyncio.Event()
+    media_stats = {"latencies": [], "bytes": 0}
+    api_latencies = []
+    limits = httpx.Limits(max_connections=clients + 4)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        tasks = [asyncio.create_task(api_probe(client, api + probe_path, stop, api_latencies, 0.05))]
+        tasks += [
+            asyncio.create_task(seeking_client(client, media_url, size, chunk, stop, media_stats))
+            for _ in range(clients)
+        ]
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "clients": clients,
+        "api": _percentiles(api_latencies),
+        "media": _percentiles(media_stats["latencies"]),
+        "media_mb_per_s": round(media_stats["bytes"] / duration / 1e6, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://localhost:8000")
+    parser.add_argument("--media", default=None, help="Media server base URL (defaults to --api)")
+    parser.add_argument("--file", required=True, help="File name under /uploads")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--chunk", type=int, default=1024 * 1024)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--probe", default="/videos/", help="API path used as latency probe")
+    args = parser.parse_args()
+
+    media_url = f"{args.media or args.api}/uploads/{args.file}"
+    async with httpx.AsyncClient() as client:
+        head = await client.head(media_url)
+        head.raise_for_status()
+        size = int(head.headers["content-length"])
+
+    baseline = await run_phase(args.api, media_url, size, 0, args.chunk, args.duration / 2, args.probe)
+    loaded = await run_phase(args.api, media_url, size, args.clients, args.chunk, args.duration, args.probe)
+    print(json.dumps({"file_size": size, "baseline": baseline, "under_seek_load": loaded}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
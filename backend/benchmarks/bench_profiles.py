@@ -0,0 +1,170 @@
+"""
+Inference profile benchmark: throughput and label agreement of every model
+input resolution (inference_utils.INFERENCE_PROFILES) on one reference video:
+
+    python -m backend.benchmarks.bench_profiles --video drive.mp4 --max-frames 600 \\
+        --out bench_profiles.json
+
+Frames are decoded once; each profile then preprocesses and scores all of
+them in batches. Labels (raw and smoothed) are compared with those of the
+reference profile ("default", the training resolution), so the report shows
+how much accuracy each speed-up costs. Without --video a synthetic clip is
+used; without a checkpoint at --model a randomly initialized --arch is scored,
+which only makes the timings meaningful.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from backend.benchmarks.synthetic import make_video
+from backend.inference_utils import (
+    DEFAULT_MODEL_PATH, DEFAULT_PROFILE, DEVICE, INFERENCE_PROFILES, load_model, preprocess,
+)
+from backend.utils.smoothing import SMOOTHING_METHODS, smooth
+
+
+def read_frames(video_path: str, max_frames: int) -> tuple:
+    """Up to max_frames BGR frames of the video, and its fps."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames, fps
+
+
+def score_frames(model, frames: list, inference_profile: str, batch_size: int) -> dict:
+    """Probabilities of all frames at one profile, with preprocess and forward timings."""
+    # Warm-up: first calls at a new input size pay for allocation and kernel selection
+    with torch.no_grad():
+        model(torch.stack([preprocess(f, inference_profile) for f in frames[:batch_size]]).to(DEVICE))
+
+    probs = []
+    preprocess_s = forward_s = 0.0
+    for start in range(0, len(frames), batch_size):
+        t0 = time.perf_counter()
+        inputs = torch.stack([preprocess(f, inference_profile) for f in frames[start:start + batch_size]]).to(DEVICE)
+        t1 = time.perf_counter()
+        with torch.no_grad():
+            probs.extend(torch.sigmoid(model(inputs)).view(-1).tolist())
+        if DEVICE.type == "cuda":
+            torch.cuda.synchronize()
+        preprocess_s += t1 - t0
+        forward_s += time.perf_counter() - t1
+    return {"probs": probs, "preprocess_s": preprocess_s, "forward_s": forward_s}
+
+
+def compare(probs: list, reference: list, smoothing: str) -> dict:
+    """Agreement of raw and smoothed labels (threshold 0.5) with the reference profile's."""
+    probs, reference = np.asarray(probs), np.asarray(reference)
+    smoothed = np.asarray(smooth(probs.tolist(), smoothing))
+    reference_smoothed = np.asarray(smooth(reference.tolist(), smoothing))
+    return {
+        "label_agreement": round(float(np.mean((probs > 0.5) == (reference > 0.5))), 4),
+        "smoothed_label_agreement": round(float(np.mean((smoothed > 0.5) == (reference_smoothed > 0.5))), 4),
+        "mean_abs_prob_diff": round(float(np.mean(np.abs(probs - reference))), 4),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None, help="Reference video (default: a synthetic 1280x720 clip)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Checkpoint path")
+    parser.add_argument("--arch", default="resnet101_cbam", choices=["resnet18_cbam", "resnet101_cbam"],
+                        help="Randomly initialized model used when --model does not exist")
+    parser.add_argument("--profiles", default=",".join(INFERENCE_PROFILES))
+    parser.add_argument("--reference", default=DEFAULT_PROFILE, choices=sorted(INFERENCE_PROFILES))
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--smoothing", default="ema", choices=SMOOTHING_METHODS)
+    parser.add_argument("--out", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args()
+
+    profiles = args.profiles.split(",")
+    unknown = [p for p in profiles if p not in INFERENCE_PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)}")
+    if args.reference not in profiles:
+        profiles.append(args.reference)
+
+    video_path = args.video
+    if video_path is None:
+        video_path = os.path.join(tempfile.mkdtemp(prefix="rahi_profiles_"), "reference.mp4")
+        make_video(video_path, 1280, 720, seconds=args.max_frames / 30, fps=30)
+    frames, fps = read_frames(video_path, args.max_frames)
+    if not frames:
+        raise SystemExit(f"No frames decoded from {video_path}")
+
+    if os.path.exists(args.model):
+        model = load_model(args.model)
+        model_name = args.model
+    else:
+        import backend.BinaryClassification.CBAM.resnet_cbam as resnet_cbam
+
+        print(f"⚠️ {args.model} not found: scoring a random {args.arch}, label agreement is meaningless",
+              file=sys.stderr)
+        torch.manual_seed(0)
+        model = getattr(resnet_cbam, args.arch)(pretrained=False).to(DEVICE).eval()
+        model_name = f"random {args.arch}"
+
+    scores = {}
+    for name in profiles:
+        scores[name] = score_frames(model, frames, name, args.batch_size)
+        total_s = scores[name]["preprocess_s"] + scores[name]["forward_s"]
+        print(f"⏱️ {name} {INFERENCE_PROFILES[name][0]}x{INFERENCE_PROFILES[name][1]}: "
+              f"{len(frames) / total_s:.1f} frames/s", file=sys.stderr)
+
+    reference = scores[args.reference]
+    reference_fps = len(frames) / (reference["preprocess_s"] + reference["forward_s"])
+    results = {}
+    for name in profiles:
+        s = scores[name]
+        total_s = s["preprocess_s"] + s["forward_s"]
+        height, width = INFERENCE_PROFILES[name]
+        results[name] = {
+            "input_size": f"{height}x{width}",
+            "frames_per_second": round(len(frames) / total_s, 2),
+            "speedup": round(len(frames) / total_s / reference_fps, 2),
+            "preprocess_ms_per_frame": round(s["preprocess_s"] / len(frames) * 1000, 2),
+            "forward_ms_per_frame": round(s["forward_s"] / len(frames) * 1000, 2),
+            **compare(s["probs"], reference["probs"], args.smoothing),
+        }
+
+    report = {
+        "video": args.video or "synthetic 1280x720",
+        "video_fps": fps,
+        "frames": len(frames),
+        "model": model_name,
+        "reference_profile": args.reference,
+        "smoothing": args.smoothing,
+        "batch_size": args.batch_size,
+        "device": str(DEVICE),
+        "torch_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "profiles": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,101 @@
+"""
+Vectorized smoothing filters vs. the original per-frame Python loops.
+
+    python -m backend.benchmarks.bench_smoothing --frames 1000000
+
+Also checks that the vectorized moving average / EMA match the loop
+implementations and reports the per-frame cost of the streaming variants.
+"""
+
+import argparse
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from backend.utils import smoothing
+
+
+# --- Reference implementations (previously in inference_utils) ---
+def legacy_moving_average(probs, window_size=7):
+    smoothed = []
+    dq = deque(maxlen=window_size)
+    for p in probs:
+        dq.append(p)
+        smoothed.append(np.mean(dq))
+    return smoothed
+
+
+def legacy_ema(probs, alpha=0.3):
+    smoothed = []
+    for i, p in enumerate(probs):
+        if i == 0:
+            smoothed.append(p)
+        else:
+            smoothed.append(alpha * p + (1 - alpha) * smoothed[-1])
+    return smoothed
+
+
+def _timed(fn, *args, repeat=1):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def synthetic_probs(n, seed=0):
+    """Noisy classifier output over alternating good/bad road stretches."""
+    rng = np.random.default_rng(seed)
+    stretches = np.repeat(rng.random(n // 200 + 1) > 0.5, 200)[:n]
+    return np.clip(np.where(stretches, 0.75, 0.25) + rng.normal(0, 0.2, n), 0, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the slow loop implementations")
+    args = parser.parse_args()
+
+    probs = synthetic_probs(args.frames)
+    probs_list = probs.tolist()
+    report = {"frames": args.frames, "scipy_lfilter": smoothing.lfilter is not None, "offline_s": {}}
+
+    for method in smoothing.SMOOTHING_METHODS[1:]:
+        report["offline_s"][method], _ = _timed(smoothing.smooth, probs, method, repeat=args.repeat)
+
+    if not args.skip_legacy:
+        t_ma, ref_ma = _timed(legacy_moving_average, probs_list)
+        t_ema, ref_ema = _timed(legacy_ema, probs_list)
+        report["legacy_s"] = {"moving_average": t_ma, "ema": t_ema}
+        report["speedup"] = {
+            "moving_average": round(t_ma / report["offline_s"]["moving_average"], 1),
+            "ema": round(t_ema / report["offline_s"]["ema"], 1),
+        }
+        report["max_abs_diff"] = {
+            "moving_average": float(np.max(np.abs(smoothing.moving_average(probs) - ref_ma))),
+            "ema": float(np.max(np.abs(smoothing.ema(probs) - ref_ema))),
+        }
+
+    # Streaming variants are called once per frame during inference
+    sample = probs_list[:100_000]
+    report["streaming_us_per_frame"] = {}
+    for method in smoothing.SMOOTHING_METHODS[1:]:
+        smoother = smoothing.StreamingSmoother(method)
+        elapsed, _ = _timed(lambda: [smoother(p) for p in sample])
+        report["streaming_us_per_frame"][method] = round(elapsed / len(sample) * 1e6, 3)
+
+    # How much each filter cleans up label flicker
+    flips = lambda labels: int(np.count_nonzero(np.diff(np.asarray(labels) > 0.5)))
+    report["label_switches"] = {"raw": flips(probs)}
+    for method in smoothing.SMOOTHING_METHODS[1:]:
+        report["label_switches"][method] = flips(smoothing.smooth(probs, method))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
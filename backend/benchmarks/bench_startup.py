@@ -0,0 +1,133 @@
+"""
+Startup benchmark: import time and memory of the API process versus the
+inference worker, each measured in fresh interpreters, plus the time from
+launching uvicorn to the first answered request:
+
+    python -m backend.benchmarks.bench_startup --repeat 5 --out bench_startup.json
+
+Reports medians as JSON, and which heavy modules (torch, cv2, ...) each
+import pulled in. The API must not load any of them. The server uses a
+throwaway SQLite database unless DATABASE_URL is set.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# The server creates its tables at startup: give it a throwaway SQLite database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='rahi_startup_'), 'startup.db')}")
+
+HEAVY_MODULES = ("torch", "torchvision", "cv2", "scipy", "PIL", "numpy")
+
+# Run in a child interpreter: import one module, report time, peak RSS and heavy modules
+_PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - t0
+divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+print(json.dumps({
+    "import_s": elapsed,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor,
+    "heavy_modules": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, module, *HEAVY_MODULES],
+        check=True, capture_output=True, text=True, env=os.environ.copy(),
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - t0  # interpreter start + import + exit
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None  # not Linux
+
+
+def measure_server(app_path: str, timeout: float = 60.0) -> dict:
+    """Seconds from launching uvicorn until GET /metrics answers, and the server's RSS then."""
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{app_path} exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1) as r:
+                    if r.status == 200:
+                        return {"first_response_s": time.perf_counter() - t0, "rss_mb": _rss_mb(proc.pid)}
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"{app_path} did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def _median(runs: list) -> dict:
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)):
+            values = [r[key] for r in runs if r[key] is not None]
+            summary[key] = round(statistics.median(values), 3) if values else None
+        else:
+            summary[key] = value
+    return summary
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-server", action="store_true", help="Only measure imports")
+    parser.add_argument("--out", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args()
+
+    report = {"python": platform.python_version(), "repeat": args.repeat}
+    for label, module in (("api", "backend.main"), ("worker", "backend.inference_utils")):
+        report[f"{label}_import"] = _median([measure_import(module) for _ in range(args.repeat)])
+        print(f"⏱️ import {module}: {report[f'{label}_import']['import_s']}s, "
+              f"{report[f'{label}_import']['peak_rss_mb']} MB", file=sys.stderr)
+    if not args.no_server:
+        report["api_server"] = _median([measure_server("backend.main:app") for _ in range(args.repeat)])
+        print(f"⏱️ uvicorn backend.main:app first response: {report['api_server']['first_response_s']}s, "
+              f"{report['api_server']['rss_mb']} MB", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,69 @@
+"""
+Synthetic dashcam-style videos and matching GPS CSVs for benchmarks.
+
+Frames show a textured road with moving lane markings and occasional dark
+"potholes", so decoding and encoding cost resembles real footage (pure solid
+frames compress to almost nothing and would flatter the codec stages).
+"""
+
+import csv
+import math
+
+import cv2
+import numpy as np
+
+
+def make_video(path: str, width: int = 1280, height: int = 720, seconds: float = 10.0,
+               fps: float = 30.0, seed: int = 0) -> int:
+    """Write an mp4v video; returns the number of frames."""
+    rng = np.random.default_rng(seed)
+    n_frames = max(1, int(round(seconds * fps)))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot open VideoWriter for {path}")
+
+    # Static asphalt texture, scrolled vertically to simulate motion
+    texture = rng.normal(90, 18, (height * 2, width)).clip(0, 255).astype(np.uint8)
+    texture = cv2.GaussianBlur(texture, (5, 5), 0)
+    horizon = height // 3
+    potholes = [(int(rng.integers(0, height * 2)), int(rng.integers(width // 4, 3 * width // 4)))
+                for _ in range(8)]
+
+    for i in range(n_frames):
+        offset = (i * max(1, height // 60)) % height
+        road = texture[offset:offset + height].copy()
+        frame = cv2.cvtColor(road, cv2.COLOR_GRAY2BGR)
+        frame[:horizon] = (200, 170, 120)  # sky
+
+        # Dashed center line moving towards the camera
+        for k in range(-1, 6):
+            y = horizon + ((k * height // 6 + offset * 2) % (height - horizon))
+            cv2.line(frame, (width // 2, y), (width // 2, min(height - 1, y + height // 20)),
+                     (230, 230, 230), max(2, width // 200))
+        for py, px in potholes:
+            y = (py - offset) % (height * 2)
+            if horizon < y < height:
+                cv2.ellipse(frame, (px, y), (width // 30, height // 60), 0, 0, 360, (35, 35, 35), -1)
+
+        writer.write(frame)
+    writer.release()
+    return n_frames
+
+
+def make_gps_csv(path: str, seconds: float, hz: float = 1.0, start=(12.9716, 77.5946),
+                 speed_mps: float = 10.0, seed: int = 0) -> int:
+    """Write a lat,lon,timestamp CSV of a gently curving drive; returns the number of points."""
+    rng = np.random.default_rng(seed)
+    n_points = max(2, int(seconds * hz) + 1)
+    lat, lon = start
+    heading = rng.uniform(0, 2 * math.pi)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["lat", "lon", "timestamp"])
+        for i in range(n_points):
+            writer.writerow([f"{lat:.7f}", f"{lon:.7f}", f"{i / hz:.3f}"])
+            heading += rng.normal(0, 0.05)
+            step = speed_mps / hz
+            lat += step * math.cos(heading) / 111_320
+            lon += step * math.sin(heading) / (111_320 * math.cos(math.radians(lat)))
+    return n_points
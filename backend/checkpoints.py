@@ -0,0 +1,33 @@
+# /backend/checkpoints.py
+#
+# Model checkpoints the API can refer to. Requests name a checkpoint, never a
+# path: a name resolves to <name>.pth.tar in the CBAM weights directory.
+# Kept free of torch so the API process can validate names cheaply.
+
+import os
+import re
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "BinaryClassification", "CBAM", "weights")
+CHECKPOINT_SUFFIX = ".pth.tar"
+DEFAULT_CHECKPOINT = "model_best"  # inference_utils.DEFAULT_MODEL_PATH
+# Small checkpoint of cascade inference; its 'arch' entry names the model (e.g. resnet18_cbam)
+CASCADE_MODEL_PATH = os.environ.get(
+    "RAHI_CASCADE_MODEL_PATH", os.path.join(WEIGHTS_DIR, "model_small" + CHECKPOINT_SUFFIX)
+)
+
+
+def list_checkpoints() -> list:
+    """Names of the checkpoints in WEIGHTS_DIR."""
+    if not os.path.isdir(WEIGHTS_DIR):
+        return []
+    return sorted(f[:-len(CHECKPOINT_SUFFIX)] for f in os.listdir(WEIGHTS_DIR) if f.endswith(CHECKPOINT_SUFFIX))
+
+
+def checkpoint_path(name: str) -> str:
+    """Path of a named checkpoint; ValueError if the name is invalid or the file is missing."""
+    if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9_.-]*", name):
+        raise ValueError(f"Invalid checkpoint name: {name}")
+    path = os.path.join(WEIGHTS_DIR, name + CHECKPOINT_SUFFIX)
+    if not os.path.isfile(path):
+        raise ValueError(f"Checkpoint not found: {name}")
+    return path
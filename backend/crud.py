@@ -1,18 +1,33 @@
 from sqlalchemy.orm import Session
-from . import models
+from . import models, metrics
 import os
+import csv
+import json
+import bisect
+import shutil
+import datetime
 import subprocess
+import threading
+import time
+from collections import defaultdict
 from .utils.transcode import transcode_to_h264
+from .utils.simplify import build_tiers, simplify_track, tier_for_zoom
+from .utils.spatial_index import GridIndex, gps_index
+from .utils.geo import geohash_encode, geohash_center
+from .utils.cam_store import meta_path as cam_meta_path
+from .utils.road_segments import locate_segments
+from .utils.previews import preview_dir
 
-def create_video(db: Session, name: str, file_path: str, duration: float):
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+# Seconds before the in-process spatial index is rebuilt, so GPS changes made by
+# other processes (other API workers) show up; 0 keeps it for the process lifetime
+SPATIAL_INDEX_MAX_AGE = float(os.environ.get("RAHI_SPATIAL_INDEX_MAX_AGE", "300"))
+
+def create_video(db: Session, name: str, file_path: str, duration: float, content_hash: str = None):
     # Ensure upload directory exists
-    upload_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-    os.makedirs(upload_dir, exist_ok=True)
-    # Transcode to H.264
-    # transcoded_path = transcode_to_h264(file_path)
-    # Update name and path for DB
-    name = os.path.basename(transcoded_path)
-    video = models.Video(name=name, file_path=transcoded_path, duration=duration)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # The upload endpoint has already transcoded the file to H.264
+    video = models.Video(name=name, file_path=file_path, duration=duration, content_hash=content_hash)
 
     db.add(video)
     db.commit()
@@ -33,7 +48,10 @@ def create_gps_points(db: Session, video_id: int, gps_data: list):
             highlight=row.get("highlight", None),  # optional
         )
         db.add(point)
+    db.flush()
+    rebuild_track_tiers(db, video_id)
     db.commit()
+    reindex_video(db, video_id)
 
 def update_gps_points_with_inference(
     db: Session, video_id: int, frame_timestamps: list, raw_probs: list, smoothed_probs: list = None
@@ -43,15 +61,153 @@ def update_gps_points_with_inference(
     Assign binary highlight = True if smoothed_prob > 0.5 (or raw if smoothed is None)
     """
     gps_points = db.query(models.GPSPoint).filter(models.GPSPoint.video_id == video_id).all()
+    probs = smoothed_probs if smoothed_probs is not None else raw_probs
+    quality_deltas = defaultdict(lambda: [0, 0, 0.0])
     for point in gps_points:
-        # Find nearest frame timestamp
-        nearest_idx = min(range(len(frame_timestamps)), key=lambda i: abs(frame_timestamps[i] - point.timestamp))
-        prob = smoothed_probs[nearest_idx] if smoothed_probs is not None else raw_probs[nearest_idx]
+        # Remove this point's previous contribution to the road-quality grid
+        _add_quality_contribution(quality_deltas, point, sign=-1)
+
+        # Find nearest frame timestamp (frame timestamps are sorted)
+        nearest_idx = _nearest_index(frame_timestamps, point.timestamp)
+        prob = probs[nearest_idx]
         point.highlight = True if prob > 0.5 else False
-        print(point.highlight)
+        point.probability = float(prob)
+        _add_quality_contribution(quality_deltas, point, sign=1)
+    _apply_quality_deltas(db, quality_deltas)
+    rebuild_track_tiers(db, video_id)
+    db.commit()
+    reindex_video(db, video_id)
+
+
+def save_inference_outputs(db: Session, video_id: int, results: dict):
+    """
+    Persist one finished inference run (as returned by
+    inference_utils.run_inference_on_video_async): GPS labels, road segments
+    and the InferenceResult row.
+    """
+    with metrics.stage("gps_match"):
+        update_gps_points_with_inference(
+            db=db,
+            video_id=video_id,
+            frame_timestamps=results["frame_timestamps"],
+            raw_probs=results["raw_probs"],
+            smoothed_probs=results.get("smoothed_probs"),
+        )
+    with metrics.stage("db_segments"):
+        replace_road_segments(db, video_id, results["segments"])
+    return create_inference_result(
+        db=db,
+        video_id=video_id,
+        inference_results_path=results["csv_output"],
+        output_path=results["output_video"],
+        overlay_path=results["overlay"],
+        cam_path=results["cam_path"],
+        heatmap_path=results["heatmap_video"],
+        created_at=results["created_at"],
+        cascade_stats=results.get("cascade"),
+        inference_profile=results.get("inference_profile"),
+    )
+
+
+# --- Road-quality segments ---
+def replace_road_segments(db: Session, video_id: int, segments: list):
+    """
+    Store the run-length label segments of a video's latest inference (see
+    utils.overlay.label_segments) with GPS start/end and length in meters,
+    replacing the segments of any previous run.
+    """
+    located = locate_segments(segments, _track_points(db, video_id))
+    db.query(models.RoadSegment).filter(models.RoadSegment.video_id == video_id).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.RoadSegment, [
+        {
+            "video_id": video_id,
+            "label": seg["label"],
+            "start_time": seg["start"],
+            "end_time": seg["end"],
+            "start_lat": seg["start_lat"],
+            "start_lon": seg["start_lon"],
+            "end_lat": seg["end_lat"],
+            "end_lon": seg["end_lon"],
+            "length_m": seg["length_m"],
+            "mean_probability": seg["mean_probability"],
+            "min_probability": seg["min_probability"],
+        }
+        for seg in located
+    ])
     db.commit()
 
 
+def get_road_segments(
+    db: Session, label: str = None, min_length_m: float = None, video_id: int = None,
+    limit: int = 100, offset: int = 0,
+):
+    query = db.query(models.RoadSegment)
+    if label is not None:
+        query = query.filter(models.RoadSegment.label == label)
+    if min_length_m is not None:
+        query = query.filter(models.RoadSegment.length_m >= min_length_m)
+    if video_id is not None:
+        query = query.filter(models.RoadSegment.video_id == video_id)
+        return query.order_by(models.RoadSegment.start_time).offset(offset).limit(limit).all()
+    return query.order_by(models.RoadSegment.length_m.desc()).offset(offset).limit(limit).all()
+
+
+def _nearest_index(sorted_values: list, value: float) -> int:
+    i = bisect.bisect_left(sorted_values, value)
+    if i == 0:
+        return 0
+    if i == len(sorted_values):
+        return len(sorted_values) - 1
+    return i - 1 if value - sorted_values[i - 1] <= sorted_values[i] - value else i
+
+
+def _track_points(db: Session, video_id: int):
+    points = (
+        db.query(models.GPSPoint)
+        .filter(models.GPSPoint.video_id == video_id)
+        .order_by(models.GPSPoint.timestamp)
+        .all()
+    )
+    return [
+        {"lat": p.lat, "lon": p.lon, "timestamp": p.timestamp, "highlight": p.highlight}
+        for p in points
+    ]
+
+def rebuild_track_tiers(db: Session, video_id: int):
+    """
+    Recompute the simplified level-of-detail tiers for a video's GPS track.
+    Called at ingest, after inference and on GPS point deletes; the caller commits.
+    """
+    db.query(models.GPSTrackTier).filter(models.GPSTrackTier.video_id == video_id).delete()
+    for zoom, segments in build_tiers(_track_points(db, video_id)).items():
+        db.add(models.GPSTrackTier(video_id=video_id, zoom=zoom, segments=json.dumps(segments)))
+
+def get_track_segments(db: Session, video_id: int, zoom: int = None, tolerance: float = None):
+    """
+    Simplified, run-length-merged track segments for a video.
+    An explicit tolerance (meters) is computed on the fly; otherwise the
+    precomputed tier closest to the requested zoom is served.
+    """
+    if tolerance is not None:
+        return simplify_track(_track_points(db, video_id), tolerance)
+
+    tier = (
+        db.query(models.GPSTrackTier)
+        .filter(models.GPSTrackTier.video_id == video_id, models.GPSTrackTier.zoom == tier_for_zoom(zoom))
+        .first()
+    )
+    if tier is None:
+        # Tracks ingested before tiers existed: build them once and serve.
+        rebuild_track_tiers(db, video_id)
+        db.commit()
+        tier = (
+            db.query(models.GPSTrackTier)
+            .filter(models.GPSTrackTier.video_id == video_id, models.GPSTrackTier.zoom == tier_for_zoom(zoom))
+            .first()
+        )
+    return json.loads(tier.segments) if tier else []
+
+
 def get_video_with_gps(db: Session, video_id: int):
     return db.query(models.Video).filter(models.Video.id == video_id).first()
 
@@ -66,52 +222,384 @@ def delete_video(db: Session, video_id: int):
         return True
     return False
 
+def get_video_by_hash(db: Session, content_hash: str):
+    """Earliest video row uploaded with the same content, if any."""
+    return (
+        db.query(models.Video)
+        .filter(models.Video.content_hash == content_hash)
+        .order_by(models.Video.id)
+        .first()
+    )
+
 def get_gps_point(db: Session, gps_point_id: int):
     return db.query(models.GPSPoint).filter(models.GPSPoint.id == gps_point_id).first()
 
 def delete_gps_point(db: Session, gps_point_id: int):
     gps_point = db.query(models.GPSPoint).filter(models.GPSPoint.id == gps_point_id).first()
     if gps_point:
+        video_id = gps_point.video_id
+        quality_deltas = defaultdict(lambda: [0, 0, 0.0])
+        _add_quality_contribution(quality_deltas, gps_point, sign=-1)
+        _apply_quality_deltas(db, quality_deltas)
         db.delete(gps_point)
+        db.flush()
+        rebuild_track_tiers(db, video_id)
         db.commit()
+        reindex_video(db, video_id)
         return True
     return False
 
 def get_inference_results_by_video(db: Session, video_id: int):
     return db.query(models.InferenceResult).filter(models.InferenceResult.video_id == video_id).all()
 
+def get_latest_cam_result(db: Session, video_id: int):
+    return (
+        db.query(models.InferenceResult)
+        .filter(models.InferenceResult.video_id == video_id, models.InferenceResult.cam_path.isnot(None))
+        .order_by(models.InferenceResult.id.desc())
+        .first()
+    )
+
 def create_inference_result(
     db: Session,
     video_id: int,
     inference_results_path: str,
     heatmap_path: str = None,
-    created_at: str = None
+    created_at: str = None,
+    output_path: str = None,
+    overlay_path: str = None,
+    cam_path: str = None,
+    cascade_stats: dict = None,
+    inference_profile: str = None,
 ):
+    if isinstance(created_at, str):
+        created_at = datetime.datetime.fromisoformat(created_at)
     result = models.InferenceResult(
         video_id=video_id,
         inference_results_path=inference_results_path,
+        output_path=output_path,
+        overlay_path=overlay_path,
+        cam_path=cam_path,
         heatmap_path=heatmap_path,
-        created_at=created_at
+        created_at=created_at,
+        cascade_stats=json.dumps(cascade_stats) if cascade_stats else None,
+        inference_profile=inference_profile,
     )
     db.add(result)
     db.commit()
     db.refresh(result)
     return result
 
+def create_model_evaluation(
+    db: Session,
+    video_id: int,
+    job_id: str,
+    checkpoints: list,
+    probs_path: str,
+    report_path: str,
+    output_path: str = None,
+    summary: dict = None,
+):
+    evaluation = models.ModelEvaluation(
+        video_id=video_id,
+        job_id=job_id,
+        checkpoints=json.dumps(checkpoints),
+        probs_path=probs_path,
+        report_path=report_path,
+        output_path=output_path,
+        summary=json.dumps(summary) if summary else None,
+        created_at=datetime.datetime.now(),
+    )
+    db.add(evaluation)
+    db.commit()
+    db.refresh(evaluation)
+    return evaluation
+
+def reuse_inference_results(db: Session, source_video_id: int, video_id: int):
+    """
+    Give a duplicate upload the inference results of the video it duplicates:
+    the copied rows share the source's artifact files, and the latest per-frame
+    CSV is applied to this video's own GPS points and road segments.
+    Returns the number of results copied.
+    """
+    sources = (
+        db.query(models.InferenceResult)
+        .filter(models.InferenceResult.video_id == source_video_id)
+        .order_by(models.InferenceResult.id)
+        .all()
+    )
+    columns = [c.name for c in models.InferenceResult.__table__.columns if c.name not in ("id", "video_id")]
+    for inf in sources:
+        db.add(models.InferenceResult(video_id=video_id, **{c: getattr(inf, c) for c in columns}))
+    db.commit()
+
+    latest = sources[-1] if sources else None
+    has_gps = db.query(models.GPSPoint.id).filter(models.GPSPoint.video_id == video_id).first() is not None
+    csv_path = _stored_file(latest.inference_results_path) if latest else None
+    if has_gps and csv_path and os.path.exists(csv_path):
+        timestamps, raw_probs, smoothed_probs = [], [], []
+        with open(csv_path, newline='') as f:
+            for row in csv.DictReader(f):
+                timestamps.append(float(row['Timestamp_sec']))
+                raw_probs.append(float(row['Raw_Probability']))
+                smoothed_probs.append(float(row['Smoothed_Probability']))
+        update_gps_points_with_inference(db, video_id, timestamps, raw_probs, smoothed_probs)
+        overlay_path = _stored_file(latest.overlay_path) if latest.overlay_path else None
+        if overlay_path and os.path.exists(overlay_path):
+            with open(overlay_path) as f:
+                replace_road_segments(db, video_id, json.load(f)["segments"])
+    return len(sources)
+
+def _stored_file(path: str) -> str:
+    """Disk path of a stored file: absolute paths as-is, 'uploads/...' URLs under UPLOAD_DIR."""
+    if not os.path.isabs(path) and path.split("/", 1)[0] == "uploads":
+        return os.path.join(UPLOAD_DIR, path.split("/", 1)[1])
+    return path
+
+def _remove_stored_file(path: str):
+    path = _stored_file(path)
+    if path.endswith(".m3u8"):
+        # HLS playlist: the directory holds its segments
+        stream_dir = os.path.dirname(path)
+        shutil.rmtree(stream_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(stream_dir))  # <stem>_hls, once its last stream is gone
+        except OSError:
+            pass
+        return
+    related = [path]
+    if path.endswith("_labels.json"):
+        related.append(path[:-len(".json")] + ".vtt")
+    elif path.endswith(".npy"):
+        related.append(cam_meta_path(path))
+    for p in related:
+        if os.path.exists(p):
+            os.remove(p)
+
 def delete_video(db: Session, video_id: int):
+    """
+    Delete a video row with its GPS points and inference results. Stored files
+    are reference counted: the video file and inference artifacts are removed
+    only when no other video (a duplicate upload) still references them.
+    """
     video = db.query(models.Video).filter(models.Video.id == video_id).first()
     if not video:
         return False
 
-    # Delete associated inference files
+    # Delete associated inference files no other video's results share
+    artifact_columns = ("inference_results_path", "output_path", "overlay_path", "heatmap_path", "cam_path")
     inferences = db.query(models.InferenceResult).filter(models.InferenceResult.video_id == video_id).all()
-    for inf in inferences:
-        if inf.inference_results_path and os.path.exists(inf.inference_results_path):
-            os.remove(inf.inference_results_path)
-        if inf.heatmap_path and os.path.exists(inf.heatmap_path):
-            os.remove(inf.heatmap_path)
+    paths = {getattr(inf, col) for inf in inferences for col in artifact_columns} - {None}
+    for path in paths:
+        shared = any(
+            db.query(models.InferenceResult.id)
+            .filter(getattr(models.InferenceResult, col) == path, models.InferenceResult.video_id != video_id)
+            .first()
+            for col in artifact_columns
+        )
+        if not shared:
+            _remove_stored_file(path)
 
-    # InferenceResult rows will be deleted due to ON DELETE CASCADE
+    # Checkpoint evaluations write to their own directory
+    evaluations = db.query(models.ModelEvaluation).filter(models.ModelEvaluation.video_id == video_id).all()
+    for evaluation in evaluations:
+        job_dir = os.path.dirname(_stored_file(evaluation.report_path))
+        shutil.rmtree(job_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(job_dir))  # <name>_eval, once its last job is gone
+        except OSError:
+            pass
+
+    shared_video_file = (
+        db.query(models.Video.id)
+        .filter(models.Video.file_path == video.file_path, models.Video.id != video_id)
+        .first()
+        is not None
+    )
+    if video.file_path and not shared_video_file:
+        if os.path.exists(video.file_path):
+            os.remove(video.file_path)
+        shutil.rmtree(preview_dir(video.file_path), ignore_errors=True)
+
+    # Withdraw the video's points from the fleet-wide road-quality grid
+    quality_deltas = defaultdict(lambda: [0, 0, 0.0])
+    for point in db.query(models.GPSPoint).filter(models.GPSPoint.video_id == video_id).all():
+        _add_quality_contribution(quality_deltas, point, sign=-1)
+    _apply_quality_deltas(db, quality_deltas)
+
+    # Child rows are deleted explicitly instead of relying on ON DELETE CASCADE:
+    # databases created before the foreign keys declared it keep the old constraints
+    # (init_db migrates them on PostgreSQL, SQLite cannot alter a constraint)
+    for child in (models.GPSPoint, models.GPSTrackTier, models.RoadSegment,
+                  models.InferenceResult, models.ModelEvaluation):
+        db.query(child).filter(child.video_id == video_id).delete(synchronize_session=False)
     db.delete(video)
     db.commit()
+    gps_index.remove_video(video_id)
     return True
+
+
+# --- Spatial index over all GPS tracks ---
+def reindex_video(db: Session, video_id: int):
+    """
+    Incrementally refresh one video in the in-process spatial index (if it has
+    been built). Called for changes made in this process, and by the API when a
+    worker job that updated the video's GPS points finishes.
+    """
+    if gps_index.loaded or gps_index.rebuilding:
+        gps_index.replace_video(video_id, _track_points(db, video_id))
+
+def _spatial_index_fresh() -> bool:
+    if not gps_index.loaded:
+        return False
+    return not SPATIAL_INDEX_MAX_AGE or time.monotonic() - gps_index.loaded_at < SPATIAL_INDEX_MAX_AGE
+
+def ensure_spatial_index(db: Session, batch_size: int = 50000):
+    """
+    Build the spatial index from gps_points on first use. Once it is older than
+    SPATIAL_INDEX_MAX_AGE it is rebuilt in a background thread and swapped in,
+    while searches keep using the current one; changes in between are applied
+    incrementally.
+    """
+    if _spatial_index_fresh():
+        return
+    if gps_index.loaded:
+        if gps_index.build_lock.acquire(blocking=False):
+            threading.Thread(
+                target=_rebuild_spatial_index, args=(db.get_bind(), batch_size), daemon=True,
+            ).start()
+        return
+    with gps_index.build_lock:
+        if not gps_index.loaded:
+            _build_spatial_index(db, batch_size)
+
+def _rebuild_spatial_index(bind, batch_size: int):
+    """Background refresh of a stale index; the caller holds gps_index.build_lock."""
+    db = Session(bind=bind)
+    try:
+        _build_spatial_index(db, batch_size)
+    except Exception as e:
+        print(f"[ERROR] Spatial index rebuild failed: {e}")
+    finally:
+        db.close()
+        gps_index.build_lock.release()
+
+def _build_spatial_index(db: Session, batch_size: int):
+    """Read every GPS point into a new GridIndex, then swap it into gps_index."""
+    built = GridIndex(gps_index.cell_deg, gps_index.coarse_factor)
+    started = time.monotonic()
+    gps_index.begin_rebuild()
+    try:
+        rows = (
+            db.query(models.GPSPoint.video_id, models.GPSPoint.lat, models.GPSPoint.lon,
+                     models.GPSPoint.timestamp, models.GPSPoint.highlight)
+            .order_by(models.GPSPoint.video_id)
+            .yield_per(batch_size)
+        )
+        current_id, batch = None, []
+        for video_id, lat, lon, timestamp, highlight in rows:
+            if video_id != current_id or len(batch) >= batch_size:
+                if batch:
+                    built.add_points(current_id, batch)
+                current_id, batch = video_id, []
+            batch.append({"lat": lat, "lon": lon, "timestamp": timestamp, "highlight": highlight})
+        if batch:
+            built.add_points(current_id, batch)
+    except Exception:
+        gps_index.abort_rebuild()
+        raise
+    # Videos updated while the rows were read may be stale in the new index
+    for video_id in gps_index.swap_in(built, started):
+        gps_index.replace_video(video_id, _track_points(db, video_id))
+
+def search_gps_bbox(db: Session, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+    """
+    Videos with GPS points inside the bbox, with matching time range and highlight statistics.
+    """
+    ensure_spatial_index(db)
+    matches = gps_index.query(min_lon, min_lat, max_lon, max_lat)
+    if not matches:
+        return []
+
+    names = dict(
+        db.query(models.Video.id, models.Video.name).filter(models.Video.id.in_(list(matches))).all()
+    )
+    return [
+        {"video_id": video_id, "name": names.get(video_id), **stats}
+        for video_id, stats in sorted(matches.items())
+        if video_id in names
+    ]
+
+
+# --- Fleet-wide road-quality aggregation grid ---
+# Geohash lengths kept in road_quality_cells (~4.9 km, ~1.2 km, ~153 m, ~38 m cells).
+QUALITY_PRECISIONS = (5, 6, 7, 8)
+
+def quality_precision_for_zoom(zoom: int) -> int:
+    if zoom <= 9:
+        return 5
+    if zoom <= 12:
+        return 6
+    if zoom <= 15:
+        return 7
+    return 8
+
+def _add_quality_contribution(deltas: dict, point, sign: int):
+    """Accumulate a point's (good, bad, probability) into per-cell deltas; unscored points contribute nothing."""
+    if point.probability is None or point.highlight is None or point.lat is None or point.lon is None:
+        return
+    for precision in QUALITY_PRECISIONS:
+        delta = deltas[(precision, geohash_encode(point.lat, point.lon, precision))]
+        if point.highlight:
+            delta[0] += sign
+        else:
+            delta[1] += sign
+        delta[2] += sign * point.probability
+
+def _apply_quality_deltas(db: Session, deltas: dict, chunk_size: int = 500):
+    """
+    Apply accumulated deltas to road_quality_cells; the caller commits.
+    Existing cells are incremented in SQL so concurrent jobs do not lose updates.
+    """
+    by_precision = defaultdict(list)
+    for precision, geohash in deltas:
+        by_precision[precision].append(geohash)
+
+    Cell = models.RoadQualityCell
+    for precision, all_hashes in by_precision.items():
+        for start in range(0, len(all_hashes), chunk_size):
+            hashes = all_hashes[start:start + chunk_size]
+            existing = {
+                cell.geohash: cell
+                for cell in db.query(Cell).filter(Cell.precision == precision, Cell.geohash.in_(hashes))
+            }
+            for geohash in hashes:
+                good, bad, prob_sum = deltas[(precision, geohash)]
+                cell = existing.get(geohash)
+                if cell is not None:
+                    cell.good_count = Cell.good_count + good
+                    cell.bad_count = Cell.bad_count + bad
+                    cell.probability_sum = Cell.probability_sum + prob_sum
+                elif good > 0 or bad > 0:
+                    lat, lon = geohash_center(geohash)
+                    db.add(Cell(
+                        precision=precision, geohash=geohash, lat=lat, lon=lon,
+                        good_count=good, bad_count=bad, probability_sum=prob_sum,
+                    ))
+            db.flush()
+            db.query(Cell).filter(
+                Cell.precision == precision,
+                Cell.geohash.in_(hashes),
+                Cell.good_count + Cell.bad_count <= 0,
+            ).delete(synchronize_session=False)
+
+def get_quality_cells(db: Session, precision: int, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+    return (
+        db.query(models.RoadQualityCell)
+        .filter(
+            models.RoadQualityCell.precision == precision,
+            models.RoadQualityCell.lat.between(min_lat, max_lat),
+            models.RoadQualityCell.lon.between(min_lon, max_lon),
+        )
+        .all()
+    )
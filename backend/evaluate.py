@@ -0,0 +1,301 @@
+# /backend/evaluate.py
+#
+# Compare model checkpoints on one video with a single decode:
+#     python -m backend.evaluate drive.mp4 --checkpoints weights/model_best.pth.tar weights/model_small.pth.tar
+#
+# A decoder thread reads and preprocesses every frame once; each batch is then
+# scored by every checkpoint in turn. Per-checkpoint probabilities go to
+# probs.npz, and report.json compares them (pairwise label agreement, Cohen's
+# kappa, and the time ranges where the checkpoints disagree). An annotated
+# comparison video is rendered only on request, in a second decode pass.
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from .inference_utils import DEFAULT_PROFILE, DEVICE, INFERENCE_PROFILES, _upload_url, get_model, preprocess
+from .progress import progress_bus
+from . import metrics
+from .utils.smoothing import SMOOTHING_METHODS, smooth
+from .utils.transcode import transcode_to_h264
+
+
+# --- Shared decode ---
+def _put(frames: queue.Queue, item, stop: threading.Event) -> bool:
+    """Queue an item unless the consumer has stopped; False once it has."""
+    while not stop.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _decode_worker(cap, inference_profile: str, frames: queue.Queue, stop: threading.Event):
+    try:
+        while not stop.is_set():
+            with metrics.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            with metrics.stage("preprocess"):
+                if not _put(frames, preprocess(frame, inference_profile), stop):
+                    break
+    except Exception as e:
+        _put(frames, e, stop)
+    finally:
+        _put(frames, None, stop)
+
+
+def decoded_batches(cap, batch_size: int, inference_profile: str = DEFAULT_PROFILE):
+    """
+    (N, C, H, W) batches of preprocessed frames, decoded ahead by a background
+    thread. The thread has stopped using cap once the generator is closed,
+    exhausted or abandoned on an exception, so the caller can release it.
+    """
+    frames = queue.Queue(maxsize=batch_size * 4)
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decode_worker, args=(cap, inference_profile, frames, stop), daemon=True)
+    decoder.start()
+    try:
+        batch = []
+        while True:
+            item = frames.get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield torch.stack(batch)
+                batch = []
+        if batch:
+            yield torch.stack(batch)
+    finally:
+        stop.set()
+        # Unblock a decoder waiting on a full queue, then wait for it to let go of cap
+        while decoder.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        decoder.join()
+
+
+# --- Comparison ---
+def _mean(values) -> float:
+    """Rounded mean, None for no values (np.mean would give NaN, which is not valid JSON)"""
+    return round(float(np.mean(values)), 4) if len(values) else None
+
+
+def _cohen_kappa(a: np.ndarray, b: np.ndarray) -> float:
+    if not len(a):
+        return None
+    po = float(np.mean(a == b))
+    pa, pb = float(np.mean(a)), float(np.mean(b))
+    pe = pa * pb + (1 - pa) * (1 - pb)
+    return 1.0 if pe >= 1 else round((po - pe) / (1 - pe), 4)
+
+
+def compare_checkpoints(timestamps: list, frame_duration: float, raw: dict, smoothed: dict) -> dict:
+    """
+    Per-checkpoint label statistics, pairwise agreement of raw and smoothed
+    labels, and run-length ranges of frames where the smoothed labels disagree
+    ({"start", "end", "frames", "good_fraction": {checkpoint: ...}}).
+    """
+    names = list(raw)
+    labels = {n: np.asarray(smoothed[n]) > 0.5 for n in names}
+    raw_labels = {n: np.asarray(raw[n]) > 0.5 for n in names}
+
+    checkpoints = {
+        n: {"mean_probability": _mean(raw[n]), "good_fraction": _mean(labels[n])}
+        for n in names
+    }
+    pairs = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            pairs.append({
+                "checkpoints": [a, b],
+                "label_agreement": _mean(raw_labels[a] == raw_labels[b]),
+                "smoothed_label_agreement": _mean(labels[a] == labels[b]),
+                "kappa": _cohen_kappa(labels[a], labels[b]),
+                "mean_abs_prob_diff": _mean(np.abs(np.asarray(raw[a]) - np.asarray(raw[b]))),
+            })
+
+    stacked = np.stack([labels[n] for n in names])
+    disagree = stacked.min(axis=0) != stacked.max(axis=0)
+    ranges = []
+    # Run boundaries: indices where the disagreement flag flips
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], disagree, [False])).astype(np.int8)))
+    for start, end in zip(edges[::2], edges[1::2]):
+        ranges.append({
+            "start": round(timestamps[start], 3),
+            "end": round(timestamps[end] if end < len(timestamps) else timestamps[-1] + frame_duration, 3),
+            "frames": int(end - start),
+            "good_fraction": {n: _mean(labels[n][start:end]) for n in names},
+        })
+
+    return {
+        "checkpoints": checkpoints,
+        "pairs": pairs,
+        "disagreement_frames": int(disagree.sum()),
+        "disagreement_fraction": _mean(disagree) or 0.0,
+        "disagreements": ranges,
+    }
+
+
+# --- Evaluation ---
+def run_evaluation(
+    video_path: str,
+    checkpoints: dict,
+    out_dir: str,
+    batch_size: int = 8,
+    inference_profile: str = DEFAULT_PROFILE,
+    smoothing: str = "ema",
+    render: bool = False,
+    progress_id: str = None,
+) -> dict:
+    """
+    Score video_path with every checkpoint ({name: path}) from one decode
+    pass. Writes probs.npz (timestamps plus raw and smoothed probabilities per
+    checkpoint) and report.json to out_dir, and with render=True a comparison
+    video with each checkpoint's label. Returns the output paths and report.
+    """
+    models = {name: get_model(path) for name, path in checkpoints.items()}
+    os.makedirs(out_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if progress_id:
+        progress_bus.start(progress_id, total=max(1, total_frames))
+
+    raw = {name: [] for name in models}
+    forward_s = {name: 0.0 for name in models}
+    t_start = time.perf_counter()
+    scored = 0
+    batches = decoded_batches(cap, batch_size, inference_profile)
+    try:
+        for batch in batches:
+            inputs = batch.to(DEVICE)
+            for name, model in models.items():
+                t0 = time.perf_counter()
+                with metrics.stage("forward_batch"), torch.no_grad():
+                    raw[name].extend(torch.sigmoid(model(inputs)).view(-1).tolist())
+                forward_s[name] += time.perf_counter() - t0
+            scored += len(batch)
+            metrics.frames_total.inc(len(batch), source="eval")
+            if progress_id:
+                progress_bus.update(progress_id, scored)
+    finally:
+        batches.close()  # stops and joins the decoder thread before cap is released
+        cap.release()
+    wall = time.perf_counter() - t_start
+    if scored == 0:
+        raise ValueError(f"No frames could be decoded from {video_path}")
+
+    timestamps = [i / fps for i in range(scored)] if fps > 0 else [0.0] * scored
+    with metrics.stage("smoothing"):
+        smoothed = {name: smooth(probs, smoothing) for name, probs in raw.items()}
+
+    report = {
+        "video": os.path.basename(video_path),
+        "frames": scored,
+        "fps": fps,
+        "smoothing": smoothing,
+        "inference_profile": inference_profile,
+        "wall_seconds": round(wall, 3),
+        **compare_checkpoints(timestamps, 1.0 / fps if fps > 0 else 0.0, raw, smoothed),
+    }
+    for name in models:
+        report["checkpoints"][name]["file"] = os.path.basename(checkpoints[name])
+        report["checkpoints"][name]["forward_seconds"] = round(forward_s[name], 3)
+
+    probs_path = os.path.join(out_dir, "probs.npz")
+    report_path = os.path.join(out_dir, "report.json")
+    with metrics.stage("write_outputs"):
+        np.savez_compressed(
+            probs_path,
+            timestamps=np.asarray(timestamps, dtype=np.float32),
+            **{f"raw/{n}": np.asarray(p, dtype=np.float32) for n, p in raw.items()},
+            **{f"smoothed/{n}": np.asarray(p, dtype=np.float32) for n, p in smoothed.items()},
+        )
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    output_video = None
+    if render:
+        if progress_id:
+            progress_bus.set_status(progress_id, "rendering")
+        output_video = render_comparison(video_path, os.path.join(out_dir, "comparison.mp4"), smoothed)
+
+    print(f"📊 Evaluated {len(models)} checkpoints on {scored} frames in {wall:.1f}s, "
+          f"disagreement {report['disagreement_fraction']:.1%}")
+    return {
+        "probs_path": _upload_url(probs_path),
+        "report_path": _upload_url(report_path),
+        "output_video": _upload_url(output_video) if output_video else None,
+        "report": report,
+    }
+
+
+def render_comparison(video_path: str, output_path: str, smoothed: dict) -> str:
+    """Re-decode the video and draw every checkpoint's smoothed label; frames where they disagree get a red border."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    names = list(smoothed)
+    frame_idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret or frame_idx >= len(smoothed[names[0]]):
+            break
+        labels = []
+        for row, name in enumerate(names):
+            p = smoothed[name][frame_idx]
+            labels.append(p > 0.5)
+            color = (0, 255, 0) if p > 0.5 else (0, 0, 255)
+            cv2.putText(frame, f"{name}: {'Good' if p > 0.5 else 'Bad'} ({p:.2f})", (20, 40 + 35 * row),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2, cv2.LINE_AA)
+        if len(set(labels)) > 1:
+            cv2.rectangle(frame, (0, 0), (size[0] - 1, size[1] - 1), (0, 0, 255), 6)
+        with metrics.stage("encode"):
+            out.write(frame)
+        frame_idx += 1
+    cap.release()
+    out.release()
+    return transcode_to_h264(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model checkpoints on one video (single decode pass)")
+    parser.add_argument("video")
+    parser.add_argument("--checkpoints", nargs="+", required=True, help="Checkpoint paths (name = file name)")
+    parser.add_argument("--out", default="evaluation", help="Output directory")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(INFERENCE_PROFILES))
+    parser.add_argument("--smoothing", default="ema", choices=SMOOTHING_METHODS)
+    parser.add_argument("--render", action="store_true", help="Also render a comparison video")
+    args = parser.parse_args()
+
+    checkpoints = {os.path.basename(p).split(".")[0]: p for p in args.checkpoints}
+    if len(checkpoints) != len(args.checkpoints):
+        parser.error("checkpoint file names must be distinct")
+    results = run_evaluation(args.video, checkpoints, args.out, batch_size=args.batch_size,
+                             inference_profile=args.profile, smoothing=args.smoothing, render=args.render)
+    print(json.dumps({k: v for k, v in results["report"].items() if k != "disagreements"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# /backend/gps_routes.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import async_crud, crud, database
+from .utils.geo import tile_bbox
+
+router = APIRouter()
+
+
+def _parse_bbox(bbox: str):
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be 'min_lon,min_lat,max_lon,max_lat'")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=422, detail="bbox min values must not exceed max values")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+@router.get("/gps/search")
+async def search_gps(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    min_lon, min_lat, max_lon, max_lat = _parse_bbox(bbox)
+    videos = await async_crud.search_gps_bbox(db, min_lon, min_lat, max_lon, max_lat)
+    return {"bbox": [min_lon, min_lat, max_lon, max_lat], "videos": videos}
+
+
+@router.get("/gps/quality/tiles/{z}/{x}/{y}")
+async def get_quality_tile(z: int, x: int, y: int, response: Response, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Pre-aggregated fleet-wide road quality for one slippy-map tile.
+    The geohash precision of the returned cells grows with the zoom level.
+    """
+    if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    min_lon, min_lat, max_lon, max_lat = tile_bbox(z, x, y)
+    precision = crud.quality_precision_for_zoom(z)
+    cells = await async_crud.get_quality_cells(db, precision, min_lon, min_lat, max_lon, max_lat)
+
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return {
+        "z": z, "x": x, "y": y,
+        "precision": precision,
+        "cells": [
+            {
+                "geohash": c.geohash,
+                "lat": c.lat,
+                "lon": c.lon,
+                "good": c.good_count,
+                "bad": c.bad_count,
+                "mean_probability": c.probability_sum / (c.good_count + c.bad_count),
+            }
+            for c in cells
+        ],
+    }
+
+
+@router.get("/segments")
+async def list_road_segments(
+    label: str = Query(default=None, pattern="^(Good|Bad)$"),
+    min_length_m: float = Query(default=None, ge=0, description="Only segments at least this long"),
+    video_id: int = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Road-quality segments from the latest inference of each video, e.g.
+    `?label=Bad&min_length_m=50`. Longest first, or in time order for one video.
+    """
+    segments = await async_crud.get_road_segments(db, label, min_length_m, video_id, limit, offset)
+    return [
+        {
+            "id": s.id,
+            "video_id": s.video_id,
+            "label": s.label,
+            "start_time": s.start_time,
+            "end_time": s.end_time,
+            "start": [s.start_lat, s.start_lon] if s.start_lat is not None else None,
+            "end": [s.end_lat, s.end_lon] if s.end_lat is not None else None,
+            "length_m": s.length_m,
+            "mean_probability": s.mean_probability,
+            "min_probability": s.min_probability,
+        }
+        for s in segments
+    ]
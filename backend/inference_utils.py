@@ -1,175 +1,741 @@
 import asyncio
+import datetime
+import math
 import os
+import threading
+import time
+import uuid
 import cv2
 import torch
 from torchvision import transforms
 from PIL import Image
 import csv
 import numpy as np
-from collections import deque
 from tqdm import tqdm
 from backend.BinaryClassification.CBAM.gradcam import GradCAM
 import backend.BinaryClassification.CBAM.resnet_cbam as resnet_cbam
 from .utils.transcode import transcode_to_h264
+from .utils.hls import HLSWriter
+from .utils.cam_store import CamWriter, cam_to_uint8
+from .utils.smoothing import LABEL_METHODS, StreamingSmoother, smooth
+from .utils.overlay import label_segments, write_json_sidecar, write_webvtt
+from .progress import progress_bus
+from . import metrics
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "BinaryClassification", "CBAM", "weights", "model_best.pth.tar",
+)
+
+DEVICE = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+
+# --- Inference profiles: model input resolution (height, width) ---
+# The model was trained at 512x384 ("default"); the network pools adaptively,
+# so it accepts any size. CPU cost scales with pixel count: compare speed and
+# label agreement per profile with `python -m backend.benchmarks.bench_profiles`.
+INFERENCE_PROFILES = {
+    "fast": (256, 192),
+    "balanced": (384, 288),
+    "default": (512, 384),
+    "accurate": (640, 480),
+}
+DEFAULT_PROFILE = "default"
+
+_transforms = {}
+
+
+def frame_transform(inference_profile: str = DEFAULT_PROFILE):
+    """Training preprocessing (resize + ImageNet normalization) at the profile's resolution."""
+    if inference_profile not in INFERENCE_PROFILES:
+        raise ValueError(f"Unknown inference profile: {inference_profile} (expected one of {sorted(INFERENCE_PROFILES)})")
+    transform = _transforms.get(inference_profile)
+    if transform is None:
+        transform = _transforms[inference_profile] = transforms.Compose([
+            transforms.Resize(INFERENCE_PROFILES[inference_profile]),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                                 std=[0.229, 0.224, 0.225])
+        ])
+    return transform
 
-progress_tracker = {}
-
-# --- Temporal smoothing ---
-def apply_moving_average(probs, window_size=7):
-    smoothed = []
-    dq = deque(maxlen=window_size)
-    for p in probs:
-        dq.append(p)
-        smoothed.append(np.mean(dq))
-    return smoothed
-
-def apply_ema(probs, alpha=0.3):
-    smoothed = []
-    for i, p in enumerate(probs):
-        if i == 0:
-            smoothed.append(p)
-        else:
-            smoothed.append(alpha * p + (1 - alpha) * smoothed[-1])
-    return smoothed
 
+# Same preprocessing as used during training
+FRAME_TRANSFORM = frame_transform(DEFAULT_PROFILE)
 
-# --- Main async inference wrapper ---
-async def run_inference_on_video_async(
-    video_path: str,
-    video_id: str,
-    model_path: str,
-    generate_heatmap: bool = True,
-    smoothing: str = "moving_average"
-):
-    """
-    Async wrapper that runs inference in a thread pool
-    and updates progress_tracker for UI polling.
-    """
 
-    def _run_inference():
-        DEVICE = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+# --- Model loading ---
+_model_cache = {}  # (abs path, mtime) -> eval-mode model
+_model_cache_lock = threading.Lock()
 
-        # Load model
-        model = resnet_cbam.resnet101_cbam(pretrained=False)
+
+def load_model(model_path: str):
+    """
+    Fresh eval-mode CBAM ResNet from a checkpoint. The architecture comes from
+    the checkpoint's 'arch' entry (one of resnet_cbam.ARCHITECTURES, e.g.
+    'resnet18_cbam'); older checkpoints without it are matched by layer layout.
+    """
+    with metrics.stage("model_load"):
         checkpoint = torch.load(model_path, map_location=DEVICE)
+        arch = checkpoint.get('arch') or resnet_cbam.arch_from_state_dict(checkpoint['state_dict'])
+        if arch not in resnet_cbam.ARCHITECTURES:
+            raise ValueError(
+                f"Checkpoint {os.path.basename(model_path)} has an unsupported architecture {arch!r} "
+                f"(expected one of {sorted(resnet_cbam.ARCHITECTURES)})"
+            )
+        factory = resnet_cbam.ARCHITECTURES[arch][0]
+        model = factory(pretrained=False)
         model.load_state_dict(checkpoint['state_dict'])
         model = model.to(DEVICE)
         model.eval()
+    return model
 
-        gradcam = GradCAM(model, model.layer4[-1].conv3) if generate_heatmap else None
 
-        transform = transforms.Compose([
-            transforms.Resize((512, 384)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                 std=[0.229, 0.224, 0.225])
-        ])
+def get_model(model_path: str):
+    """
+    Resident model shared by jobs that only score frames (loaded once per
+    checkpoint file and reloaded when the file changes). Grad-CAM registers
+    hooks on the model, so heatmap jobs use their own copy from load_model.
+    """
+    key = (os.path.abspath(model_path), os.path.getmtime(model_path))
+    with _model_cache_lock:
+        model = _model_cache.get(key)
+        if model is None:
+            for stale in [k for k in _model_cache if k[0] == key[0]]:
+                del _model_cache[stale]
+            model = _model_cache[key] = load_model(model_path)
+    return model
+
+
+# --- Cascade: small checkpoint on every frame, full model only where it is unsure ---
+from .checkpoints import CASCADE_MODEL_PATH  # noqa: E402  (kept torch-free for the API process)
+DEFAULT_CASCADE_BAND = 0.15  # escalate when |p - 0.5| < band
+DEFAULT_AUDIT_RATE = 0.05  # share of confident frames also scored by the full model
+
+
+class CascadeStats:
+    """Per-job cascade counters: escalated frames and agreement with the full model's labels."""
+
+    def __init__(self, band: float):
+        self.band = band
+        self.frames = 0
+        self.escalated = self.escalated_agree = 0
+        self.audited = self.audited_agree = 0
+
+    def record(self, fast_p: float, full_p: float, escalated: bool):
+        self.frames += 1
+        if full_p is None:
+            return
+        agree = (fast_p > 0.5) == (full_p > 0.5)
+        if escalated:
+            self.escalated += 1
+            self.escalated_agree += agree
+        else:
+            self.audited += 1
+            self.audited_agree += agree
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
+    def report(self) -> dict:
+        confident = self.frames - self.escalated
+        if confident == 0:
+            audit_agreement = 1.0
+        else:
+            audit_agreement = self.audited_agree / self.audited if self.audited else None
+        return {
+            "band": self.band,
+            "frames": self.frames,
+            "escalated": self.escalated,
+            "escalated_fraction": round(self.escalated / self.frames, 4) if self.frames else 0.0,
+            "audited": self.audited,
+            # Escalated frames carry the full model's label; confident ones are estimated from the audit sample
+            "label_agreement": (
+                round((self.escalated + confident * audit_agreement) / self.frames, 4)
+                if self.frames and audit_agreement is not None else None
+            ),
+            # How often the small model alone would already have been right inside the band
+            "fast_agreement_in_band": round(self.escalated_agree / self.escalated, 4) if self.escalated else None,
+        }
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        progress_tracker[str(video_id)] = {"current": 0, "total": total_frames, "status": "running"}
+class CascadeScorer:
+    """
+    Scores a batch with the small model and re-scores with the full model
+    only the frames whose probability lies within `band` of the 0.5
+    threshold. Every 1/audit_rate-th confident frame is also scored by the
+    full model (its label is not changed) to measure agreement.
+    """
 
-        base_dir = os.path.dirname(video_path)
-        base_name = os.path.splitext(os.path.basename(video_path))[0]
-        output_video_path = os.path.join(base_dir, f"{base_name}_inference.mp4")
-        heatmap_video_path = os.path.join(base_dir, f"{base_name}_heatmap.mp4")
-        csv_output_path = os.path.join(base_dir, f"{base_name}_predictions.csv")
+    def __init__(self, fast_model, full_model, band: float = DEFAULT_CASCADE_BAND,
+                 audit_rate: float = DEFAULT_AUDIT_RATE):
+        self.fast_model = fast_model
+        self.full_model = full_model
+        self.band = band
+        self.audit_every = max(1, round(1 / audit_rate)) if audit_rate > 0 else 0
+        self._confident = 0
+
+    def __call__(self, batch, stats: list) -> list:
+        """Probabilities for an (N, C, H, W) batch on DEVICE; stats[i] records frame i."""
+        with torch.no_grad():
+            with metrics.stage("forward_fast"):
+                fast = torch.sigmoid(self.fast_model(batch)).view(-1).tolist()
+
+            escalate, audit = [], []
+            for i, p in enumerate(fast):
+                if abs(p - 0.5) < self.band:
+                    escalate.append(i)
+                    continue
+                if self.audit_every and self._confident % self.audit_every == 0:
+                    audit.append(i)
+                self._confident += 1
+
+            full = {}
+            if escalate or audit:
+                rerun = escalate + audit
+                with metrics.stage("forward_full"):
+                    output = self.full_model(batch[rerun])
+                full = dict(zip(rerun, torch.sigmoid(output).view(-1).tolist()))
+
+        escalated = set(escalate)
+        probs = []
+        for i, p in enumerate(fast):
+            stats[i].record(p, full.get(i), i in escalated)
+            probs.append(full[i] if i in escalated else p)
+        metrics.cascade_frames_total.inc(len(escalate), route="full")
+        metrics.cascade_frames_total.inc(len(fast) - len(escalate), route="fast")
+        return probs
+
+
+def cam_target_layer(model):
+    """Last convolution of the final residual block (conv3 for Bottleneck, conv2 for BasicBlock)."""
+    block = model.layer4[-1]
+    return getattr(block, "conv3", block.conv2)
+
+
+def preprocess(frame, inference_profile: str = DEFAULT_PROFILE):
+    """BGR frame -> normalized CHW tensor (no batch dimension) at the profile's resolution."""
+    return frame_transform(inference_profile)(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+
+
+def artifact_stem(video_path: str) -> str:
+    """
+    <video stem>_<run id>: each run writes its own output files. Uploads are
+    stored by content hash, so rows of duplicate uploads share results
+    (crud.reuse_inference_results); a later run must never rewrite them.
+    """
+    return f"{os.path.splitext(os.path.basename(video_path))[0]}_{uuid.uuid4().hex[:8]}"
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
-        out_heatmap = cv2.VideoWriter(heatmap_video_path, fourcc, fps, (frame_width, frame_height)) if generate_heatmap else None
 
-        raw_probs, frames, timestamps = [], [], []
+def _upload_url(path: str) -> str:
+    """Path of an output file relative to the /uploads mount, e.g. 'uploads/x_hls/inference/index.m3u8'."""
+    rel = os.path.relpath(os.path.abspath(path), UPLOAD_DIR)
+    if rel.startswith(".."):
+        rel = os.path.basename(path)
+    return "uploads/" + rel.replace(os.sep, "/")
 
-        with tqdm(total=total_frames, desc=f"Inference on {base_name}", unit="frame") as pbar:
-            for frame_idx in range(total_frames):
-                ret, frame = cap.read()
-                if not ret:
-                    break
+def _release_quietly(writer):
+    """Release a writer after a failure without masking the original error."""
+    try:
+        writer.release()
+    except Exception as e:
+        print(f"⚠️ Releasing {type(writer).__name__} after a failure: {e}")
+
+def _annotate(frame, smooth_p):
+    pred_label = 1 if smooth_p > 0.5 else 0
+    label_text = 'Good' if pred_label else 'Bad'
+    color = (0, 255, 0) if pred_label else (0, 0, 255)
+    cv2.putText(frame, f"{label_text} ({smooth_p:.2f})", (30, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 2, color, 3)
+    return label_text
+
+
+def _heatmap_frame(gradcam, input_tensor, frame_width, frame_height):
+    heatmap = gradcam.generate(input_tensor, class_idx=0)
+    heatmap = cv2.resize(heatmap, (frame_width, frame_height))
+    heatmap = np.uint8(255 * heatmap)
+    return cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
 
-                timestamp_sec = frame_idx / fps
-                timestamps.append(timestamp_sec)
-                frames.append(frame.copy())
 
-                img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                pil_img = Image.fromarray(img_rgb)
-                input_tensor = transform(pil_img).unsqueeze(0).to(DEVICE)
+def write_label_outputs(base_dir: str, base_name: str, fps: float, timestamps: list,
+                        raw_probs: list, smoothed_probs: list, smoothing: str, frame_indices: list = None) -> dict:
+    """
+    Write the per-frame CSV and the run-length label segments (JSON sidecar +
+    WebVTT) of one scored video. Returns the result fields shared by every
+    inference path (single job, batch). frame_indices gives the CSV's Frame
+    column when not every frame was scored (default 0, 1, 2, ...).
+    """
+    overlay_json_path = os.path.join(base_dir, f"{base_name}_labels.json")
+    overlay_vtt_path = os.path.join(base_dir, f"{base_name}_labels.vtt")
+    csv_output_path = os.path.join(base_dir, f"{base_name}_predictions.csv")
+
+    # --- Run-length label segments: timed overlay metadata + road-quality events ---
+    segments = label_segments(
+        timestamps, smoothed_probs,
+        frame_duration=1.0 / fps if fps > 0 else 0.0,
+        values=raw_probs if smoothing in LABEL_METHODS else None,
+    )
+    write_json_sidecar(segments, overlay_json_path, fps=fps, frame_count=len(timestamps))
+    write_webvtt(segments, overlay_vtt_path)
+
+    # --- Write results ---
+    with open(csv_output_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Frame', 'Timestamp_sec', 'Raw_Probability', 'Smoothed_Probability', 'Predicted_Label'])
+        frames = frame_indices if frame_indices is not None else range(len(timestamps))
+        for idx, raw_p, smooth_p, ts in zip(frames, raw_probs, smoothed_probs, timestamps):
+            label_text = 'Good' if smooth_p > 0.5 else 'Bad'
+            writer.writerow([idx, f"{ts:.2f}", f"{raw_p:.4f}", f"{smooth_p:.4f}", label_text])
+
+    return {
+        "overlay": _upload_url(overlay_json_path),
+        "overlay_vtt": _upload_url(overlay_vtt_path),
+        "csv_output": _upload_url(csv_output_path),
+        "created_at": str(datetime.datetime.now()),
+        "frame_timestamps": timestamps,
+        "raw_probs": raw_probs,
+        "smoothed_probs": smoothed_probs,
+        "segments": segments,
+    }
+
+
+# --- Sparse (GPS-driven) scoring: only the frames the GPS labels are read from ---
+SPARSE_SEEK_GAP = 90  # frames; longer jumps seek (decodes from the previous keyframe) instead of reading through
+SPARSE_BATCH_SIZE = 8
+
+
+def sparse_frame_plan(gps_timestamps: list, fps: float, total_frames: int, neighbors: int) -> dict:
+    """
+    {center frame: window of frame indices} per GPS timestamp, sorted by frame.
+    The center is the frame nearest the timestamp (the one
+    crud.update_gps_points_with_inference reads), the window adds `neighbors`
+    frames on each side.
+    """
+    last = max(0, total_frames - 1)
+    plan = {}
+    for ts in gps_timestamps:
+        center = min(last, max(0, int(round(ts * fps))))
+        plan[center] = range(max(0, center - neighbors), min(last, center + neighbors) + 1)
+    return dict(sorted(plan.items()))
 
-                with torch.no_grad():
-                    output = model(input_tensor)
-                    prob = torch.sigmoid(output).item()
 
-                raw_probs.append(prob)
+def run_sparse_inference(
+    video_path: str,
+    video_id: str,
+    model_path: str,
+    gps_timestamps: list,
+    neighbors: int = 2,
+    inference_profile: str = DEFAULT_PROFILE,
+    scorer=None,
+    cascade_stats: list = None,
+) -> dict:
+    """
+    Score only the frame windows around each GPS timestamp (sparse_frame_plan)
+    and return results in the shape of the full job, with one row per GPS
+    point: raw = center frame, smoothed = mean of its window. No videos or
+    heatmaps are rendered; label sidecars and segments span the sampled times
+    and are written as <stem>_sparse_* (the CSV lists the center frames).
+    With a CascadeScorer, pass a one-element cascade_stats list for its counters.
+    """
+    model = get_model(model_path)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if fps <= 0:
+            raise ValueError(f"Cannot map GPS timestamps to frames: no frame rate in {video_path}")
+
+        plan = sparse_frame_plan(gps_timestamps, fps, total_frames, neighbors)
+        needed = sorted({i for window in plan.values() for i in window})
+        progress_bus.start(str(video_id), total=max(1, len(needed)))
+
+        probs = {}  # frame index -> probability
+        batch, batch_idx = [], []
+
+        def flush():
+            if not batch:
+                return
+            inputs = torch.stack(batch).to(DEVICE)
+            with metrics.stage("forward"):
+                if scorer:
+                    batch_probs = scorer(inputs, cascade_stats * len(batch))
+                else:
+                    with torch.no_grad():
+                        batch_probs = torch.sigmoid(model(inputs)).view(-1).tolist()
+            probs.update(zip(batch_idx, batch_probs))
+            batch.clear()
+            batch_idx.clear()
+            progress_bus.update(str(video_id), len(probs))
+
+        position = 0  # index of the frame the next cap.read() returns
+        base_name = os.path.splitext(os.path.basename(video_path))[0]
+        with tqdm(total=len(needed), desc=f"Sparse inference on {base_name}", unit="frame") as pbar:
+            for idx in needed:
+                with metrics.stage("decode"):
+                    if idx - position > SPARSE_SEEK_GAP:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                        position = idx
+                    # Nearby frames: grab() skips the color conversion of frames we do not score
+                    while position < idx and cap.grab():
+                        position += 1
+                    ret, frame = cap.read()
+                if not ret:
+                    break  # container frame counts can be estimates
+                position += 1
+                with metrics.stage("preprocess"):
+                    batch.append(preprocess(frame, inference_profile))
+                batch_idx.append(idx)
+                if len(batch) >= SPARSE_BATCH_SIZE:
+                    flush()
                 pbar.update(1)
-                progress_tracker[str(video_id)]["current"] = frame_idx + 1
+            flush()
+    finally:
+        cap.release()
 
+    centers = [c for c in plan if c in probs]
+    timestamps = [c / fps for c in centers]
+    raw_probs = [probs[c] for c in centers]
+    smoothed_probs = []
+    for c in centers:
+        window = [probs[i] for i in plan[c] if i in probs]
+        smoothed_probs.append(sum(window) / len(window))
+
+    with metrics.stage("write_outputs"):
+        # Own stem: the CSV and sidecars of earlier full runs stay untouched
+        outputs = write_label_outputs(
+            os.path.dirname(video_path), f"{artifact_stem(video_path)}_sparse", fps, timestamps, raw_probs, smoothed_probs,
+            "moving_average", frame_indices=centers,
+        )
+    print(f"🛰️ Sparse: scored {len(probs)} of {total_frames} frames for {len(plan)} GPS points")
+
+    return {
+        "output_video": None,
+        "heatmap_video": None,
+        "cam_path": None,
+        "cascade": cascade_stats[0].report() if cascade_stats else None,
+        "inference_profile": inference_profile,
+        "sparse": {"gps_points": len(plan), "frames_scored": len(probs), "frames_total": total_frames,
+                   "neighbors": neighbors},
+        **outputs,
+    }
+
+
+# --- On-demand Grad-CAM: one frame range at a time, on a resident model ---
+_gradcam_cache = {}  # (abs path, mtime) -> GradCAM hooked into its own model copy
+
+
+def get_gradcam(model_path: str):
+    """
+    Resident Grad-CAM for a checkpoint. Its hooks stay registered, so it wraps
+    a model copy of its own (load_model) rather than the shared get_model one.
+    """
+    key = (os.path.abspath(model_path), os.path.getmtime(model_path))
+    with _model_cache_lock:
+        gradcam = _gradcam_cache.get(key)
+        if gradcam is None:
+            for stale in [k for k in _gradcam_cache if k[0] == key[0]]:
+                _gradcam_cache.pop(stale).remove_hooks()
+            model = load_model(model_path)
+            gradcam = _gradcam_cache[key] = GradCAM(model, cam_target_layer(model))
+    return gradcam
+
+
+def compute_cams(
+    video_path: str,
+    model_path: str,
+    start: float,
+    end: float,
+    inference_profile: str = DEFAULT_PROFILE,
+    seconds: bool = False,
+    max_frames: int = None,
+):
+    """
+    Grad-CAM maps of frames [start, end) (times in seconds with seconds=True)
+    as a uint8 (frames, h, w) array in the CamWriter format, plus
+    {"fps", "frames", "start"}. Seeks straight to the range; end is clipped to
+    the video and to start + max_frames. The array is empty when start is past
+    the last frame.
+    """
+    gradcam = get_gradcam(model_path)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if seconds:
+            # Frame i is shown from i / fps: the frame on screen at t is floor(t * fps)
+            start, end = int(start * fps), max(int(start * fps) + 1, math.ceil(end * fps))
+        start, end = int(start), min(int(end), total_frames)
+        if max_frames:
+            end = min(end, start + max_frames)
+
+        cams = []
+        with metrics.stage("decode"):
+            if 0 < start < total_frames:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for _ in range(start, end):
+            with metrics.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            with metrics.stage("preprocess"):
+                input_tensor = preprocess(frame, inference_profile).unsqueeze(0).to(DEVICE)
+            with metrics.stage("gradcam"):
+                cams.append(cam_to_uint8(gradcam.generate(input_tensor, class_idx=0)))
+    finally:
         cap.release()
 
-        # --- Temporal smoothing ---
-        if smoothing == "moving_average":
-            smoothed_probs = apply_moving_average(raw_probs)
-        elif smoothing == "ema":
-            smoothed_probs = apply_ema(raw_probs)
-        else:
-            smoothed_probs = raw_probs
-
-        # --- Write results ---
-        with open(csv_output_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Frame', 'Timestamp_sec', 'Raw_Probability', 'Smoothed_Probability', 'Predicted_Label'])
-
-            for idx, (frame, raw_p, smooth_p, ts) in enumerate(zip(frames, raw_probs, smoothed_probs, timestamps)):
-                pred_label = 1 if smooth_p > 0.5 else 0
-                label_text = 'Good' if pred_label else 'Bad'
-                color = (0, 255, 0) if pred_label else (0, 0, 255)
-
-                cv2.putText(frame, f"{label_text} ({smooth_p:.2f})", (30, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 2, color, 3)
-                out.write(frame)
-
-                if generate_heatmap:
-                    img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_img = Image.fromarray(img_rgb)
-                    input_tensor = transform(pil_img).unsqueeze(0).to(DEVICE)
-                    heatmap = gradcam.generate(input_tensor, class_idx=0)
-                    heatmap = cv2.resize(heatmap, (frame_width, frame_height))
-                    heatmap = np.uint8(255 * heatmap)
-                    heatmap_color = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
-                    out_heatmap.write(heatmap_color)
-
-                writer.writerow([idx, f"{ts:.2f}", f"{raw_p:.4f}", f"{smooth_p:.4f}", label_text])
-
-        out.release()
-        if out_heatmap:
-            out_heatmap.release()
-            gradcam.remove_hooks()
-
-        # ✅ Overwrite both videos in place (no suffixes)
-        transcode_to_h264(output_video_path)
+    metrics.frames_total.inc(len(cams), source="gradcam")
+    array = np.stack(cams) if cams else np.zeros((0, 0, 0), dtype=np.uint8)
+    return array, {"fps": fps, "frames": total_frames, "start": start}
+
+
+# --- Main async inference wrapper ---
+async def run_inference_on_video_async(
+    video_path: str,
+    video_id: str,
+    model_path: str,
+    generate_heatmap: bool = True,
+    smoothing: str = "moving_average",
+    output_format: str = "mp4",
+    render_mode: str = "burned",
+    heatmap_mode: str = "video",
+    profile: str = None,
+    cascade: bool = False,
+    cascade_band: float = DEFAULT_CASCADE_BAND,
+    cascade_model_path: str = CASCADE_MODEL_PATH,
+    inference_profile: str = DEFAULT_PROFILE,
+    sparse_timestamps: list = None,
+    sparse_neighbors: int = 2,
+):
+    """
+    Async wrapper that runs inference in a thread pool
+    and publishes progress on progress_bus for UI polling/streaming.
+
+    output_format="mp4" renders monolithic H.264 files after scoring;
+    output_format="hls" encodes annotated/heatmap HLS (fMP4) streams while
+    frames are scored, so playback can start within seconds of the job.
+
+    render_mode="burned" re-encodes the video with the label drawn on every frame;
+    render_mode="overlay" skips the annotated video and only writes a WebVTT
+    track and a JSON sidecar of label segments for the frontend to draw.
+
+    heatmap_mode="video" renders color-mapped full-resolution heatmap videos;
+    heatmap_mode="cams" stores the raw low-resolution CAMs as a uint8 .npy
+    array for the client to upscale and blend.
+
+    smoothing is one of utils.smoothing.SMOOTHING_METHODS; HLS output uses the
+    causal streaming variant of the same filter.
+
+    profile="torch" / "pyspy" captures a profile of the job (see metrics.profile_job).
+
+    cascade=True scores every frame with the small checkpoint at
+    cascade_model_path and runs model_path only on frames within cascade_band
+    of the threshold (see CascadeScorer); the job's escalation rate and label
+    agreement are returned under "cascade". Not available with heatmaps,
+    which need the full model on every frame.
+
+    inference_profile picks the model input resolution (INFERENCE_PROFILES)
+    and is returned with the results.
+
+    sparse_timestamps (the video's GPS timestamps) switches to sparse scoring:
+    only the frame nearest each timestamp and sparse_neighbors frames on each
+    side are scored (run_sparse_inference). Output and smoothing options do
+    not apply; heatmaps are not available.
+    """
+    if cascade and generate_heatmap:
+        raise ValueError("Cascade scoring cannot be combined with Grad-CAM heatmaps")
+    if sparse_timestamps is not None and generate_heatmap:
+        raise ValueError("Sparse scoring cannot be combined with Grad-CAM heatmaps")
+    frame_transform(inference_profile)  # reject unknown profiles before the job starts
+
+    def _run_inference():
         if generate_heatmap:
-            transcode_to_h264(heatmap_video_path)
+            model = load_model(model_path)
+            gradcam = GradCAM(model, cam_target_layer(model))
+        else:
+            model = get_model(model_path)
+            gradcam = None
+        scorer = CascadeScorer(get_model(cascade_model_path), model, cascade_band) if cascade else None
+        cascade_stats = [CascadeStats(cascade_band)] if cascade else None
+
+        if sparse_timestamps is not None:
+            return run_sparse_inference(video_path, video_id, model_path, sparse_timestamps, sparse_neighbors,
+                                        inference_profile, scorer, cascade_stats)
 
-        progress_tracker[str(video_id)]["status"] = "done"
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
 
-        import datetime
-        infer_time = str(datetime.datetime.now())
+        # Released on every path: a failed job must not leak the capture, writers
+        # or an ffmpeg encoder in a long-lived worker process
+        writers = []
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+            progress_bus.start(str(video_id), total=total_frames)
+
+            base_dir = os.path.dirname(video_path)
+            base_name = artifact_stem(video_path)
+            output_video_path = os.path.join(base_dir, f"{base_name}_inference.mp4")
+            heatmap_video_path = os.path.join(base_dir, f"{base_name}_heatmap.mp4")
+            cam_path = os.path.join(base_dir, f"{base_name}_cams.npy")
+
+            burn = render_mode == "burned"
+            streaming = output_format == "hls"
+            heatmap_video = generate_heatmap and heatmap_mode == "video"
+            out = out_heatmap = None
+            cam_writer = CamWriter(cam_path, total_frames, fps) if generate_heatmap and heatmap_mode == "cams" else None
+            if cam_writer:
+                writers.append(cam_writer)
+
+            if streaming:
+                hls_dir = os.path.join(base_dir, f"{base_name}_hls")
+                if burn:
+                    out = HLSWriter(os.path.join(hls_dir, "inference"), fps, (frame_width, frame_height))
+                    writers.append(out)
+                    output_video_path = str(out.playlist_path)
+                if heatmap_video:
+                    out_heatmap = HLSWriter(os.path.join(hls_dir, "heatmap"), fps, (frame_width, frame_height))
+                    writers.append(out_heatmap)
+                    heatmap_video_path = str(out_heatmap.playlist_path)
+                smoother = StreamingSmoother(smoothing)
+                # Announce the stream so viewers can start playing before the job ends
+                stream_path = output_video_path if burn else heatmap_video_path if heatmap_video else None
+                if stream_path:
+                    progress_bus.set_status(str(video_id), "running", stream_url=_upload_url(stream_path))
+            else:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                if burn:
+                    out = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
+                    writers.append(out)
+                if heatmap_video:
+                    out_heatmap = cv2.VideoWriter(heatmap_video_path, fourcc, fps, (frame_width, frame_height))
+                    writers.append(out_heatmap)
+
+            raw_probs, smoothed_probs, frames, timestamps = [], [], [], []
+
+            with tqdm(total=total_frames, desc=f"Inference on {base_name}", unit="frame") as pbar:
+                for frame_idx in range(total_frames):
+                    with metrics.stage("decode"):
+                        ret, frame = cap.read()
+                    if not ret:
+                        break
+
+                    timestamp_sec = frame_idx / fps
+                    timestamps.append(timestamp_sec)
+
+                    with metrics.stage("preprocess"):
+                        input_tensor = preprocess(frame, inference_profile).unsqueeze(0).to(DEVICE)
+
+                    with metrics.stage("forward"), torch.no_grad():
+                        if scorer:
+                            prob = scorer(input_tensor, cascade_stats)[0]
+                        else:
+                            output = model(input_tensor)
+                            prob = torch.sigmoid(output).item()
+
+                    raw_probs.append(prob)
+
+                    # Heatmaps do not depend on smoothing: render from the clean frame right away
+                    if heatmap_video:
+                        with metrics.stage("gradcam"):
+                            heatmap = _heatmap_frame(gradcam, input_tensor, frame_width, frame_height)
+                        with metrics.stage("encode"):
+                            out_heatmap.write(heatmap)
+                    elif cam_writer:
+                        with metrics.stage("gradcam"):
+                            cam_writer.write(gradcam.generate(input_tensor, class_idx=0))
+
+                    if burn and streaming:
+                        # --- Streaming output: smooth causally and encode right away ---
+                        smooth_p = smoother(prob)
+                        smoothed_probs.append(smooth_p)
+                        _annotate(frame, smooth_p)
+                        with metrics.stage("encode"):
+                            out.write(frame)
+                    elif burn:
+                        # Labels need the smoothed sequence; keep frames for the render pass
+                        frames.append(frame)
+
+                    pbar.update(1)
+                    progress_bus.update(str(video_id), frame_idx + 1)
+
+            cap.release()
+
+            # --- Temporal smoothing ---
+            if not (burn and streaming):
+                with metrics.stage("smoothing"):
+                    smoothed_probs = smooth(raw_probs, smoothing)
+
+            if burn and not streaming:
+                progress_bus.set_status(str(video_id), "rendering")
+                for frame, smooth_p in zip(frames, smoothed_probs):
+                    _annotate(frame, smooth_p)
+                    with metrics.stage("encode"):
+                        out.write(frame)
+                frames.clear()
+
+            # Finish the outputs; a failure here (e.g. the HLS encoder) is the job's error
+            while writers:
+                writers.pop(0).release()
+        finally:
+            cap.release()
+            for writer in writers:
+                _release_quietly(writer)
+            if gradcam:
+                gradcam.remove_hooks()
+
+        # ✅ Overwrite mp4 videos in place (no suffixes)
+        if not streaming:
+            if burn:
+                transcode_to_h264(output_video_path)
+            if heatmap_video:
+                transcode_to_h264(heatmap_video_path)
+
+        with metrics.stage("write_outputs"):
+            outputs = write_label_outputs(base_dir, base_name, fps, timestamps, raw_probs, smoothed_probs, smoothing)
+
+        progress_bus.set_status(str(video_id), "saving")
+
+        cascade_report = cascade_stats[0].report() if cascade else None
+        if cascade_report:
+            print(f"🪜 Cascade: {cascade_report['escalated_fraction']:.1%} of frames escalated, "
+                  f"label agreement {cascade_report['label_agreement']}")
 
         return {
-            "output_video": f"uploads/{os.path.basename(output_video_path)}",
-            "csv_output": f"uploads/{os.path.basename(csv_output_path)}",
-            "heatmap_video": f"uploads/{os.path.basename(heatmap_video_path)}" if generate_heatmap else None,
-            "created_at": infer_time,
-            "frame_timestamps": timestamps,
-            "raw_probs": raw_probs,
-            "smoothed_probs": smoothed_probs
+            "output_video": _upload_url(output_video_path) if burn else None,
+            "heatmap_video": _upload_url(heatmap_video_path) if heatmap_video else None,
+            "cam_path": _upload_url(cam_path) if cam_writer else None,
+            "cascade": cascade_report,
+            "inference_profile": inference_profile,
+            **outputs,
         }
 
+    def _run_instrumented():
+        metrics.jobs_running.inc()
+        started = time.perf_counter()
+        try:
+            with metrics.profile_job(profile, f"video_{video_id}") as profile_path:
+                results = _run_inference()
+        except Exception:
+            metrics.jobs_total.inc(status="error")
+            raise
+        finally:
+            metrics.jobs_running.dec()
+        elapsed = time.perf_counter() - started
+        scored = results["sparse"]["frames_scored"] if results.get("sparse") else len(results["raw_probs"])
+        metrics.jobs_total.inc(status="done")
+        metrics.frames_total.inc(scored, source="api")
+        metrics.job_fps.set(scored / elapsed if elapsed > 0 else 0.0, source="api")
+        metrics.stage_seconds.observe(elapsed, stage="job")
+        results["profile"] = profile_path
+        return results
+
     # --- Run the blocking job in background thread ---
-    return await asyncio.to_thread(_run_inference)
+    return await asyncio.to_thread(_run_instrumented)
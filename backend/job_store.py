@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_JOB_STORE_PATH = BASE_DIR / "jobs.sqlite3"
+
+# Job rows not updated for this long are removed (finished or abandoned jobs).
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+
+class MemoryJobStore:
+    """
+    Process-local job-state store. Only suitable for a single worker process;
+    used when RAHI_JOB_STORE=memory.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def merge(self, job_id: str, fields: dict) -> dict:
+        with self._lock:
+            state = dict(self._jobs.get(job_id) or {})
+            state.update(fields)
+            state["version"] = state.get("version", 0) + 1
+            state["updated_at"] = time.time()
+            self._jobs[job_id] = state
+            return state
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [k for k, v in self._jobs.items() if v["updated_at"] < cutoff]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Job-state store in a SQLite file in WAL mode, shared by every process on the host.
+
+    Each `merge` is a single IMMEDIATE transaction, so concurrent writers never
+    lose fields; readers never block writers under WAL. Connections are
+    per-thread and reused, keeping a primary-key read in the tens of microseconds.
+    """
+
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH, ttl: float = DEFAULT_TTL_SECONDS,
+                 purge_interval: float = 60.0):
+        self.path = str(path)
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # Never reuse a connection inherited across fork().
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, job_id: str):
+        row = self._conn().execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def merge(self, job_id: str, fields: dict) -> dict:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            state = json.loads(row[0]) if row else {}
+            state.update(fields)
+            state["version"] = state.get("version", 0) + 1
+            state["updated_at"] = now
+            conn.execute(
+                "INSERT INTO jobs (job_id, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (job_id, json.dumps(state), now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if now - self._last_purge >= self.purge_interval:
+            self.purge_expired()
+        return state
+
+    def delete(self, job_id: str):
+        self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def purge_expired(self):
+        self._last_purge = time.time()
+        self._conn().execute("DELETE FROM jobs WHERE updated_at < ?", (self._last_purge - self.ttl,))
+
+
+def create_job_store():
+    """
+    Job store selected by RAHI_JOB_STORE: 'memory', or a SQLite file path
+    (defaults to backend/jobs.sqlite3).
+    """
+    target = os.environ.get("RAHI_JOB_STORE", str(DEFAULT_JOB_STORE_PATH))
+    ttl = float(os.environ.get("RAHI_JOB_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    if target == "memory":
+        return MemoryJobStore(ttl=ttl)
+    return SQLiteJobStore(target, ttl=ttl)
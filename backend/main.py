@@ -1,27 +1,40 @@
-import os, csv
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, status
+import os, csv, json, asyncio, hashlib, uuid
+from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, Query, Request, Response, status
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-import cv2, math
+import math, time
 
-from . import crud, models, database
+from . import async_crud, models, database, metrics, worker
 from .video_routes import router as video_router
-from .inference_utils import transcode_to_h264
+from .gps_routes import router as gps_router
+from .media import router as media_router
+from .utils.transcode import transcode_to_h264
+from .utils.previews import preview_dir, transcode_with_previews
 
 # --- Paths ---
 BASE_DIR = Path(__file__).resolve().parent
 UPLOAD_DIR = BASE_DIR / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# --- Database ---
-models.Base.metadata.create_all(bind=database.engine)
-
 # --- FastAPI app ---
 app = FastAPI()
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+
+
+# --- Database (engine is created on first use, not at import) ---
+@app.on_event("startup")
+def init_database():
+    database.init_db()
+
+
+@app.on_event("shutdown")
+async def close_database():
+    worker.shutdown()
+    await database.dispose_async_engine()
+
+# Range/ETag-aware media serving (can also run standalone: uvicorn backend.media:app)
+app.include_router(media_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,33 +42,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cam-Shape", "X-Cam-Start", "X-Cam-Total-Frames", "X-Cam-Fps"],
 )
 
-# --- Database session dependency ---
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# --- Metrics ---
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/video/{video_id}), not the raw path, to keep cardinality bounded
+    route = request.scope.get("route")
+    metrics.http_request_seconds.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
 
 
-# --- Upload Endpoint ---
-@app.post("/upload/")
-async def upload_files(
-    video: UploadFile = File(...),
-    csv_file: UploadFile = File(None),
-    db: Session = Depends(get_db)
-):
-    filename = Path(video.filename).name
-    video_path = UPLOAD_DIR / filename
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of pipeline, database and HTTP metrics."""
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
-    # Save uploaded file
-    with video_path.open("wb") as f:
-        f.write(await video.read())
-    print(f"📥 Uploaded file: {video_path.name}")
 
-    # --- Always Transcode ---
+# --- Upload helpers (blocking: called from a worker thread) ---
+def transcode_upload(video_path: Path, previews_dir: Path = None) -> Path:
+    """
+    Transcode to H.264 and drop the original; returns the path to keep. With
+    previews_dir, scrubbing sprites and a proxy are built in the same pass.
+    """
+    if previews_dir and transcode_with_previews(str(video_path), str(previews_dir)):
+        return video_path
     try:
         transcoded_path = Path(transcode_to_h264(str(video_path)))
         print(f"✅ Transcoded to H.264: {transcoded_path.name}")
@@ -65,11 +84,15 @@ async def upload_files(
             os.remove(video_path)
             print(f"🧹 Removed original: {video_path.name}")
 
-        video_path = transcoded_path
+        return transcoded_path
     except Exception as e:
         print(f"⚠️ Transcoding failed: {e}")
+        return video_path
+
+
+def probe_duration(video_path: Path) -> float:
+    import cv2  # imported on first upload: keeps API startup light
 
-    # --- Compute Duration ---
     video_cap = cv2.VideoCapture(str(video_path))
     if not video_cap.isOpened():
         duration = 0.0
@@ -80,85 +103,178 @@ async def upload_files(
         duration = frame_count / fps if fps > 0 else 0.0
         duration = math.floor(duration)
     video_cap.release()
+    return duration
+
+
+def parse_gps_csv(contents: bytes) -> list:
+    reader = csv.DictReader(contents.decode("utf-8").splitlines())
+    return [
+        {"lat": float(row["lat"]), "lon": float(row["lon"]), "timestamp": float(row["timestamp"])}
+        for row in reader
+    ]
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def stream_upload(upload: UploadFile) -> tuple:
+    """Write an upload to a temporary file in UPLOAD_DIR, hashing it on the way: (sha256 hex, temp path)."""
+    digest = hashlib.sha256()
+    tmp_path = UPLOAD_DIR / f".upload-{uuid.uuid4().hex}"
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return digest.hexdigest(), tmp_path
+
+
+def file_url(video) -> str:
+    """Path of a video's stored file under the /uploads mount."""
+    return f"uploads/{Path(video.file_path).name}"
+
+
+def proxy_url(video):
+    """Low-bitrate preview of a video (utils/previews.py), if one was built at upload."""
+    if video.content_hash and (preview_dir(video.file_path) / "proxy.mp4").exists():
+        return f"previews/{video.content_hash}/proxy.mp4"
+    return None
+
+
+# --- Upload Endpoint ---
+@app.post("/upload/")
+async def upload_files(
+    video: UploadFile = File(...),
+    csv_file: UploadFile = File(None),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    filename = Path(video.filename).name
+
+    # Content-addressed storage: uploads/<sha256 of the uploaded bytes>.mp4
+    content_hash, tmp_path = await stream_upload(video)
+    video_path = UPLOAD_DIR / f"{content_hash}.mp4"
+    print(f"📥 Uploaded file: {filename} ({content_hash[:12]})")
+    duplicate = await async_crud.get_video_by_hash(db, content_hash)
+
+    if video_path.exists():
+        # ♻️ Same content uploaded before: the transcoded file is already stored
+        tmp_path.unlink()
+        duration = duplicate.duration if duplicate else await asyncio.to_thread(probe_duration, video_path)
+        print(f"♻️ Duplicate upload: reusing {video_path.name}")
+    else:
+        # --- Always Transcode, then compute duration (ffmpeg/OpenCV stay off the event loop) ---
+        transcoded_path = await asyncio.to_thread(transcode_upload, tmp_path, preview_dir(video_path))
+        await asyncio.to_thread(os.replace, transcoded_path, video_path)
+        duration = await asyncio.to_thread(probe_duration, video_path)
 
     # --- Save DB Record ---
-    new_video = crud.create_video(db, name=video_path.name, file_path=str(video_path), duration=duration)
+    new_video = await async_crud.create_video(
+        db, name=filename, file_path=str(video_path), duration=duration, content_hash=content_hash
+    )
     print(f"✅ Saved video record: {new_video.name} ({duration}s)")
 
     # --- Optional GPS CSV Upload ---
     if csv_file:
-        contents = (await csv_file.read()).decode("utf-8").splitlines()
-        reader = csv.DictReader(contents)
-        gps_data = [
-            {"lat": float(row["lat"]), "lon": float(row["lon"]), "timestamp": float(row["timestamp"])}
-            for row in reader
-        ]
-        crud.create_gps_points(db, video_id=new_video.id, gps_data=gps_data)
+        gps_data = parse_gps_csv(await csv_file.read())
+        await async_crud.create_gps_points(db, video_id=new_video.id, gps_data=gps_data)
         print(f"📍 Added {len(gps_data)} GPS points for video {new_video.id}")
 
-    return {"video_id": new_video.id}
+    # --- Duplicate content: inference results apply as they are ---
+    if duplicate:
+        reused = await async_crud.reuse_inference_results(db, duplicate.id, new_video.id)
+        if reused:
+            print(f"♻️ Reused {reused} inference results of video {duplicate.id}")
+
+    return {"video_id": new_video.id, "duplicate_of": duplicate.id if duplicate else None}
 
 
 # --- Get Single Video ---
 @app.get("/video/{video_id}")
-def get_video(video_id: int, db: Session = Depends(get_db)):
-    video = crud.get_video_with_gps(db, video_id)
+async def get_video(
+    video_id: int,
+    zoom: int = Query(default=None, ge=0, le=22, description="Map zoom level; returns simplified segments instead of raw points"),
+    tolerance: float = Query(default=None, gt=0, description="Simplification tolerance in meters; overrides zoom"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    lod = zoom is not None or tolerance is not None
+    if lod:
+        video = await async_crud.get_video(db, video_id)
+    else:
+        video = await async_crud.get_video_with_gps(db, video_id)
     if video is None:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    inference_results = crud.get_inference_results_by_video(db, video_id)
-    return {
+    inference_results = await async_crud.get_inference_results_by_video(db, video_id)
+    response = {
         "id": video.id,
         "name": video.name,
         "path": video.file_path,
+        "file_url": file_url(video),
         "duration": video.duration,
-        "gps_points": [
-            {"lat": p.lat, "lon": p.lon, "highlight": p.highlight, "timestamp": p.timestamp}
-            for p in video.gps_points
-        ],
         "inferences": [
             {
                 "id": inf.id,
                 "inference_results_path": inf.inference_results_path,
+                "output_path": inf.output_path,
+                "overlay_path": inf.overlay_path,
+                "has_cams": inf.cam_path is not None,
                 "heatmap_path": inf.heatmap_path,
+                "cascade": json.loads(inf.cascade_stats) if inf.cascade_stats else None,
+                "inference_profile": inf.inference_profile,
                 "created_at": inf.created_at,
             }
             for inf in inference_results
         ],
     }
 
+    # --- Level-of-detail track: run-length-merged segments of the same highlight state ---
+    if lod:
+        response["segments"] = await async_crud.get_track_segments(db, video_id, zoom=zoom, tolerance=tolerance)
+    else:
+        response["gps_points"] = [
+            {"lat": p.lat, "lon": p.lon, "highlight": p.highlight, "timestamp": p.timestamp}
+            for p in video.gps_points
+        ]
+    return response
+
 
 # --- List All Videos ---
 @app.get("/videos/")
-def list_videos(db: Session = Depends(get_db)):
-    videos = crud.get_all_videos(db)
+async def list_videos(db: AsyncSession = Depends(database.get_async_db)):
+    videos = await async_crud.get_all_videos(db)
+    gps_ids = await async_crud.get_gps_ids_by_video(db)
+    proxies = await asyncio.to_thread(lambda: [proxy_url(v) for v in videos])
     return [
-        {"id": v.id, "name": v.name, "gps_ids": [p.id for p in v.gps_points]}
-        for v in videos
+        {"id": v.id, "name": v.name, "file_url": file_url(v), "proxy_url": proxy, "gps_ids": gps_ids.get(v.id, [])}
+        for v, proxy in zip(videos, proxies)
     ]
 
 
 # --- Delete Video ---
 @app.delete("/video/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_video(video_id: int, db: Session = Depends(get_db)):
-    video = crud.get_video_with_gps(db, video_id)
+async def delete_video(video_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    video = await async_crud.get_video(db, video_id)
     if video is None:
         raise HTTPException(status_code=404, detail="Video not found")
-    crud.delete_video(db, video_id)
+    await async_crud.delete_video(db, video_id)
     print(f"🗑️ Deleted video {video_id}")
     return
 
 
 # --- Delete GPS Point ---
 @app.delete("/gps_point/{gps_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_gps_point(gps_id: int, db: Session = Depends(get_db)):
-    gps_point = crud.get_gps_point(db, gps_id)
+async def delete_gps_point(gps_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    gps_point = await async_crud.get_gps_point(db, gps_id)
     if gps_point is None:
         raise HTTPException(status_code=404, detail="GPS point not found")
-    crud.delete_gps_point(db, gps_id)
+    await async_crud.delete_gps_point(db, gps_id)
     print(f"🗑️ Deleted GPS point {gps_id}")
     return
 
 
-# --- Include Video Inference Routes ---
+# --- Include Video Inference and GPS Search Routes ---
 app.include_router(video_router, prefix="/api")
+app.include_router(gps_router, prefix="/api")
@@ -0,0 +1,241 @@
+# /backend/media.py
+#
+# Media-serving layer for uploaded, annotated and heatmap videos.
+# Mounted into the API app by default; for heavy playback load run it as its
+# own process so seeking clients never compete with API requests:
+#     uvicorn backend.media:app --port 8001
+
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+import anyio
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+
+BASE_DIR = Path(__file__).resolve().parent
+UPLOAD_DIR = BASE_DIR / "uploads"
+
+CHUNK_SIZE = 256 * 1024
+
+# Dedicated thread capacity for file reads and stats. Starlette runs sync API
+# routes on the shared default thread pool; media I/O gets its own limiter so
+# many concurrent seeks cannot exhaust it.
+media_limiter = anyio.CapacityLimiter(int(os.environ.get("RAHI_MEDIA_THREADS", "8")))
+
+# Revalidation window for plain URLs; `?v=<etag>` URLs are cached for a year.
+DEFAULT_MAX_AGE = 60
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# --- ETags ---
+# Content-addressed uploads are stored as <sha256 of the uploaded bytes>.mp4
+# and never rewritten, so the name already identifies the content.
+_CONTENT_ADDRESSED = re.compile(r"[0-9a-f]{64}")
+
+
+def file_etag(path: str, st: os.stat_result) -> str:
+    """
+    Strong ETag without reading the file: the content hash in the name of a
+    content-addressed upload, otherwise size, mtime and inode (files
+    transcoded in place or playlists that grow get a new mtime).
+    """
+    stem, _ = os.path.splitext(os.path.basename(path))
+    if _CONTENT_ADDRESSED.fullmatch(stem):
+        return f'"{stem[:32]}"'
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}-{st.st_ino:x}"'
+
+
+# --- Range parsing ---
+def parse_range(header: str, size: int):
+    """
+    Parse a single `bytes=` range. Returns (start, end) inclusive, None to serve
+    the whole file (absent, malformed or multi-range headers), or raises
+    ValueError when the range is unsatisfiable.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    if not re.fullmatch(r"\d*-\d*", spec) or spec == "-":
+        return None
+    start_s, _, end_s = spec.partition("-")
+
+    if start_s == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(end_s)), size - 1
+        if int(end_s) == 0:
+            raise ValueError("empty suffix range")
+    else:
+        start = int(start_s)
+        end = min(int(end_s), size - 1) if end_s else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class MediaFileResponse(Response):
+    """
+    File response with single-range support. Uses the ASGI zero-copy send
+    extension (sendfile) when the server offers it, otherwise streams
+    fixed-size chunks read with pread on the media thread limiter.
+    """
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, send_body: bool):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY, limiter=media_limiter)
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fd, "offset": self.start, "count": count})
+                return
+
+            offset, remaining = self.start, count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(
+                    os.pread, fd, min(CHUNK_SIZE, remaining), offset, limiter=media_limiter
+                )
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+
+
+def _resolve(file_path: str) -> Path:
+    root = UPLOAD_DIR.resolve()
+    path = (root / file_path).resolve()
+    if root not in path.parents:
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+
+router = APIRouter()
+
+
+@router.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_media(file_path: str, request: Request):
+    return await _serve_file(_resolve(file_path), request)
+
+
+@router.api_route("/previews/{content_hash}/{file_name}", methods=["GET", "HEAD"])
+async def serve_preview(content_hash: str, file_name: str, request: Request):
+    """
+    Scrubbing sprites, thumbnail track and proxy of a content-addressed upload
+    (utils/previews.py). The URL names the upload's content, so responses are
+    cached for a year without revalidation.
+    """
+    if not _CONTENT_ADDRESSED.fullmatch(content_hash):
+        raise HTTPException(status_code=404, detail="File not found")
+    return await _serve_file(_resolve(f"{content_hash}_previews/{file_name}"), request, immutable=True)
+
+
+async def _serve_file(path: Path, request: Request, immutable: bool = False):
+    try:
+        st = await anyio.to_thread.run_sync(os.stat, path, limiter=media_limiter)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    etag = file_etag(str(path), st)
+    immutable = immutable or request.query_params.get("v") == etag.strip('"')
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+        "cache-control": (
+            f"public, max-age={IMMUTABLE_MAX_AGE}, immutable" if immutable
+            else f"public, max-age={DEFAULT_MAX_AGE}, must-revalidate"
+        ),
+    }
+    if path.suffix == ".m3u8":
+        # Live (EVENT) playlists grow while inference runs: always revalidate
+        headers["cache-control"] = "no-cache"
+
+    # --- Conditional GET ---
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            if int(st.st_mtime) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    media_type = _media_type(path)
+    headers["content-type"] = media_type
+    send_body = request.method == "GET"
+    size = st.st_size
+
+    # --- Range request (honoured only if If-Range still matches) ---
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            headers["content-length"] = str(end - start + 1)
+            return MediaFileResponse(str(path), start, end, 206, headers, send_body)
+
+    headers["content-length"] = str(size)
+    return MediaFileResponse(str(path), 0, size - 1, 200, headers, send_body)
+
+
+_MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".csv": "text/csv",
+    ".json": "application/json",
+    ".vtt": "text/vtt",
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+}
+
+
+def _media_type(path: Path) -> str:
+    return _MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+
+# --- Standalone media app ---
+app = FastAPI()
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000"],
+    allow_methods=["GET", "HEAD"],
+    allow_headers=["*"],
+    expose_headers=["Content-Range", "Accept-Ranges", "ETag"],
+)
+app.include_router(router)
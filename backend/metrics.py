@@ -0,0 +1,274 @@
+# /backend/metrics.py
+#
+# In-process metrics in the Prometheus text format, served on /metrics.
+# Stage timers cover the inference pipeline (decode, preprocess, forward,
+# Grad-CAM, encode, transcode, ...), SQL statements and HTTP routes.
+
+import contextlib
+import copy
+import os
+import signal
+import subprocess
+import threading
+import time
+
+# Latency buckets in seconds: per-frame stages sit in the ms range, jobs in minutes
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _label_key(labelnames, labels: dict):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def collect(self, reset: bool = False):
+        with self.lock:
+            values = copy.deepcopy(self.values)
+            if reset:
+                self.values.clear()
+        return values
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def merge(self, values: dict):
+        with self.lock:
+            for key, amount in values.items():
+                self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def merge(self, values: dict):
+        with self.lock:
+            self.values.update(values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def merge(self, values: dict):
+        with self.lock:
+            for key, (counts, total, count) in values.items():
+                state = self.values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self.lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self.values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', f'{bound:g}')])} {c}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self, reset: bool = False, exclude=()) -> dict:
+        """
+        Current values by metric name, for shipping to another process. With
+        reset, counters and histograms restart from zero so the next collect
+        returns only new observations; gauges keep their value.
+        """
+        return {
+            metric.name: metric.collect(reset=reset and metric.kind != "gauge")
+            for metric in self.metrics
+            if metric.name not in exclude
+        }
+
+    def merge(self, snapshot: dict):
+        """Fold values collected in another process into this one: counts add up, gauges take the new value."""
+        for metric in self.metrics:
+            values = snapshot.get(metric.name)
+            if values:
+                metric.merge(values)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Pipeline metrics ---
+stage_seconds = registry.register(Histogram(
+    "rahi_stage_seconds",
+    "Time spent per pipeline stage (per frame for decode/preprocess/forward/gradcam/encode)",
+    ["stage"],
+))
+frames_total = registry.register(Counter("rahi_frames_total", "Frames scored by the model", ["source"]))
+jobs_total = registry.register(Counter("rahi_inference_jobs_total", "Finished inference jobs", ["status"]))
+jobs_running = registry.register(Gauge("rahi_inference_jobs_running", "Inference jobs in progress"))
+job_fps = registry.register(Gauge("rahi_inference_frames_per_second", "Throughput of the last finished job", ["source"]))
+queue_depth = registry.register(Gauge("rahi_queue_depth", "Items waiting in a work queue", ["queue"]))
+cascade_frames_total = registry.register(Counter(
+    "rahi_cascade_frames_total", "Frames scored in cascade mode, by the model whose label was kept", ["route"],
+))
+
+# --- Storage and API metrics ---
+db_query_seconds = registry.register(Histogram("rahi_db_query_seconds", "SQL statement latency", ["statement"]))
+gradcam_cache_frames_total = registry.register(Counter(
+    "rahi_gradcam_cache_frames_total", "On-demand Grad-CAM frames served, by cache result", ["result"],
+))
+http_request_seconds = registry.register(Histogram(
+    "rahi_http_request_seconds", "HTTP request latency by route template", ["method", "route", "status"],
+))
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage: `with metrics.stage("transcode"): ...`."""
+    return stage_seconds.time(stage=name)
+
+
+def instrument_engine(engine):
+    """Record the latency of every SQL statement executed through `engine`."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("rahi_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["rahi_query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_seconds.observe(time.perf_counter() - start, statement=verb)
+
+
+# --- Per-job profiling ---
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+
+@contextlib.contextmanager
+def profile_job(mode: str, name: str):
+    """
+    Optional profiler around one job. mode="torch" writes a Chrome trace of
+    operator timings; mode="pyspy" samples this process with py-spy into a
+    flamegraph SVG. Yields the output path (None when profiling is off or
+    unavailable).
+    """
+    if not mode:
+        yield None
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+
+    if mode == "torch":
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        path = os.path.join(PROFILE_DIR, f"{name}_{stamp}_torch.json")
+        activities = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if torch.cuda.is_available() else [])
+        with profile(activities=activities) as prof:
+            yield path
+        prof.export_chrome_trace(path)
+        print(f"🔬 Torch profile written: {path}")
+        return
+
+    if mode == "pyspy":
+        path = os.path.join(PROFILE_DIR, f"{name}_{stamp}_pyspy.svg")
+        try:
+            proc = subprocess.Popen(
+                ["py-spy", "record", "--pid", str(os.getpid()), "--output", path, "--nonblocking"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            print("⚠️ py-spy not found; running job without profiling")
+            yield None
+            return
+        try:
+            yield path
+        finally:
+            # py-spy writes the flamegraph when interrupted
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            if proc.returncode not in (0, -signal.SIGINT):
+                print(f"⚠️ py-spy failed: {proc.stderr.read().decode(errors='ignore').strip()}")
+            else:
+                print(f"🔬 py-spy profile written: {path}")
+        return
+
+    raise ValueError(f"Unknown profile mode: {mode}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -6,21 +6,25 @@ class Video(Base):
     __tablename__ = "videos"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
-    file_path = Column(String)
+    name = Column(String)  # file name as uploaded
+    file_path = Column(String)  # uploads/<sha256>.mp4, shared by rows uploading the same content
     duration = Column(Float)
+    content_hash = Column(String, nullable=True, index=True)  # SHA-256 of the uploaded bytes
 
-    gps_points = relationship("GPSPoint", back_populates="video")
+    # Rows are removed by the database's ON DELETE CASCADE, not nulled out by the ORM
+    gps_points = relationship("GPSPoint", back_populates="video", passive_deletes=True)
 
 
 class GPSPoint(Base):
     __tablename__ = "gps_points"
+    __table_args__ = (Index("ix_gps_points_lat_lon", "lat", "lon"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    video_id = Column(Integer, ForeignKey("videos.id"))
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), index=True)
     lat = Column(Float)
     lon = Column(Float)
     highlight = Column(Boolean)
+    probability = Column(Float, nullable=True)  # probability behind `highlight`, set by inference
     timestamp = Column(Float)
 
     video = relationship("Video", back_populates="gps_points")
@@ -31,7 +35,79 @@ class InferenceResult(Base):
     id = Column(Integer, primary_key=True, index=True)
     video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"))
     inference_results_path = Column(String, nullable=False)
+    output_path = Column(String, nullable=True)  # annotated video (.mp4) or HLS playlist (.m3u8)
+    overlay_path = Column(String, nullable=True)  # JSON sidecar of label segments (WebVTT alongside)
+    cam_path = Column(String, nullable=True)  # raw low-res Grad-CAM maps (uint8 .npy)
     heatmap_path = Column(String, nullable=True)
-    created_at = Column(String)
+    cascade_stats = Column(Text, nullable=True)  # JSON: escalation rate and label agreement of a cascade run
+    inference_profile = Column(String, nullable=True)  # model input resolution (inference_utils.INFERENCE_PROFILES)
+    created_at = Column(DateTime)  # TIMESTAMP in db/init.sql; asyncpg rejects strings for it
+
+    video = relationship("Video")
+
+
+class GPSTrackTier(Base):
+    __tablename__ = "gps_track_tiers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), index=True)
+    zoom = Column(Integer, nullable=False)
+    segments = Column(Text, nullable=False)  # JSON-encoded simplified segments
+
+    video = relationship("Video")
+
+
+class RoadQualityCell(Base):
+    __tablename__ = "road_quality_cells"
+    __table_args__ = (
+        UniqueConstraint("precision", "geohash", name="uq_road_quality_cells_precision_geohash"),
+        Index("ix_road_quality_cells_precision_lat_lon", "precision", "lat", "lon"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    precision = Column(Integer, nullable=False)  # geohash length
+    geohash = Column(String, nullable=False)
+    lat = Column(Float, nullable=False)  # cell center
+    lon = Column(Float, nullable=False)
+    good_count = Column(Integer, nullable=False, default=0)
+    bad_count = Column(Integer, nullable=False, default=0)
+    probability_sum = Column(Float, nullable=False, default=0.0)
+
+
+class RoadSegment(Base):
+    __tablename__ = "road_segments"
+    __table_args__ = (
+        Index("ix_road_segments_label_length", "label", "length_m"),
+        Index("ix_road_segments_video_start", "video_id", "start_time"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), nullable=False)
+    label = Column(String, nullable=False)  # "Good" / "Bad"
+    start_time = Column(Float, nullable=False)
+    end_time = Column(Float, nullable=False)  # exclusive
+    start_lat = Column(Float, nullable=True)
+    start_lon = Column(Float, nullable=True)
+    end_lat = Column(Float, nullable=True)
+    end_lon = Column(Float, nullable=True)
+    length_m = Column(Float, nullable=True)  # NULL for videos without GPS
+    mean_probability = Column(Float, nullable=False)
+    min_probability = Column(Float, nullable=False)
+
+    video = relationship("Video")
+
+
+class ModelEvaluation(Base):
+    __tablename__ = "model_evaluations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, nullable=False, unique=True)  # eval-<hex>
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), index=True)
+    checkpoints = Column(Text, nullable=False)  # JSON list of checkpoint names
+    probs_path = Column(String, nullable=False)  # .npz of raw/smoothed probabilities per checkpoint
+    report_path = Column(String, nullable=False)  # full JSON report, disagreement ranges included
+    output_path = Column(String, nullable=True)  # comparison video, only when rendered
+    summary = Column(Text, nullable=True)  # JSON: report without the disagreement ranges
+    created_at = Column(DateTime)
 
     video = relationship("Video")
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import time
+
+from .job_store import create_job_store
+
+# Shared job-state store (SQLite WAL file by default): visible to every
+# uvicorn worker and inference process, and survives restarts.
+progress_tracker = create_job_store()
+
+TERMINAL_STATUSES = ("done", "error")
+
+
+def is_terminal(status: str) -> bool:
+    return status.split(":", 1)[0] in TERMINAL_STATUSES
+
+
+class ProgressBus:
+    """
+    Publishes job progress snapshots to a shared store.
+
+    Workers call `update` on every frame; snapshots are only written when
+    `min_interval` seconds have passed (or the job reaches its last frame), and
+    carry frames/sec and ETA. Readers poll the store (`get`) or subscribe to a
+    stream of changed snapshots (`subscribe`), so any process that can see the
+    store can follow a job.
+    """
+
+    def __init__(self, store, min_interval: float = 0.5):
+        self.store = store
+        self.min_interval = min_interval
+        self._rates = {}   # job_id -> (last_time, last_current, fps), local to the writing process
+        self._totals = {}  # job_id -> total frames, so throttled updates never read the store
+
+    def _publish(self, job_id: str, **fields):
+        self.store.merge(job_id, fields)
+
+    def start(self, job_id: str, total: int = 1, status: str = "running"):
+        self._rates[job_id] = (time.monotonic(), 0, 0.0)
+        self._totals[job_id] = total
+        self._publish(job_id, current=0, total=total, status=status, fps=0.0, eta_seconds=None, stream_url=None)
+
+    def update(self, job_id: str, current: int):
+        now = time.monotonic()
+        if job_id not in self._rates:
+            # Job started by another process: pick up its total once, then throttle locally.
+            self._rates[job_id] = (now, current, 0.0)
+            self._totals[job_id] = (self.store.get(job_id) or {}).get("total", 1)
+        last_time, last_current, fps = self._rates[job_id]
+        total = self._totals[job_id]
+        if now - last_time < self.min_interval and current < total:
+            return
+
+        if now > last_time:
+            instant = (current - last_current) / (now - last_time)
+            fps = instant if fps == 0.0 else 0.7 * fps + 0.3 * instant
+        self._rates[job_id] = (now, current, fps)
+        eta = (total - current) / fps if fps > 0 else None
+        self._publish(job_id, current=current, fps=round(fps, 2),
+                      eta_seconds=round(eta, 1) if eta is not None else None)
+
+    def set_status(self, job_id: str, status: str, **extra):
+        """Change the job status; `extra` fields (e.g. stream_url) are published alongside."""
+        self._publish(job_id, status=status, **extra)
+
+    def finish(self, job_id: str, status: str = "done"):
+        self._rates.pop(job_id, None)
+        self._totals.pop(job_id, None)
+        self._publish(job_id, status=status, eta_seconds=0 if status == "done" else None)
+
+    def get(self, job_id: str) -> dict:
+        # Jobs finished or relabelled without a start here (e.g. after a TTL purge) lack counters
+        snapshot = {"current": 0, "total": 1, "status": "idle", **(self.store.get(job_id) or {})}
+        percent = (snapshot["current"] / snapshot["total"]) * 100 if snapshot["total"] > 0 else 0
+        return {
+            "progress": percent,
+            "status": snapshot["status"],
+            "current": snapshot["current"],
+            "total": snapshot["total"],
+            "fps": snapshot.get("fps", 0.0),
+            "eta_seconds": snapshot.get("eta_seconds"),
+            "stream_url": snapshot.get("stream_url"),
+        }
+
+    async def subscribe(self, job_id: str, poll_interval: float = 0.25, heartbeat: float = 15.0):
+        """
+        Async generator of server-sent-event chunks: one `data:` event per new
+        snapshot version, comment heartbeats while idle, ending after a terminal status.
+        """
+        last_version, last_sent = None, time.monotonic()
+        while True:
+            snapshot = self.store.get(job_id) or {}
+            version = snapshot.get("version")
+            if version != last_version:
+                last_version, last_sent = version, time.monotonic()
+                payload = self.get(job_id)
+                yield f"data: {json.dumps(payload)}\n\n"
+                if is_terminal(payload["status"]):
+                    return
+            elif time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(poll_interval)
+
+
+progress_bus = ProgressBus(progress_tracker)
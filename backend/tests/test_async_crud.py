@@ -0,0 +1,96 @@
+"""
+Round trip through async_crud on a file SQLite database (aiosqlite for the
+async session, pysqlite for the crud.py work run in threads).
+
+    python -m pytest backend/tests
+"""
+
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy import text
+
+from backend import async_crud, crud, database
+from backend.utils.spatial_index import gps_index
+
+TRACK = [{"lat": 12.97 + i * 1e-4, "lon": 77.59, "timestamp": float(i)} for i in range(5)]
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'rahi.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    monkeypatch.setattr(database, "_async_engine", None)
+    database.init_db()
+    yield
+    gps_index.clear()
+    database.get_engine().dispose()
+
+
+def _inference_results():
+    return {
+        "frame_timestamps": [0.0, 2.0, 4.0],
+        "raw_probs": [0.9, 0.2, 0.8],
+        "smoothed_probs": None,
+        "segments": [],
+        "csv_output": "uploads/test_predictions.csv",
+        "output_video": None,
+        "overlay": None,
+        "cam_path": None,
+        "heatmap_video": None,
+        "created_at": datetime.datetime(2026, 1, 1),
+    }
+
+
+def test_async_crud_round_trip(sqlite_db, tmp_path):
+    async def scenario():
+        async with database.AsyncSessionLocal() as db:
+            video = await async_crud.create_video(db, "a.mp4", str(tmp_path / "a.mp4"), 4.0, content_hash="ab" * 32)
+            await async_crud.create_gps_points(db, video.id, TRACK)
+
+            assert (await async_crud.get_video_by_hash(db, "ab" * 32)).id == video.id
+            assert len((await async_crud.get_video_with_gps(db, video.id)).gps_points) == len(TRACK)
+            assert await async_crud.get_gps_timestamps(db, video.id) == [p["timestamp"] for p in TRACK]
+            assert await async_crud.get_track_segments(db, video.id, zoom=16)
+            assert await async_crud.get_track_segments(db, video.id, tolerance=5.0)
+
+            found = await async_crud.search_gps_bbox(db, 77.0, 12.0, 78.0, 13.0)
+            assert [(v["video_id"], v["point_count"]) for v in found] == [(video.id, len(TRACK))]
+
+            await async_crud.save_inference_outputs(db, video.id, _inference_results())
+            assert len(await async_crud.get_inference_results_by_video(db, video.id)) == 1
+            assert await async_crud.get_quality_cells(db, 8, 77.0, 12.0, 78.0, 13.0)
+
+            ids = (await async_crud.get_gps_ids_by_video(db))[video.id]
+            assert await async_crud.delete_gps_point(db, ids[-1])
+            assert await async_crud.get_gps_timestamps(db, video.id) == [p["timestamp"] for p in TRACK[:-1]]
+            found = await async_crud.search_gps_bbox(db, 77.0, 12.0, 78.0, 13.0)
+            assert found[0]["point_count"] == len(TRACK) - 1
+
+            assert await async_crud.delete_video(db, video.id)
+            assert await async_crud.get_all_videos(db) == []
+            assert await async_crud.get_gps_ids_by_video(db) == {}
+            assert await async_crud.search_gps_bbox(db, 77.0, 12.0, 78.0, 13.0) == []
+        await database.dispose_async_engine()
+
+    asyncio.run(scenario())
+
+
+def test_delete_video_without_cascading_foreign_keys(sqlite_db, tmp_path):
+    # Databases created before the foreign keys declared ON DELETE CASCADE
+    with database.get_engine().begin() as conn:
+        conn.execute(text("DROP TABLE gps_points"))
+        conn.execute(text(
+            "CREATE TABLE gps_points (id INTEGER PRIMARY KEY, video_id INTEGER REFERENCES videos(id), "
+            "lat FLOAT, lon FLOAT, timestamp FLOAT, highlight BOOLEAN, probability FLOAT)"
+        ))
+
+    db = database.SessionLocal()
+    try:
+        video = crud.create_video(db, "a.mp4", str(tmp_path / "a.mp4"), 4.0)
+        crud.create_gps_points(db, video.id, TRACK)
+        assert crud.delete_video(db, video.id)
+        assert db.execute(text("SELECT COUNT(*) FROM gps_points")).scalar() == 0
+    finally:
+        db.close()
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def cam_to_uint8(cam):
+    """Float map in [0, 1] as returned by GradCAM.generate -> uint8 map"""
+    return np.uint8(np.clip(np.nan_to_num(cam) * 255, 0, 255))
+
+
+class CamWriter:
+    """
+    Stores raw low-resolution Grad-CAM maps as one uint8 array of shape
+    (frames, h, w) in a .npy file, so readers can memory-map any frame range.
+    A CAM of a 512x384 input is 16x12 bytes per frame, instead of a full
+    color-mapped video frame.
+    """
+
+    def __init__(self, path: str, total_frames: int, fps: float):
+        self.path = path
+        self.fps = fps
+        self.total_frames = max(1, total_frames)
+        self.array = None
+        self.count = 0
+
+    def write(self, cam):
+        """cam: float map in [0, 1] as returned by GradCAM.generate"""
+        cam_u8 = cam_to_uint8(cam)
+        if self.array is None:
+            self.array = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=np.uint8, shape=(self.total_frames,) + cam_u8.shape
+            )
+        if self.count < self.total_frames:
+            self.array[self.count] = cam_u8
+        self.count += 1
+
+    def release(self):
+        if self.array is None:
+            return
+        self.array.flush()
+        del self.array
+        self.array = None
+        if self.count < self.total_frames:
+            # Container frame counts can be estimates: trim the unused tail
+            trimmed = np.load(self.path, mmap_mode="r")[:self.count]
+            tmp_path = self.path + ".tmp.npy"
+            np.save(tmp_path, np.ascontiguousarray(trimmed))
+            del trimmed
+            os.replace(tmp_path, self.path)
+
+        with open(meta_path(self.path), "w") as f:
+            json.dump({"fps": self.fps, "frames": min(self.count, self.total_frames)}, f)
+
+
+def meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def read_cams(path: str, start: int, end: int):
+    """
+    Memory-mapped slice [start, end) of a stored CAM array.
+    Returns (array, meta) with meta = {"fps", "frames"}.
+    """
+    cams = np.load(path, mmap_mode="r")
+    with open(meta_path(path)) as f:
+        meta = json.load(f)
+    meta["frames"] = cams.shape[0]
+    return np.ascontiguousarray(cams[max(0, start):min(end, cams.shape[0])]), meta
+
+
+class CamCache:
+    """
+    In-memory LRU of on-demand Grad-CAM maps, one uint8 (h, w) array per
+    frame, evicted least recently used first once max_bytes is exceeded.
+    Entries are keyed by (source, frame index), where source identifies the
+    video file, checkpoint and input resolution. Also remembers each video's
+    frame rate and frame count, so time ranges resolve without opening it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._frames = OrderedDict()
+        self._videos = {}
+        self._lock = threading.Lock()
+
+    def get(self, source, start: int, end: int) -> dict:
+        """Cached maps of frames [start, end) as {frame index: array}."""
+        found = {}
+        with self._lock:
+            for idx in range(start, end):
+                cam = self._frames.get((source, idx))
+                if cam is not None:
+                    self._frames.move_to_end((source, idx))
+                    found[idx] = cam
+        return found
+
+    def put(self, source, start: int, cams):
+        with self._lock:
+            for idx, cam in enumerate(cams, start):
+                old = self._frames.pop((source, idx), None)
+                if old is not None:
+                    self.size -= old.nbytes
+                self._frames[(source, idx)] = cam
+                self.size += cam.nbytes
+            while self.size > self.max_bytes and self._frames:
+                _, evicted = self._frames.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def video_meta(self, video) -> dict:
+        """{"fps", "frames"} of a video seen before, else None"""
+        return self._videos.get(video)
+
+    def set_video_meta(self, video, fps: float, frames: int):
+        self._videos[video] = {"fps": fps, "frames": frames}
@@ -0,0 +1,61 @@
+import subprocess
+from pathlib import Path
+
+
+class HLSWriter:
+    """
+    Drop-in replacement for cv2.VideoWriter that encodes BGR frames into a
+    segmented HLS (fMP4) stream while they are being produced.
+
+    ffmpeg reads raw frames from stdin and appends each finished segment to an
+    EVENT playlist, so players can start (and seek within) the stream long
+    before the last frame is written. `release()` finalizes the playlist.
+    """
+
+    def __init__(self, output_dir: str, fps: float, frame_size: tuple, segment_seconds: int = 4,
+                 playlist_name: str = "index.m3u8"):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Drop segments of a previous run so the new playlist never references stale files
+        for stale in list(self.output_dir.glob("segment_*.m4s")) + [self.output_dir / "init.mp4"]:
+            stale.unlink(missing_ok=True)
+        self.playlist_path = self.output_dir / playlist_name
+        width, height = frame_size
+        fps = fps if fps and fps > 0 else 30.0
+        gop = max(1, int(round(fps * segment_seconds)))
+
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}", "-r", f"{fps}",
+            "-i", "-",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+            "-pix_fmt", "yuv420p",
+            # Fixed GOP aligned to the segment length so every segment starts on a keyframe
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            "-f", "hls",
+            "-hls_time", str(segment_seconds),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4",
+            "-hls_flags", "independent_segments+temp_file",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", str(self.output_dir / "segment_%05d.m4s"),
+            str(self.playlist_path),
+        ]
+        try:
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError("FFmpeg not found. HLS output requires ffmpeg in PATH.")
+
+    def write(self, frame):
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            raise RuntimeError(f"FFmpeg HLS encoder exited: {self.process.stderr.read().decode(errors='ignore')}")
+
+    def release(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            self.process.stdin.close()
+        self.process.wait()
+        if self.process.returncode != 0:
+            raise RuntimeError(f"FFmpeg HLS encoder failed: {self.process.stderr.read().decode(errors='ignore')}")
@@ -0,0 +1,53 @@
+import json
+
+
+def label_segments(timestamps: list, probs: list, frame_duration: float, threshold: float = 0.5,
+                   values: list = None) -> list:
+    """
+    Run-length encode per-frame probabilities into label segments:
+        {"start", "end", "label", "mean_probability", "min_probability", "max_probability"}
+    `end` is exclusive (start of the next segment, or last frame + frame_duration).
+    Labels come from `probs`; the probability statistics from `values` if given
+    (e.g. raw probabilities when `probs` are 0/1 outputs of a label filter).
+    """
+    segments = []
+    values = probs if values is None else values
+    n = len(probs)
+    start = 0
+    for i in range(1, n + 1):
+        if i < n and (probs[i] > threshold) == (probs[start] > threshold):
+            continue
+        run = values[start:i]
+        segments.append({
+            "start": round(timestamps[start], 3),
+            "end": round(timestamps[i] if i < n else timestamps[-1] + frame_duration, 3),
+            "label": "Good" if probs[start] > threshold else "Bad",
+            "mean_probability": round(sum(run) / len(run), 4),
+            "min_probability": round(min(run), 4),
+            "max_probability": round(max(run), 4),
+        })
+        start = i
+    return segments
+
+
+def _vtt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def write_webvtt(segments: list, path: str):
+    """WebVTT metadata track with one cue per label segment."""
+    with open(path, "w") as f:
+        f.write("WEBVTT\n\n")
+        for i, seg in enumerate(segments, start=1):
+            f.write(f"{i}\n{_vtt_time(seg['start'])} --> {_vtt_time(seg['end'])}\n")
+            f.write(f"{seg['label']} ({seg['mean_probability']:.2f})\n\n")
+
+
+def write_json_sidecar(segments: list, path: str, **meta):
+    """JSON sidecar ({...meta, "segments": [...]}) the frontend draws over the original video."""
+    with open(path, "w") as f:
+        json.dump({**meta, "segments": segments}, f, separators=(",", ":"))
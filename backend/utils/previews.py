@@ -0,0 +1,135 @@
+"""
+Scrubbing previews built in the upload's transcode pass: one ffmpeg decode of
+the upload feeds the H.264 file, a low-bitrate proxy video and JPEG sprite
+sheets of evenly spaced thumbnails, so timeline and map hover previews never
+touch the full-resolution file.
+
+    uploads/<sha256>_previews/
+        sprite_001.jpg ...   SPRITE_COLUMNS x SPRITE_ROWS thumbnails per sheet
+        thumbnails.vtt       WebVTT thumbnail track (sprite_001.jpg#xywh=...)
+        proxy.mp4            PROXY_HEIGHT p, PROXY_BITRATE, no audio
+        previews.json        manifest (see write_manifest)
+"""
+
+import glob
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from .. import metrics
+from .overlay import _vtt_time
+
+SPRITE_INTERVAL = 2.0  # seconds between thumbnails
+SPRITE_TILE_WIDTH = 160
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+PROXY_HEIGHT = 240
+PROXY_BITRATE = "300k"
+MANIFEST_NAME = "previews.json"
+
+
+def preview_dir(video_path) -> Path:
+    """uploads/<name>_previews next to the stored video."""
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}_previews")
+
+
+def transcode_with_previews(input_path: str, out_dir: str) -> bool:
+    """
+    Transcode input_path to H.264 in place (same settings as
+    transcode.transcode_to_h264) and write the previews into out_dir, from a
+    single decode. Returns False, leaving the input untouched and removing
+    out_dir (no partial proxy or sprites to serve), if ffmpeg fails.
+    """
+    input_path = Path(input_path).resolve()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp_file = Path(tempfile.mktemp(dir=input_path.parent, suffix=".mp4"))
+
+    graph = (
+        "[0:v]split=3[main][proxy][thumbs];"
+        f"[proxy]scale=-2:{PROXY_HEIGHT}[proxy_out];"
+        f"[thumbs]fps=1/{SPRITE_INTERVAL:g},scale={SPRITE_TILE_WIDTH}:-2,tile={SPRITE_COLUMNS}x{SPRITE_ROWS}[sprites]"
+    )
+    cmd = [
+        "ffmpeg", "-y", "-i", str(input_path),
+        "-filter_complex", graph,
+        # Full-resolution H.264 (replaces the upload)
+        "-map", "[main]", "-map", "0:a?",
+        "-c:v", "libx264", "-preset", "fast", "-crf", "23", "-c:a", "aac",
+        "-movflags", "+faststart", str(tmp_file),
+        # Low-bitrate proxy for scrubbing
+        "-map", "[proxy_out]", "-an",
+        "-c:v", "libx264", "-preset", "veryfast", "-b:v", PROXY_BITRATE, "-g", "30",
+        "-movflags", "+faststart", str(out_dir / "proxy.mp4"),
+        # Sprite sheets
+        "-map", "[sprites]", "-q:v", "5", str(out_dir / "sprite_%03d.jpg"),
+    ]
+
+    print(f"🎬 Transcoding {input_path.name} with scrubbing previews")
+    try:
+        with metrics.stage("transcode"):
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        os.replace(tmp_file, input_path)
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        print(f"❌ FFmpeg error while building previews: {e}")
+        tmp_file.unlink(missing_ok=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        return False
+
+    write_manifest(out_dir, str(input_path))
+    print(f"✅ Transcoding complete: {input_path.name} (+ previews)")
+    return True
+
+
+def write_manifest(out_dir, video_path: str) -> dict:
+    """
+    previews.json: {"interval", "count", "duration", "tile_width", "tile_height",
+    "columns", "rows", "sheets": [...], "proxy", "vtt"} and the WebVTT
+    thumbnail track. Thumbnail i covers [i * interval, (i + 1) * interval) and
+    sits on sheet i // (columns * rows).
+    """
+    import cv2  # imported on first upload: keeps API startup light
+
+    out_dir = Path(out_dir)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps > 0 else 0.0
+    cap.release()
+
+    sheets = sorted(os.path.basename(p) for p in glob.glob(str(out_dir / "sprite_*.jpg")))
+    per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    tile_width = tile_height = 0
+    if sheets:
+        sheet_height, sheet_width = cv2.imread(str(out_dir / sheets[0])).shape[:2]
+        tile_width, tile_height = sheet_width // SPRITE_COLUMNS, sheet_height // SPRITE_ROWS
+    count = min(len(sheets) * per_sheet, max(1, math.ceil(duration / SPRITE_INTERVAL)))
+
+    with open(out_dir / "thumbnails.vtt", "w") as f:
+        f.write("WEBVTT\n\n")
+        for i in range(count if sheets else 0):
+            start, end = i * SPRITE_INTERVAL, min((i + 1) * SPRITE_INTERVAL, max(duration, i * SPRITE_INTERVAL + 0.001))
+            pos = i % per_sheet
+            x, y = (pos % SPRITE_COLUMNS) * tile_width, (pos // SPRITE_COLUMNS) * tile_height
+            f.write(f"{_vtt_time(start)} --> {_vtt_time(end)}\n"
+                    f"{sheets[i // per_sheet]}#xywh={x},{y},{tile_width},{tile_height}\n\n")
+
+    manifest = {
+        "interval": SPRITE_INTERVAL,
+        "count": count if sheets else 0,
+        "duration": round(duration, 3),
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "columns": SPRITE_COLUMNS,
+        "rows": SPRITE_ROWS,
+        "sheets": sheets,
+        "proxy": "proxy.mp4" if (out_dir / "proxy.mp4").exists() else None,
+        "vtt": "thumbnails.vtt",
+    }
+    with open(out_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,45 @@
+import bisect
+
+from .geo import haversine_m
+
+
+def _position_at(times: list, track: list, t: float):
+    """Linearly interpolated (lat, lon) at time t, clamped to the ends of the track."""
+    i = bisect.bisect_left(times, t)
+    if i == 0:
+        return track[0]["lat"], track[0]["lon"]
+    if i == len(times):
+        return track[-1]["lat"], track[-1]["lon"]
+    a, b = track[i - 1], track[i]
+    span = b["timestamp"] - a["timestamp"]
+    f = (t - a["timestamp"]) / span if span > 0 else 0.0
+    return a["lat"] + f * (b["lat"] - a["lat"]), a["lon"] + f * (b["lon"] - a["lon"])
+
+
+def locate_segments(segments: list, track: list) -> list:
+    """
+    Attach GPS geometry to label segments (see utils.overlay.label_segments).
+    `track` is the video's GPS points sorted by timestamp. Adds start/end
+    lat/lon (interpolated at the segment boundaries) and `length_m`, the
+    haversine length of the track between them. Without GPS the geometry
+    fields are None.
+    """
+    times = [p["timestamp"] for p in track]
+    located = []
+    for seg in segments:
+        row = dict(seg)
+        if not track:
+            row.update(start_lat=None, start_lon=None, end_lat=None, end_lon=None, length_m=None)
+            located.append(row)
+            continue
+
+        start = _position_at(times, track, seg["start"])
+        end = _position_at(times, track, seg["end"])
+        lo = bisect.bisect_right(times, seg["start"])
+        hi = bisect.bisect_left(times, seg["end"])
+        path = [start] + [(p["lat"], p["lon"]) for p in track[lo:hi]] + [end]
+        length = sum(haversine_m(a[0], a[1], b[0], b[1]) for a, b in zip(path, path[1:]))
+
+        row.update(start_lat=start[0], start_lon=start[1], end_lat=end[0], end_lon=end[1], length_m=length)
+        located.append(row)
+    return located
@@ -0,0 +1,121 @@
+import math
+from .geo import project_local_m
+
+# Zoom levels for which simplified tracks are precomputed at ingest/inference time.
+ZOOM_TIERS = (10, 12, 14, 16, 18)
+
+# Web Mercator ground resolution at the equator for zoom 0 (meters per pixel).
+_METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def tolerance_for_zoom(zoom: int, lat: float = 0.0, pixels: float = 1.0) -> float:
+    """
+    Simplification tolerance in meters that keeps the error under `pixels`
+    screen pixels at the given map zoom level.
+    """
+    return pixels * _METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def tier_for_zoom(zoom: int) -> int:
+    """
+    Pick the precomputed tier to serve for a requested zoom: the finest tier
+    not exceeding it (or the coarsest tier for very low zooms).
+    """
+    candidates = [z for z in ZOOM_TIERS if z <= zoom]
+    return max(candidates) if candidates else ZOOM_TIERS[0]
+
+
+def douglas_peucker(xy: list, tolerance: float) -> list:
+    """
+    Iterative Douglas–Peucker over projected (x, y) coordinates.
+    Returns the sorted indices of the points to keep (always includes both ends).
+    """
+    n = len(xy)
+    if n <= 2:
+        return list(range(n))
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        x1, y1 = xy[start]
+        x2, y2 = xy[end]
+        dx, dy = x2 - x1, y2 - y1
+        seg_len = math.hypot(dx, dy)
+
+        max_dist, max_idx = -1.0, start
+        for i in range(start + 1, end):
+            px, py = xy[i]
+            if seg_len == 0:
+                dist = math.hypot(px - x1, py - y1)
+            else:
+                dist = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / seg_len
+            if dist > max_dist:
+                max_dist, max_idx = dist, i
+
+        if max_dist > tolerance:
+            keep[max_idx] = True
+            stack.append((start, max_idx))
+            stack.append((max_idx, end))
+
+    return [i for i, k in enumerate(keep) if k]
+
+
+def simplify_track(points: list, tolerance_m: float) -> list:
+    """
+    points: list of dicts with keys lat, lon, timestamp, highlight (sorted by timestamp)
+
+    Splits the track into runs of identical highlight state, simplifies each run
+    independently so highlight-change boundaries are never dropped, and returns
+    run-length-merged segments:
+        {"highlight", "start_time", "end_time", "path": [[lat, lon, timestamp], ...]}
+    Consecutive segments share their boundary vertex so the drawn line stays connected.
+    """
+    if not points:
+        return []
+
+    ref_lat, ref_lon = points[0]["lat"], points[0]["lon"]
+    xy = [project_local_m(p["lat"], p["lon"], ref_lat, ref_lon) for p in points]
+
+    segments = []
+    run_start = 0
+    n = len(points)
+    for i in range(1, n + 1):
+        if i < n and points[i]["highlight"] == points[run_start]["highlight"]:
+            continue
+
+        # A run covers [run_start, i]; include the next run's first point as shared boundary.
+        run_end = min(i, n - 1)
+        kept = douglas_peucker(xy[run_start:run_end + 1], tolerance_m)
+        path = [
+            [points[run_start + k]["lat"], points[run_start + k]["lon"], points[run_start + k]["timestamp"]]
+            for k in kept
+        ]
+        segments.append({
+            "highlight": points[run_start]["highlight"],
+            "start_time": points[run_start]["timestamp"],
+            "end_time": points[run_end]["timestamp"],
+            "path": path,
+        })
+        run_start = i
+
+    return segments
+
+
+def build_tiers(points: list) -> dict:
+    """
+    Precompute simplified segments for every zoom level in ZOOM_TIERS.
+    Returns {zoom: segments}.
+    """
+    if not points:
+        return {zoom: [] for zoom in ZOOM_TIERS}
+    mean_lat = sum(p["lat"] for p in points) / len(points)
+    return {
+        zoom: simplify_track(points, tolerance_for_zoom(zoom, mean_lat))
+        for zoom in ZOOM_TIERS
+    }
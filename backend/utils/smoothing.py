@@ -0,0 +1,213 @@
+import math
+from collections import deque
+from bisect import insort, bisect_left
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # scipy is optional; EMA falls back to a blocked numpy recurrence
+    lfilter = None
+
+
+SMOOTHING_METHODS = ("none", "moving_average", "ema", "median", "hysteresis", "hmm")
+
+# Label filters return 0.0 (Bad) / 1.0 (Good) per frame instead of a probability
+LABEL_METHODS = ("hysteresis", "hmm")
+
+
+# --- Offline (whole sequence) filters ---
+def moving_average(probs, window_size: int = 7) -> np.ndarray:
+    """Trailing mean over the last `window_size` frames (shorter window at the start)."""
+    x = np.asarray(probs, dtype=np.float64)
+    if x.size == 0:
+        return x
+    csum = np.cumsum(x)
+    out = np.empty_like(x)
+    w = min(window_size, x.size)
+    out[:w] = csum[:w] / np.arange(1, w + 1)
+    out[w:] = (csum[w:] - csum[:-w]) / w
+    return out
+
+
+def _ema_blocked(x: np.ndarray, alpha: float, block: int) -> np.ndarray:
+    """
+    y[t] = alpha * x[t] + (1 - alpha) * y[t-1], solved in closed form per block:
+    y[t] = d^(t+1) * y_prev + alpha * d^t * cumsum(x[k] / d^k). Blocks keep d^-k finite.
+    """
+    d = 1.0 - alpha
+    out = np.empty_like(x)
+    powers = d ** np.arange(block)
+    inv_powers = 1.0 / powers
+    y_prev = x[0]
+    for start in range(0, x.size, block):
+        chunk = x[start:start + block]
+        n = chunk.size
+        acc = np.cumsum(chunk * inv_powers[:n])
+        out[start:start + n] = powers[:n] * (d * y_prev + alpha * acc)
+        y_prev = out[start + n - 1]
+    return out
+
+
+def ema(probs, alpha: float = 0.3) -> np.ndarray:
+    """Exponential moving average seeded with the first frame."""
+    x = np.asarray(probs, dtype=np.float64)
+    if x.size == 0 or alpha >= 1.0:
+        return x.copy()
+    d = 1.0 - alpha
+    if lfilter is not None:
+        out, _ = lfilter([alpha], [1.0, -d], x, zi=[d * x[0]])
+        return out
+    # Largest block for which d^-block stays well inside float64 range
+    block = max(1, min(4096, int(600 / -math.log(d)))) if d > 0 else 1
+    return _ema_blocked(x, alpha, block)
+
+
+def median(probs, window_size: int = 7) -> np.ndarray:
+    """Trailing median over the last `window_size` frames; robust to single-frame spikes."""
+    x = np.asarray(probs, dtype=np.float64)
+    if x.size == 0:
+        return x
+    w = min(window_size, x.size)
+    out = np.empty_like(x)
+    for i in range(w - 1):
+        out[i] = np.median(x[:i + 1])
+    out[w - 1:] = np.median(np.lib.stride_tricks.sliding_window_view(x, w), axis=1)
+    return out
+
+
+def hysteresis(probs, high: float = 0.6, low: float = 0.4) -> np.ndarray:
+    """
+    Two-threshold labels: switch to Good only above `high` and back to Bad only
+    below `low`. The first frame is labeled by the usual 0.5 threshold.
+    """
+    x = np.asarray(probs, dtype=np.float64)
+    if x.size == 0:
+        return x
+    state = np.full(x.size, np.nan)
+    state[x > high] = 1.0
+    state[x < low] = 0.0
+    if np.isnan(state[0]):
+        state[0] = 1.0 if x[0] > 0.5 else 0.0
+    # Forward-fill: every frame inherits the last frame that crossed a threshold
+    last = np.where(~np.isnan(state), np.arange(x.size), 0)
+    np.maximum.accumulate(last, out=last)
+    return state[last]
+
+
+def _hmm_params(switch_prob: float, eps: float = 1e-6):
+    # Per-frame evidence is the classifier log-odds; a label switch costs log(stay/switch)
+    return math.log((1.0 - switch_prob) / switch_prob), eps
+
+
+def hmm(probs, switch_prob: float = 0.01) -> np.ndarray:
+    """
+    Most likely Good/Bad label sequence (Viterbi) of a two-state HMM that treats
+    the classifier probability as the emission likelihood and switches state
+    with probability `switch_prob` per frame.
+
+    With two states the forward pass reduces to the score difference
+    d[t] = logit(p[t]) + clip(d[t-1], -c, c), c = log((1 - s) / s), and the
+    back-pointers only change where |d| exceeds c, so backtracking is a
+    vectorized backward fill.
+    """
+    x = np.asarray(probs, dtype=np.float64)
+    if x.size == 0:
+        return x
+    c, eps = _hmm_params(switch_prob)
+    p = np.clip(x, eps, 1.0 - eps)
+    logits = (np.log(p) - np.log1p(-p)).tolist()
+
+    # Forward pass (scalar recurrence over plain floats)
+    d = [0.0] * len(logits)
+    prev = 0.0
+    for i, l in enumerate(logits):
+        prev = l + (c if prev > c else -c if prev < -c else prev)
+        d[i] = prev
+    d = np.asarray(d)
+
+    # Backtrack: a frame whose score left [-c, c] fixes the state of the path before
+    # the next frame; otherwise the state equals the following frame's state
+    forced = np.full(x.size, np.nan)
+    forced[d > c] = 1.0
+    forced[d < -c] = 0.0
+    forced[-1] = 1.0 if d[-1] > 0 else 0.0
+    idx = np.where(~np.isnan(forced), np.arange(x.size), x.size - 1)
+    idx = np.minimum.accumulate(idx[::-1])[::-1]
+    return forced[idx]
+
+
+def smooth(probs, method: str = "ema", **params) -> list:
+    """Apply a smoothing method by name; returns a list of floats."""
+    if method == "moving_average":
+        return moving_average(probs, **params).tolist()
+    if method == "ema":
+        return ema(probs, **params).tolist()
+    if method == "median":
+        return median(probs, **params).tolist()
+    if method == "hysteresis":
+        return hysteresis(probs, **params).tolist()
+    if method == "hmm":
+        return hmm(probs, **params).tolist()
+    return [float(p) for p in probs]
+
+
+# --- Causal streaming filters (frame by frame, during inference) ---
+class StreamingSmoother:
+    """
+    Frame-by-frame version of `smooth`. Moving average, EMA, median and
+    hysteresis only look at past frames, so values match the offline filters
+    exactly. For "hmm" it returns the final state of the best path so far
+    (forward filtering); the offline Viterbi decode may revise earlier frames.
+    """
+
+    def __init__(self, method: str = "ema", window_size: int = 7, alpha: float = 0.3,
+                 high: float = 0.6, low: float = 0.4, switch_prob: float = 0.01):
+        self.method = method
+        self.window_size = window_size
+        self.alpha = alpha
+        self.high, self.low = high, low
+        self.c, self.eps = _hmm_params(switch_prob)
+        self.window = deque()
+        self.ordered = []
+        self.total = 0.0
+        self.last = None
+
+    def __call__(self, p: float) -> float:
+        p = float(p)
+        if self.method == "moving_average":
+            self.window.append(p)
+            self.total += p
+            if len(self.window) > self.window_size:
+                self.total -= self.window.popleft()
+            return self.total / len(self.window)
+
+        if self.method == "ema":
+            self.last = p if self.last is None else self.alpha * p + (1 - self.alpha) * self.last
+            return self.last
+
+        if self.method == "median":
+            self.window.append(p)
+            insort(self.ordered, p)
+            if len(self.window) > self.window_size:
+                del self.ordered[bisect_left(self.ordered, self.window.popleft())]
+            n = len(self.ordered)
+            mid = n // 2
+            return self.ordered[mid] if n % 2 else (self.ordered[mid - 1] + self.ordered[mid]) / 2
+
+        if self.method == "hysteresis":
+            if p > self.high:
+                self.last = 1.0
+            elif p < self.low:
+                self.last = 0.0
+            elif self.last is None:
+                self.last = 1.0 if p > 0.5 else 0.0
+            return self.last
+
+        if self.method == "hmm":
+            q = min(max(p, self.eps), 1.0 - self.eps)
+            prev = 0.0 if self.last is None else max(-self.c, min(self.c, self.last))
+            self.last = math.log(q) - math.log1p(-q) + prev
+            return 1.0 if self.last > 0 else 0.0
+
+        return p
@@ -0,0 +1,263 @@
+import math
+import threading
+from array import array
+
+# Grid cell size in degrees (~1.1 km at the equator). Small enough that a
+# city-scale bbox fully contains most of the cells it touches, so those are
+# answered from per-cell aggregates without scanning individual points.
+DEFAULT_CELL_DEG = 0.01
+
+# Fine cells per side of a coarse cell. Coarse cells only keep aggregates and
+# make region-scale queries independent of the number of fine cells covered.
+COARSE_FACTOR = 10
+
+
+class _Aggregate:
+    """Per-video statistics of a coarse cell (no point storage)."""
+
+    __slots__ = ("count", "min_ts", "max_ts", "good", "bad")
+
+    def __init__(self):
+        self.count = 0
+        self.min_ts = math.inf
+        self.max_ts = -math.inf
+        self.good = 0
+        self.bad = 0
+
+    def stats(self):
+        return self.count, self.min_ts, self.max_ts, self.good, self.bad
+
+
+class _Bucket:
+    """Points of one video that fall into one grid cell, plus running aggregates."""
+
+    __slots__ = ("lats", "lons", "timestamps", "highlights", "min_ts", "max_ts", "good", "bad")
+
+    def __init__(self):
+        self.lats = array("d")
+        self.lons = array("d")
+        self.timestamps = array("d")
+        self.highlights = array("b")  # 1 = good, 0 = bad, -1 = not inferred yet
+        self.min_ts = math.inf
+        self.max_ts = -math.inf
+        self.good = 0
+        self.bad = 0
+
+    def add(self, lat, lon, timestamp, highlight):
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.timestamps.append(timestamp)
+        self.highlights.append(-1 if highlight is None else int(bool(highlight)))
+        self.min_ts = min(self.min_ts, timestamp)
+        self.max_ts = max(self.max_ts, timestamp)
+        if highlight is True:
+            self.good += 1
+        elif highlight is False:
+            self.bad += 1
+
+    def stats(self):
+        return len(self.timestamps), self.min_ts, self.max_ts, self.good, self.bad
+
+
+class GridIndex:
+    """
+    In-process grid-hash spatial index over GPS points of all videos.
+
+    Two levels: coarse cells fully inside a query bbox contribute their
+    aggregates directly, fine cells fully inside contribute theirs, and only
+    the fine cells on the bbox border are scanned point by point.
+    """
+
+    def __init__(self, cell_deg: float = DEFAULT_CELL_DEG, coarse_factor: int = COARSE_FACTOR):
+        self.cell_deg = cell_deg
+        self.coarse_factor = coarse_factor
+        self.cells = {}          # (ix, iy) -> {video_id: _Bucket}
+        self.coarse = {}         # (cx, cy) -> {video_id: _Aggregate}
+        self.video_cells = {}    # video_id -> set of (ix, iy)
+        self.loaded = False
+        self.loaded_at = 0.0     # time.monotonic() of the last full build
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()  # one full build at a time
+        self._changed = None     # video ids updated while a full build runs
+
+    def _cell(self, lat, lon):
+        return (math.floor(lon / self.cell_deg), math.floor(lat / self.cell_deg))
+
+    def _coarse_of(self, key):
+        return (key[0] // self.coarse_factor, key[1] // self.coarse_factor)
+
+    # --- Maintenance ---
+    def add_points(self, video_id: int, points: list):
+        """points: iterable of dicts with keys lat, lon, timestamp, highlight"""
+        with self.lock:
+            if self._changed is not None:
+                self._changed.add(video_id)
+            owned = self.video_cells.setdefault(video_id, set())
+            for p in points:
+                if p["lat"] is None or p["lon"] is None:
+                    continue
+                key = self._cell(p["lat"], p["lon"])
+                bucket = self.cells.setdefault(key, {}).get(video_id)
+                if bucket is None:
+                    bucket = self.cells[key][video_id] = _Bucket()
+                    owned.add(key)
+                timestamp, highlight = p["timestamp"] or 0.0, p.get("highlight")
+                bucket.add(p["lat"], p["lon"], timestamp, highlight)
+
+                agg = self.coarse.setdefault(self._coarse_of(key), {}).get(video_id)
+                if agg is None:
+                    agg = self.coarse[self._coarse_of(key)][video_id] = _Aggregate()
+                agg.count += 1
+                agg.min_ts = min(agg.min_ts, timestamp)
+                agg.max_ts = max(agg.max_ts, timestamp)
+                if highlight is True:
+                    agg.good += 1
+                elif highlight is False:
+                    agg.bad += 1
+
+    def remove_video(self, video_id: int):
+        with self.lock:
+            if self._changed is not None:
+                self._changed.add(video_id)
+            for key in self.video_cells.pop(video_id, ()):
+                videos = self.cells.get(key)
+                if videos is None:
+                    continue
+                videos.pop(video_id, None)
+                if not videos:
+                    del self.cells[key]
+                coarse_videos = self.coarse.get(self._coarse_of(key))
+                if coarse_videos is not None:
+                    coarse_videos.pop(video_id, None)
+                    if not coarse_videos:
+                        del self.coarse[self._coarse_of(key)]
+
+    def replace_video(self, video_id: int, points: list):
+        with self.lock:
+            self.remove_video(video_id)
+            self.add_points(video_id, points)
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._changed is not None
+
+    def begin_rebuild(self):
+        """Start recording updated videos; a replacement index is being built elsewhere."""
+        with self.lock:
+            self._changed = set()
+
+    def swap_in(self, built: "GridIndex", loaded_at: float) -> set:
+        """
+        Take over the contents of a freshly built index in one step. Returns the
+        videos updated here since begin_rebuild(), which the build may have missed.
+        """
+        with self.lock:
+            self.cells, self.coarse, self.video_cells = built.cells, built.coarse, built.video_cells
+            self.loaded, self.loaded_at = True, loaded_at
+            changed, self._changed = self._changed or set(), None
+        return changed
+
+    def abort_rebuild(self):
+        with self.lock:
+            self._changed = None
+
+    def clear(self):
+        with self.lock:
+            self.cells.clear()
+            self.coarse.clear()
+            self.video_cells.clear()
+            self.loaded = False
+
+    # --- Query ---
+    def query(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> dict:
+        """
+        Returns {video_id: {"point_count", "start_time", "end_time", "good", "bad", "unlabeled"}}
+        for every video with at least one point inside the bbox.
+        """
+        x0, y0 = self._cell(min_lat, min_lon)
+        x1, y1 = self._cell(max_lat, max_lon)
+        cx0, cy0 = self._coarse_of((x0, y0))
+        cx1, cy1 = self._coarse_of((x1, y1))
+        coarse_deg = self.cell_deg * self.coarse_factor
+        results = {}
+
+        with self.lock:
+            for ckey in _keys_in_range(self.coarse, cx0, cy0, cx1, cy1):
+                videos = self.coarse.get(ckey)
+                if not videos:
+                    continue
+                if _cell_inside(ckey, coarse_deg, min_lon, min_lat, max_lon, max_lat):
+                    for video_id, agg in videos.items():
+                        _merge(results, video_id, agg.stats())
+                    continue
+
+                # Border coarse cell: descend into the fine cells it shares with the bbox.
+                fx0 = max(x0, ckey[0] * self.coarse_factor)
+                fy0 = max(y0, ckey[1] * self.coarse_factor)
+                fx1 = min(x1, (ckey[0] + 1) * self.coarse_factor - 1)
+                fy1 = min(y1, (ckey[1] + 1) * self.coarse_factor - 1)
+                for key in ((ix, iy) for ix in range(fx0, fx1 + 1) for iy in range(fy0, fy1 + 1)):
+                    cell_videos = self.cells.get(key)
+                    if not cell_videos:
+                        continue
+                    inside = _cell_inside(key, self.cell_deg, min_lon, min_lat, max_lon, max_lat)
+                    for video_id, bucket in cell_videos.items():
+                        stats = bucket.stats() if inside else _scan_bucket(bucket, min_lon, min_lat, max_lon, max_lat)
+                        if stats is not None:
+                            _merge(results, video_id, stats)
+
+        for stats in results.values():
+            stats["unlabeled"] = stats["point_count"] - stats["good"] - stats["bad"]
+        return results
+
+
+def _keys_in_range(cells, x0, y0, x1, y1):
+    if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(cells):
+        return [(ix, iy) for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1)]
+    # Huge bbox over a sparse index: walk the occupied cells instead.
+    return [k for k in cells if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+
+
+def _cell_inside(key, size, min_lon, min_lat, max_lon, max_lat):
+    ix, iy = key
+    return (
+        ix * size >= min_lon and (ix + 1) * size <= max_lon
+        and iy * size >= min_lat and (iy + 1) * size <= max_lat
+    )
+
+
+def _scan_bucket(bucket, min_lon, min_lat, max_lon, max_lat):
+    count = good = bad = 0
+    min_ts, max_ts = math.inf, -math.inf
+    lats, lons, ts, hl = bucket.lats, bucket.lons, bucket.timestamps, bucket.highlights
+    for i in range(len(ts)):
+        if min_lat <= lats[i] <= max_lat and min_lon <= lons[i] <= max_lon:
+            count += 1
+            min_ts = min(min_ts, ts[i])
+            max_ts = max(max_ts, ts[i])
+            if hl[i] == 1:
+                good += 1
+            elif hl[i] == 0:
+                bad += 1
+    if count == 0:
+        return None
+    return count, min_ts, max_ts, good, bad
+
+
+def _merge(results, video_id, stats):
+    count, min_ts, max_ts, good, bad = stats
+    entry = results.get(video_id)
+    if entry is None:
+        results[video_id] = {
+            "point_count": count, "start_time": min_ts, "end_time": max_ts, "good": good, "bad": bad,
+        }
+        return
+    entry["point_count"] += count
+    entry["start_time"] = min(entry["start_time"], min_ts)
+    entry["end_time"] = max(entry["end_time"], max_ts)
+    entry["good"] += good
+    entry["bad"] += bad
+
+
+# Process-wide index, lazily filled from the database on first search.
+gps_index = GridIndex()
@@ -3,6 +3,8 @@ from pathlib import Path
 import tempfile
 import os
 
+from .. import metrics
+
 def transcode_to_h264(input_path: str) -> str:
     """
     Transcodes a video to H.264 (.mp4) format and overwrites the input file.
@@ -32,7 +34,8 @@ def transcode_to_h264(input_path: str) -> str:
     ]
 
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with metrics.stage("transcode"):
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         os.replace(tmp_file, input_path)  # Atomically overwrite original
         print(f"✅ Transcoding complete: {input_path.name}")
         return str(input_path)
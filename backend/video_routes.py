@@ -1,105 +1,472 @@
 # /backend/video_routes.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from sqlalchemy.orm import Session
-from . import crud, models, database
-from .inference_utils import run_inference_on_video_async, progress_tracker
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import async_crud, crud, models, database, metrics, worker
+from .batch_jobs import jobs_from_directory, jobs_from_video_ids
+from .checkpoints import CASCADE_MODEL_PATH, DEFAULT_CHECKPOINT, checkpoint_path, list_checkpoints
+from .progress import progress_bus
+from .utils.cam_store import CamCache, read_cams
+from .utils.previews import MANIFEST_NAME, preview_dir
 from .utils.transcode import transcode_to_h264
 import os
+import json
+import uuid
+import zlib
 import asyncio
+import numpy as np
+from typing import List
 
 router = APIRouter()
 
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
+# Manifests and reports of batch jobs (kept out of the public /uploads tree)
+BATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batches")
+
+# On-demand Grad-CAM: frames per request, and the API process's cache of computed maps
+GRADCAM_MAX_FRAMES = 150
+GRADCAM_TIMEOUT_SECONDS = float(os.environ.get("RAHI_GRADCAM_TIMEOUT", "60"))
+gradcam_cache = CamCache(int(os.environ.get("RAHI_GRADCAM_CACHE_MB", "64")) * 1024 * 1024)
+_gradcam_inflight = {}  # (source, first, last, seconds) -> asyncio.Task computing that range
+
+def _reindex_when_done(future, video_ids):
+    """
+    Jobs save GPS highlights from the worker process, whose spatial index is
+    its own: refresh this process's index for those videos once the job ends.
+    """
+    def refresh(_):
+        db = database.SessionLocal()
+        try:
+            for video_id in video_ids:
+                crud.reindex_video(db, video_id)
+        except Exception as e:
+            print(f"⚠️ Spatial index refresh failed: {e}")
+        finally:
+            db.close()
+
+    future.add_done_callback(refresh)
+
+
+def _check_cascade_model(cascade: bool):
+    """Reject cascade jobs up front: without the small checkpoint they would only fail in the worker."""
+    if cascade and not os.path.isfile(CASCADE_MODEL_PATH):
+        raise HTTPException(
+            status_code=422,
+            detail=f"cascade needs the small checkpoint {os.path.basename(CASCADE_MODEL_PATH)} (RAHI_CASCADE_MODEL_PATH)",
+        )
+
+
 @router.post("/videos/{video_id}/inference")
 async def infer_on_video(
     video_id: int,
-    background_tasks: BackgroundTasks,
     generate_heatmap: bool = Query(default=False),
-    smoothing: str = Query(default="ema", description="Smoothing method: 'ema' or 'moving_average'"),
-    db: Session = Depends(database.get_db),
+    smoothing: str = Query(default="ema", pattern="^(none|moving_average|ema|median|hysteresis|hmm)$", description="Smoothing method: 'ema', 'moving_average', 'median', or label filters 'hysteresis' / 'hmm'"),
+    output_format: str = Query(default="mp4", pattern="^(mp4|hls)$", description="'mp4' (rendered after scoring) or 'hls' (segments streamed while scoring)"),
+    render_mode: str = Query(default="burned", pattern="^(burned|overlay)$", description="'burned' (labels drawn into a re-encoded video) or 'overlay' (timed label metadata only)"),
+    heatmap_mode: str = Query(default="video", pattern="^(video|cams)$", description="'video' (full-resolution heatmap video) or 'cams' (raw low-res CAMs, composited client-side)"),
+    profile: str = Query(default=None, pattern="^(torch|pyspy)$", description="Capture a torch-profiler trace or py-spy flamegraph of this job (written to backend/profiles/)"),
+    cascade: bool = Query(default=False, description="Score with the small checkpoint first; ResNet-101 only for uncertain frames (not with heatmaps)"),
+    cascade_band: float = Query(default=0.15, gt=0, le=0.5, description="Escalate frames whose probability is within this distance of 0.5"),
+    inference_profile: str = Query(default="default", pattern="^(fast|balanced|default|accurate)$", description="Model input resolution: 'fast' 256x192, 'balanced' 384x288, 'default' 512x384, 'accurate' 640x480"),
+    sparse: bool = Query(default=False, description="Only score frames around each GPS timestamp (map coloring only: no rendered video, not with heatmaps)"),
+    sparse_neighbors: int = Query(default=2, ge=0, le=15, description="Frames scored on each side of a GPS timestamp and averaged"),
+    checkpoint: str = Query(default=DEFAULT_CHECKPOINT, description="Checkpoint to score with (see /api/checkpoints)"),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    video = crud.get_video_with_gps(db, video_id)
+    video = await async_crud.get_video(db, video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
+    try:
+        model_path = checkpoint_path(checkpoint)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if cascade and generate_heatmap:
+        raise HTTPException(status_code=422, detail="cascade cannot be combined with generate_heatmap")
+    _check_cascade_model(cascade)
+    sparse_timestamps = None
+    if sparse:
+        if generate_heatmap:
+            raise HTTPException(status_code=422, detail="sparse cannot be combined with generate_heatmap")
+        sparse_timestamps = await async_crud.get_gps_timestamps(db, video_id)
+        if not sparse_timestamps:
+            raise HTTPException(status_code=422, detail="Sparse inference needs the video's GPS track")
 
-    model_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)),
-        "BinaryClassification", "CBAM", "weights", "model_best.pth.tar",
-    )
+    # ✅ Ensure the video is in H.264 before inference (content-addressed uploads were transcoded when stored)
+    if video.content_hash is None:
+        try:
+            transcoded_path = await asyncio.to_thread(transcode_to_h264, video.file_path)
+            if transcoded_path != video.file_path:
+                await async_crud.update_video_path(db, video, transcoded_path)
+        except Exception as e:
+            print(f"⚠️ Transcoding before inference failed: {e}")
+    video_path = video.file_path
+
+    # Initialize progress
+    progress_bus.start(str(video_id), total=1, status="starting")
+
+    # ✅ Score in an inference worker process (see worker.py)
+    future = worker.submit(worker.run_video_job, video_id, video_path, {
+        "generate_heatmap": generate_heatmap,
+        "smoothing": smoothing,
+        "output_format": output_format,
+        "render_mode": render_mode,
+        "heatmap_mode": heatmap_mode,
+        "profile": profile,
+        "cascade": cascade,
+        "cascade_band": cascade_band,
+        "inference_profile": inference_profile,
+        "sparse_timestamps": sparse_timestamps,
+        "sparse_neighbors": sparse_neighbors,
+        "model_path": model_path,
+    }, progress_id=str(video_id))
+    _reindex_when_done(future, [video_id])
+
+    return {"message": "Inference started", "status": "running"}
+
+
+@router.get("/checkpoints")
+def get_checkpoints():
+    """Checkpoint names accepted by the inference and evaluation routes."""
+    return {"checkpoints": list_checkpoints(), "default": DEFAULT_CHECKPOINT}
 
-    # ✅ Always ensure uploaded video is in H.264 before inference
+
+@router.post("/videos/{video_id}/evaluate")
+async def evaluate_checkpoints(
+    video_id: int,
+    checkpoints: List[str] = Query(..., description="Two or more checkpoint names to compare"),
+    smoothing: str = Query(default="ema", pattern="^(none|moving_average|ema|median|hysteresis|hmm)$"),
+    batch_size: int = Query(default=8, ge=1, le=64),
+    inference_profile: str = Query(default="default", pattern="^(fast|balanced|default|accurate)$", description="Model input resolution"),
+    render: bool = Query(default=False, description="Also render a video with every checkpoint's label"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Score the video with several checkpoints from a single decode pass (see
+    evaluate.py). Poll /api/evaluations/{job_id} for progress and the report.
+    """
+    video = await async_crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    names = list(dict.fromkeys(checkpoints))
+    if len(names) < 2:
+        raise HTTPException(status_code=422, detail="Pass at least two distinct checkpoints")
     try:
-        transcoded_path = transcode_to_h264(video.file_path)
-        if transcoded_path != video.file_path:
-            video.file_path = transcoded_path
-            db.commit()
-    except Exception as e:
-        print(f"⚠️ Transcoding before inference failed: {e}")
+        paths = {name: checkpoint_path(name) for name in names}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-    # Initialize progress
-    progress_tracker[str(video_id)] = {"current": 0, "total": 1, "status": "starting"}
+    job_id = f"eval-{uuid.uuid4().hex[:8]}"
+    progress_bus.start(job_id, total=1, status="starting")
+    worker.submit(worker.run_evaluation_job, job_id, video_id, video.file_path, paths, {
+        "batch_size": batch_size,
+        "inference_profile": inference_profile,
+        "smoothing": smoothing,
+        "render": render,
+    }, progress_id=job_id)
+    return {"message": "Evaluation started", "job_id": job_id, "checkpoints": names}
 
-    async def inference_job():
-        try:
-            results = await run_inference_on_video_async(
-                video_path=video.file_path,
-                video_id=str(video_id),
-                model_path=model_path,
-                generate_heatmap=generate_heatmap,
-                smoothing=smoothing,
-            )
-
-            crud.update_gps_points_with_inference(
-                db=db,
-                video_id=video_id,
-                frame_timestamps=results["frame_timestamps"],
-                raw_probs=results["raw_probs"],
-                smoothed_probs=results.get("smoothed_probs"),
-            )
-
-            crud.create_inference_result(
-                db=db,
-                video_id=video_id,
-                inference_results_path=results["csv_output"],
-                heatmap_path=results["heatmap_video"] if generate_heatmap else None,
-                created_at=results["created_at"],
-            )
-
-            progress_tracker[str(video_id)]["status"] = "done"
 
-        except Exception as e:
-            progress_tracker[str(video_id)]["status"] = f"error: {str(e)}"
-            print(f"[ERROR] Inference failed for video {video_id}: {e}")
+def _evaluation_dict(evaluation: models.ModelEvaluation) -> dict:
+    return {
+        "id": evaluation.id,
+        "job_id": evaluation.job_id,
+        "video_id": evaluation.video_id,
+        "checkpoints": json.loads(evaluation.checkpoints),
+        "probs_path": evaluation.probs_path,
+        "report_path": evaluation.report_path,
+        "output_path": evaluation.output_path,
+        "summary": json.loads(evaluation.summary) if evaluation.summary else None,
+        "created_at": evaluation.created_at,
+    }
 
-    def run_async_task(coro_func):
-        asyncio.run(coro_func())
 
-    # ✅ Launch inference asynchronously
-    background_tasks.add_task(run_async_task, inference_job)
+@router.get("/evaluations/{job_id}")
+async def get_evaluation(job_id: str, db: AsyncSession = Depends(database.get_async_db)):
+    """Progress of an evaluation job; once stored, the evaluation with its full report."""
+    evaluation = await async_crud.get_model_evaluation(db, job_id)
+    if evaluation is None:
+        return {**progress_bus.get(job_id), "evaluation": None}
+    result = _evaluation_dict(evaluation)
+    report_file = os.path.join(os.path.dirname(UPLOAD_DIR), evaluation.report_path)
+    if os.path.exists(report_file):
+        with open(report_file) as f:
+            result["report"] = json.load(f)
+    return {"status": "done", "evaluation": result}
 
-    return {"message": "Inference started", "status": "running"}
+
+@router.get("/videos/{video_id}/evaluations")
+async def get_video_evaluations(video_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    evaluations = await async_crud.get_model_evaluations_by_video(db, video_id)
+    return [_evaluation_dict(e) for e in evaluations]
+
+
+@router.post("/inference/batch")
+async def start_batch_inference(
+    video_ids: List[int] = Query(default=None, description="Video IDs to score"),
+    directory: str = Query(default=None, description="Directory under uploads/ to score (files only, no database rows)"),
+    smoothing: str = Query(default="ema", pattern="^(none|moving_average|ema|median|hysteresis|hmm)$"),
+    batch_size: int = Query(default=8, ge=1, le=64),
+    job_id: str = Query(default=None, pattern="^batch-[0-9a-f]{8}$", description="Resume an earlier batch job"),
+    cascade: bool = Query(default=False, description="Score with the small checkpoint first; ResNet-101 only for uncertain frames"),
+    cascade_band: float = Query(default=0.15, gt=0, le=0.5),
+    inference_profile: str = Query(default="default", pattern="^(fast|balanced|default|accurate)$", description="Model input resolution"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Score many videos with one resident model (see batch_inference.py).
+    Writes label sidecars and CSVs only (no re-encoded videos). Passing the
+    job_id of an interrupted job skips the videos it already finished.
+    """
+    if bool(video_ids) == bool(directory):
+        raise HTTPException(status_code=422, detail="Pass either video_ids or directory")
+    _check_cascade_model(cascade)
+
+    if video_ids:
+        jobs = await db.run_sync(jobs_from_video_ids, video_ids)
+    else:
+        root = os.path.realpath(UPLOAD_DIR)
+        path = os.path.realpath(os.path.join(root, directory))
+        if (path != root and not path.startswith(root + os.sep)) or not os.path.isdir(path):
+            raise HTTPException(status_code=404, detail="Directory not found")
+        jobs = jobs_from_directory(path)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="No videos to score")
+
+    job_id = job_id or f"batch-{uuid.uuid4().hex[:8]}"
+    job_dir = os.path.join(BATCH_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    progress_bus.start(job_id, total=len(jobs), status="starting")
+
+    future = worker.submit(worker.run_batch_job, job_id, jobs, job_dir, smoothing, batch_size, cascade, cascade_band,
+                           inference_profile, progress_id=job_id)
+    _reindex_when_done(future, [job["video_id"] for job in jobs if job["video_id"] is not None])
+    return {"message": "Batch inference started", "job_id": job_id, "videos": len(jobs)}
+
+
+@router.get("/inference/batch/{job_id}")
+def get_batch_inference(job_id: str):
+    """Progress (in videos) of a batch job, plus its throughput report once finished."""
+    report_path = os.path.join(BATCH_DIR, os.path.basename(job_id), "report.json")
+    report = None
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    return {**progress_bus.get(job_id), "report": report}
 
 
 @router.get("/videos/{video_id}/progress")
 async def get_progress(video_id: str):
-    progress = progress_tracker.get(str(video_id), {"current": 0, "total": 1, "status": "idle"})
-    percent = (progress["current"] / progress["total"]) * 100 if progress["total"] > 0 else 0
-    return {"progress": percent, "status": progress["status"]}
+    return progress_bus.get(str(video_id))
+
+
+@router.get("/videos/{video_id}/progress/stream")
+async def stream_progress(video_id: str):
+    """
+    Server-sent events with throttled progress snapshots (percent, frames/sec, ETA).
+    The stream closes once the job is done or has failed.
+    """
+    return StreamingResponse(
+        progress_bus.subscribe(str(video_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/videos/{video_id}/inference")
-def get_inference_history(video_id: int, db: Session = Depends(database.get_db)):
-    video = crud.get_video_with_gps(db, video_id)
+async def get_inference_history(video_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    video = await async_crud.get_video(db, video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    inference_results = crud.get_inference_results_by_video(db, video_id)
+    inference_results = await async_crud.get_inference_results_by_video(db, video_id)
     return [
         {
             "id": inf.id,
             "inference_results_path": inf.inference_results_path,
+            "output_path": inf.output_path,
+            "overlay_path": inf.overlay_path,
+            "has_cams": inf.cam_path is not None,
             "heatmap_path": inf.heatmap_path,
+            "cascade": json.loads(inf.cascade_stats) if inf.cascade_stats else None,
+            "inference_profile": inf.inference_profile,
             "created_at": inf.created_at
         }
         for inf in inference_results
     ]
+
+
+@router.get("/videos/{video_id}/cams")
+async def get_cams(
+    video_id: int,
+    request: Request,
+    start: int = Query(default=0, ge=0, description="First frame (inclusive)"),
+    end: int = Query(default=300, ge=1, description="Last frame (exclusive)"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Raw low-resolution Grad-CAM maps for a frame range as uint8 bytes
+    (frames x height x width, row-major). Shape, frame rate and range are in
+    X-Cam-* headers; the client upscales, color-maps and blends them.
+    """
+    result = await async_crud.get_latest_cam_result(db, video_id)
+    cam_path = crud._stored_file(result.cam_path) if result else None
+    if cam_path is None or not os.path.exists(cam_path):
+        raise HTTPException(status_code=404, detail="No stored CAMs for this video")
+    if end <= start:
+        raise HTTPException(status_code=422, detail="end must be greater than start")
+
+    cams, meta = await asyncio.to_thread(read_cams, cam_path, start, end)
+    return await _cam_response(request, cams, start, meta)
+
+
+async def _cam_response(request: Request, cams, start: int, meta: dict, headers: dict = None) -> Response:
+    """CAM frames as raw uint8 bytes, described by X-Cam-* headers (deflated if the client accepts it)."""
+    body = cams.tobytes()
+    headers = {
+        "X-Cam-Shape": ",".join(str(d) for d in cams.shape),
+        "X-Cam-Start": str(start),
+        "X-Cam-Total-Frames": str(meta["frames"]),
+        "X-Cam-Fps": str(meta["fps"]),
+        "Cache-Control": "public, max-age=60, must-revalidate",
+        **(headers or {}),
+    }
+    if "deflate" in request.headers.get("accept-encoding", ""):
+        body = await asyncio.to_thread(zlib.compress, body, 6)
+        headers["Content-Encoding"] = "deflate"
+    return Response(content=body, media_type="application/octet-stream", headers=headers)
+
+
+async def _compute_cams(source, video_key, video_path, model_path, first, last, inference_profile, seconds):
+    """Grad-CAM of one range in the interactive worker lane; the maps go into the cache."""
+    outcome = await asyncio.wrap_future(worker.submit(
+        worker.run_gradcam_job, video_path, model_path, first, last, inference_profile, seconds,
+        GRADCAM_MAX_FRAMES, lane="interactive",
+    ))
+    cams, computed = outcome["result"]
+    gradcam_cache.set_video_meta(video_key, computed["fps"], computed["frames"])
+    gradcam_cache.put(source, computed["start"], list(cams))
+    return cams, computed
+
+
+def _gradcam_done(key, task):
+    _gradcam_inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # retrieved here in case every waiting request timed out
+
+
+@router.get("/videos/{video_id}/gradcam")
+async def get_gradcam(
+    video_id: int,
+    request: Request,
+    start: int = Query(default=None, ge=0, description="First frame (inclusive)"),
+    end: int = Query(default=None, ge=1, description="Last frame (exclusive); defaults to start + 1"),
+    start_time: float = Query(default=None, ge=0, description="Start of the range in seconds (instead of start)"),
+    end_time: float = Query(default=None, ge=0, description="End of the range in seconds; defaults to one frame"),
+    checkpoint: str = Query(default=DEFAULT_CHECKPOINT),
+    inference_profile: str = Query(default="default", pattern="^(fast|balanced|default|accurate)$", description="Model input resolution"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Grad-CAM computed on demand for one frame or a short range, in the /cams
+    format. A worker of the interactive lane (never queued behind inference
+    jobs) seeks to the range and runs only those frames; computed maps are
+    kept in an LRU cache (RAHI_GRADCAM_CACHE_MB, X-Cam-Cache: hit, partial or
+    miss). Ranges are capped at GRADCAM_MAX_FRAMES frames; requests give up
+    with 504 after RAHI_GRADCAM_TIMEOUT seconds.
+    """
+    if (start is None) == (start_time is None):
+        raise HTTPException(status_code=422, detail="Pass either start or start_time")
+    video = await async_crud.get_video(db, video_id)
+    if not video or not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+    try:
+        model_path = checkpoint_path(checkpoint)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # Cached maps stay valid until the video file or checkpoint changes
+    video_key = (video.file_path, os.path.getmtime(video.file_path))
+    source = (video_key, model_path, os.path.getmtime(model_path), inference_profile)
+    meta = gradcam_cache.video_meta(video_key)
+
+    seconds = start is None
+    if seconds:
+        first, last = start_time, end_time if end_time is not None else start_time
+        if last < first:
+            raise HTTPException(status_code=422, detail="end_time must not be before start_time")
+        if meta:
+            # Same frame mapping as compute_cams
+            fps = meta["fps"]
+            start, end = int(first * fps), max(int(first * fps) + 1, int(np.ceil(last * fps)))
+            seconds = False
+    else:
+        end = end if end is not None else start + 1
+        if end <= start:
+            raise HTTPException(status_code=422, detail="end must be greater than start")
+    if not seconds:
+        if meta:
+            if start >= meta["frames"]:
+                raise HTTPException(status_code=422, detail="start is past the end of the video")
+            end = min(end, meta["frames"])
+        if end - start > GRADCAM_MAX_FRAMES:
+            raise HTTPException(status_code=422, detail=f"At most {GRADCAM_MAX_FRAMES} frames per request")
+
+    cached = {} if seconds else gradcam_cache.get(source, start, end)
+    hits = len(cached)
+    if seconds or hits < end - start:
+        if seconds:
+            first_frame, last_frame = first, last
+        else:
+            # One seek per request: compute from the first to the last missing frame
+            missing = [i for i in range(start, end) if i not in cached]
+            first_frame, last_frame = missing[0], missing[-1] + 1
+        # Identical concurrent misses share one computation
+        key = (source, first_frame, last_frame, seconds)
+        task = _gradcam_inflight.get(key)
+        if task is None:
+            task = _gradcam_inflight[key] = asyncio.create_task(_compute_cams(
+                source, video_key, video.file_path, model_path, first_frame, last_frame, inference_profile, seconds,
+            ))
+            task.add_done_callback(lambda t: _gradcam_done(key, t))
+        try:
+            # shield: a request that gives up leaves the computation running for the cache
+            cams, computed = await asyncio.wait_for(asyncio.shield(task), GRADCAM_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Grad-CAM is taking too long, retry shortly")
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        meta = {"fps": computed["fps"], "frames": computed["frames"]}
+        if not len(cams):
+            raise HTTPException(status_code=422, detail="start is past the end of the video")
+        if seconds:
+            start, end = computed["start"], computed["start"] + len(cams)
+        cached.update({computed["start"] + i: cam for i, cam in enumerate(cams)})
+        end = min(end, max(cached) + 1)  # container frame counts can be estimates
+
+    metrics.gradcam_cache_frames_total.inc(hits, result="hit")
+    metrics.gradcam_cache_frames_total.inc(end - start - hits, result="miss")
+    cache_state = "hit" if hits == end - start else "partial" if hits else "miss"
+    frames = np.stack([cached[i] for i in range(start, end)])
+    return await _cam_response(request, frames, start, meta, {"X-Cam-Cache": cache_state})
+
+
+@router.get("/videos/{video_id}/previews")
+async def get_previews(video_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Scrubbing preview manifest (utils/previews.py) with the URLs of its sprite
+    sheets, WebVTT thumbnail track and proxy video under /previews/.
+    """
+    video = await async_crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    manifest_path = preview_dir(video.file_path) / MANIFEST_NAME
+    if video.content_hash is None or not manifest_path.exists():
+        raise HTTPException(status_code=404, detail="No previews for this video")
+
+    manifest = json.loads(await asyncio.to_thread(manifest_path.read_text))
+    base = f"previews/{video.content_hash}"
+    manifest["sheets"] = [f"{base}/{name}" for name in manifest["sheets"]]
+    manifest["vtt"] = f"{base}/{manifest['vtt']}"
+    manifest["proxy"] = f"{base}/{manifest['proxy']}" if manifest["proxy"] else None
+    return manifest
@@ -0,0 +1,185 @@
+# /backend/worker.py
+#
+# Inference worker processes. The API process never imports torch, OpenCV or
+# the model code: inference jobs are submitted here and run in a pool of
+# spawned worker processes, which import the inference engine on their first
+# job and keep the model resident for the next ones.
+#
+#     RAHI_INFERENCE_WORKERS=2     # worker processes for inference jobs (default 1)
+#     RAHI_INTERACTIVE_WORKERS=1   # separate lane for short requests a user waits on
+#                                  # (on-demand Grad-CAM), never queued behind long jobs
+#
+# Workers report progress through the shared job store (progress.py), so
+# RAHI_JOB_STORE=memory only suits scripts that never go through the pool.
+
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from . import metrics
+from .progress import progress_bus
+
+WORKERS = int(os.environ.get("RAHI_INFERENCE_WORKERS", "1"))
+INTERACTIVE_WORKERS = int(os.environ.get("RAHI_INTERACTIVE_WORKERS", "1"))
+LANES = {"jobs": WORKERS, "interactive": INTERACTIVE_WORKERS}
+
+# Tracked by the API process itself: a worker only sees its own jobs
+_API_METRICS = ("rahi_inference_jobs_running",)
+
+_pools = {}  # lane -> ProcessPoolExecutor
+_pool_lock = threading.Lock()
+
+
+def _get_pool(lane: str = "jobs"):
+    pool = _pools.get(lane)
+    if pool is None or pool._broken:
+        with _pool_lock:
+            pool = _pools.get(lane)
+            if pool is None or pool._broken:
+                if pool is not None:
+                    # A worker died (e.g. killed out of memory): the executor refuses every later job
+                    print(f"♻️ Replacing broken {lane} worker pool")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                # spawn: workers start from a clean interpreter instead of forking the API's threads
+                pool = _pools[lane] = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=LANES[lane], mp_context=multiprocessing.get_context("spawn"),
+                )
+    return pool
+
+
+def submit(job, *args, lane: str = "jobs", progress_id: str = None):
+    """
+    Run `job(*args)` in a worker process of `lane` ("jobs" or "interactive");
+    returns a concurrent.futures.Future of its result. If the worker dies,
+    the job `progress_id` is finished with an error on the progress bus.
+    """
+    try:
+        future = _get_pool(lane).submit(_run_job, job, *args)
+    except BrokenProcessPool:
+        # The pool broke after the check above; _get_pool replaces it now
+        future = _get_pool(lane).submit(_run_job, job, *args)
+    metrics.jobs_running.inc()
+    future.add_done_callback(functools.partial(_job_done, progress_id))
+    return future
+
+
+def shutdown():
+    """Stop the pools: queued jobs are dropped, running ones are waited for."""
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _pools.clear()
+
+
+def _job_done(progress_id, future):
+    metrics.jobs_running.dec()
+    if future.cancelled():
+        if progress_id is not None:
+            progress_bus.finish(progress_id, "error: cancelled")
+        return
+    try:
+        outcome = future.result()
+    except Exception as e:
+        # The worker process died (e.g. out of memory); the job could not report it
+        print(f"[ERROR] Inference worker failed: {e}")
+        if progress_id is not None:
+            progress_bus.finish(progress_id, "error: worker died")
+        return
+    metrics.registry.merge(outcome["metrics"])
+
+
+def _run_job(job, *args):
+    """Worker side: run one job and ship the metrics it produced back to the API process."""
+    result = job(*args)
+    return {"result": result, "metrics": metrics.registry.collect(reset=True, exclude=_API_METRICS)}
+
+
+# --- Jobs (executed inside worker processes) ---
+def run_video_job(video_id: int, video_path: str, options: dict):
+    """Score one video and persist its outputs; failures are reported on the progress bus."""
+    import asyncio
+
+    from . import crud, database
+    from .inference_utils import DEFAULT_MODEL_PATH, run_inference_on_video_async
+    from .progress import progress_bus
+
+    options = dict(options)
+    try:
+        results = asyncio.run(run_inference_on_video_async(
+            video_path=video_path,
+            video_id=str(video_id),
+            model_path=options.pop("model_path", None) or DEFAULT_MODEL_PATH,
+            **options,
+        ))
+
+        db = database.SessionLocal()
+        try:
+            crud.save_inference_outputs(db, video_id, results)
+        finally:
+            db.close()
+
+        progress_bus.finish(str(video_id), "done")
+
+    except Exception as e:
+        progress_bus.finish(str(video_id), f"error: {str(e)}")
+        print(f"[ERROR] Inference failed for video {video_id}: {e}")
+
+
+def run_batch_job(job_id: str, jobs: list, job_dir: str, smoothing: str, batch_size: int,
+                  cascade: bool = False, cascade_band: float = None, inference_profile: str = None):
+    """Batch inference (batch_inference.run_batch) with the manifest and report under job_dir."""
+    from .batch_inference import run_batch
+    from .inference_utils import CASCADE_MODEL_PATH, DEFAULT_CASCADE_BAND, DEFAULT_PROFILE
+    from .progress import progress_bus
+
+    try:
+        run_batch(
+            jobs,
+            manifest_path=os.path.join(job_dir, "manifest.jsonl"),
+            report_path=os.path.join(job_dir, "report.json"),
+            smoothing=smoothing,
+            batch_size=batch_size,
+            progress_id=job_id,
+            cascade_model_path=CASCADE_MODEL_PATH if cascade else None,
+            cascade_band=cascade_band or DEFAULT_CASCADE_BAND,
+            inference_profile=inference_profile or DEFAULT_PROFILE,
+        )
+    except Exception as e:
+        progress_bus.finish(job_id, f"error: {str(e)}")
+        print(f"[ERROR] Batch inference {job_id} failed: {e}")
+
+
+def run_gradcam_job(video_path: str, model_path: str, start: float, end: float, inference_profile: str,
+                    seconds: bool = False, max_frames: int = None):
+    """On-demand Grad-CAM of one frame range (inference_utils.compute_cams), returned to the API process."""
+    from .inference_utils import compute_cams
+
+    return compute_cams(video_path, model_path, start, end, inference_profile, seconds=seconds, max_frames=max_frames)
+
+
+def run_evaluation_job(job_id: str, video_id: int, video_path: str, checkpoints: dict, options: dict):
+    """Score one video with several checkpoints (evaluate.run_evaluation) and store the evaluation."""
+    from . import crud, database
+    from .evaluate import run_evaluation
+    from .progress import progress_bus
+
+    base, _ = os.path.splitext(video_path)
+    try:
+        results = run_evaluation(video_path, checkpoints, os.path.join(f"{base}_eval", job_id),
+                                 progress_id=job_id, **options)
+        summary = {k: v for k, v in results["report"].items() if k != "disagreements"}
+        db = database.SessionLocal()
+        try:
+            crud.create_model_evaluation(
+                db, video_id, job_id, list(checkpoints), results["probs_path"], results["report_path"],
+                output_path=results["output_video"], summary=summary,
+            )
+        finally:
+            db.close()
+        progress_bus.finish(job_id, "done")
+    except Exception as e:
+        progress_bus.finish(job_id, f"error: {str(e)}")
+        print(f"[ERROR] Checkpoint evaluation {job_id} failed: {e}")
@@ -1,24 +1,129 @@
-CREATE TABLE videos (
+-- Safe to re-run on an existing database: missing tables are created and
+-- tables from an older version of this file are upgraded (see the end).
+
+CREATE TABLE IF NOT EXISTS videos (
     id SERIAL PRIMARY KEY,
     name TEXT NOT NULL,
     file_path TEXT NOT NULL,
-    duration FLOAT
+    duration FLOAT,
+    content_hash TEXT
 );
 
-CREATE TABLE gps_points (
+CREATE TABLE IF NOT EXISTS gps_points (
     id SERIAL PRIMARY KEY,
     video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
     lat DOUBLE PRECISION,
     lon DOUBLE PRECISION,
     highlight BOOLEAN,
+    probability FLOAT,
     timestamp FLOAT
 );
 
-CREATE TABLE inference_ing (
+CREATE TABLE IF NOT EXISTS inference_ing (
     id SERIAL PRIMARY KEY,
-    video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE
+    video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
     inference_results_path TEXT NOT NULL,
+    output_path TEXT,
+    overlay_path TEXT,
+    cam_path TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    heatmap_path TEXT
+    heatmap_path TEXT,
+    cascade_stats TEXT,
+    inference_profile TEXT
+);
+
+
+CREATE TABLE IF NOT EXISTS gps_track_tiers (
+    id SERIAL PRIMARY KEY,
+    video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
+    zoom INTEGER NOT NULL,
+    segments TEXT NOT NULL
 );
 
+CREATE INDEX IF NOT EXISTS ix_gps_track_tiers_video_id ON gps_track_tiers (video_id);
+
+CREATE INDEX IF NOT EXISTS ix_gps_points_video_id ON gps_points (video_id);
+CREATE INDEX IF NOT EXISTS ix_gps_points_lat_lon ON gps_points (lat, lon);
+
+CREATE TABLE IF NOT EXISTS road_quality_cells (
+    id SERIAL PRIMARY KEY,
+    precision INTEGER NOT NULL,
+    geohash TEXT NOT NULL,
+    lat DOUBLE PRECISION NOT NULL,
+    lon DOUBLE PRECISION NOT NULL,
+    good_count INTEGER NOT NULL DEFAULT 0,
+    bad_count INTEGER NOT NULL DEFAULT 0,
+    probability_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    CONSTRAINT uq_road_quality_cells_precision_geohash UNIQUE (precision, geohash)
+);
+
+CREATE INDEX IF NOT EXISTS ix_road_quality_cells_precision_lat_lon ON road_quality_cells (precision, lat, lon);
+
+CREATE TABLE IF NOT EXISTS road_segments (
+    id SERIAL PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    start_time DOUBLE PRECISION NOT NULL,
+    end_time DOUBLE PRECISION NOT NULL,
+    start_lat DOUBLE PRECISION,
+    start_lon DOUBLE PRECISION,
+    end_lat DOUBLE PRECISION,
+    end_lon DOUBLE PRECISION,
+    length_m DOUBLE PRECISION,
+    mean_probability DOUBLE PRECISION NOT NULL,
+    min_probability DOUBLE PRECISION NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_road_segments_label_length ON road_segments (label, length_m);
+CREATE INDEX IF NOT EXISTS ix_road_segments_video_start ON road_segments (video_id, start_time);
+
+CREATE TABLE IF NOT EXISTS model_evaluations (
+    id SERIAL PRIMARY KEY,
+    job_id TEXT NOT NULL UNIQUE,
+    video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
+    checkpoints TEXT NOT NULL,
+    probs_path TEXT NOT NULL,
+    report_path TEXT NOT NULL,
+    output_path TEXT,
+    summary TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_model_evaluations_video_id ON model_evaluations (video_id);
+
+-- --- Upgrades of tables created by older versions (database.ADDED_COLUMNS) ---
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE gps_points ADD COLUMN IF NOT EXISTS probability FLOAT;
+ALTER TABLE inference_ing ADD COLUMN IF NOT EXISTS output_path TEXT;
+ALTER TABLE inference_ing ADD COLUMN IF NOT EXISTS overlay_path TEXT;
+ALTER TABLE inference_ing ADD COLUMN IF NOT EXISTS cam_path TEXT;
+ALTER TABLE inference_ing ADD COLUMN IF NOT EXISTS cascade_stats TEXT;
+ALTER TABLE inference_ing ADD COLUMN IF NOT EXISTS inference_profile TEXT;
+
+CREATE INDEX IF NOT EXISTS ix_videos_content_hash ON videos (content_hash);
+
+-- created_at was a text column in tables created by the application
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'inference_ing' AND column_name = 'created_at') = 'character varying' THEN
+        ALTER TABLE inference_ing ALTER COLUMN created_at TYPE TIMESTAMP USING created_at::timestamp;
+    END IF;
+END $$;
+
+-- Foreign keys to videos created by the application without ON DELETE CASCADE
+DO $$
+DECLARE
+    fk RECORD;
+BEGIN
+    FOR fk IN
+        SELECT conrelid::regclass AS tbl, conname
+        FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = 'videos'::regclass AND confdeltype <> 'c'
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE %s DROP CONSTRAINT %I, ADD CONSTRAINT %I FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE',
+            fk.tbl, fk.conname, fk.conname
+        );
+    END LOOP;
+END $$;
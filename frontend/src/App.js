@@ -2,8 +2,14 @@ import React, { useState, useRef, useEffect } from "react";
 import axios from "axios";
 import UploadForm from "./components/UploadForm";
 import VideoMap from "./components/VideoMap";
+import CamOverlay from "./components/CamOverlay";
+import ScrubPreview, { SpriteThumbnail } from "./components/ScrubPreview";
+import useHlsSource, { canPlayHls } from "./components/useHlsSource";
 import "./App.css";
 
+// Zoom tier requested for the simplified GPS track (matches the map's initial zoom)
+const TRACK_ZOOM = 16;
+
 export default function App() {
   const [videos, setVideos] = useState([]);
   const [videoData, setVideoData] = useState(null);
@@ -11,7 +17,11 @@ export default function App() {
   const [currentTime, setCurrentTime] = useState(0);
   const [inferenceStatus, setInferenceStatus] = useState("idle");
   const [progress, setProgress] = useState(0);
+  const [eta, setEta] = useState(null);
   const [showHeatmap, setShowHeatmap] = useState(false);
+  const [labelSegments, setLabelSegments] = useState([]);
+  const [previews, setPreviews] = useState(null);
+  const [mapHoverTime, setMapHoverTime] = useState(null);
 
   const videoRef = useRef(null);
   const heatmapRef = useRef(null);
@@ -33,7 +43,7 @@ export default function App() {
   // --- Load video details ---
   const handleUpload = async (id) => {
     try {
-      const res = await axios.get(`http://localhost:8000/video/${id}`);
+      const res = await axios.get(`http://localhost:8000/video/${id}?zoom=${TRACK_ZOOM}`);
       setVideoData(res.data);
       setCurrentTime(0);
       if (videoRef.current) videoRef.current.currentTime = 0;
@@ -68,32 +78,45 @@ export default function App() {
   };
 
   // --- Run inference + monitor progress ---
-  const handleRunInference = async () => {
+  // "sparse=true" only scores frames around GPS timestamps: map coloring, no rendered video
+  const handleRunInference = async (query = "generate_heatmap=true&heatmap_mode=cams") => {
     if (!videoData) return;
     try {
       setInferenceStatus("running");
       setProgress(0);
 
       await axios.post(
-        `http://localhost:8000/api/videos/${videoData.id}/inference?generate_heatmap=true`
+        `http://localhost:8000/api/videos/${videoData.id}/inference?${query}`
       );
 
-      const interval = setInterval(async () => {
-        const res = await axios.get(
-          `http://localhost:8000/api/videos/${videoData.id}/progress`
-        );
-        setProgress(res.data.progress);
+      // Progress is pushed over server-sent events instead of polled
+      const source = new EventSource(
+        `http://localhost:8000/api/videos/${videoData.id}/progress/stream`
+      );
+      source.onmessage = async (event) => {
+        const data = JSON.parse(event.data);
+        setProgress(data.progress);
+        setEta(data.eta_seconds);
 
-        if (res.data.status === "done" || res.data.progress >= 100) {
-          clearInterval(interval);
+        // HLS jobs expose their stream while inference is still running
+        if (data.stream_url && canPlayHls()) {
+          setMainVideoSrc(`http://localhost:8000/${data.stream_url}`);
+        }
+
+        if (data.status.startsWith("error")) {
+          source.close();
+          setInferenceStatus("idle");
+          alert("Inference failed. Check console for details.");
+        } else if (data.status === "done") {
+          source.close();
           setInferenceStatus("done");
 
           const refreshed = await axios.get(
-            `http://localhost:8000/video/${videoData.id}`
+            `http://localhost:8000/video/${videoData.id}?zoom=${TRACK_ZOOM}`
           );
           setVideoData(refreshed.data);
         }
-      }, 1000);
+      };
     } catch (err) {
       console.error("Inference failed:", err);
       setInferenceStatus("idle");
@@ -107,10 +130,17 @@ export default function App() {
 
     const getMainVideoSrc = async () => {
       const lastInference = videoData.inferences?.at(-1);
+      if (lastInference?.output_path && (!lastInference.output_path.endsWith(".m3u8") || canPlayHls())) {
+        return `http://localhost:8000/${lastInference.output_path}`;
+      }
+      if (lastInference?.overlay_path) {
+        // Overlay-only job: labels are drawn over the original video
+        return `http://localhost:8000/${videoData.file_url}`;
+      }
       if (lastInference?.inference_results_path) {
-        const inferenceName = videoData.name.replace(".mp4", "_inference.mp4");
-        const inferenceUrl = `http://localhost:8000/uploads/${encodeURIComponent(
-          inferenceName
+        const inferenceUrl = `http://localhost:8000/${videoData.file_url.replace(
+          ".mp4",
+          "_inference.mp4"
         )}`;
 
         try {
@@ -118,11 +148,11 @@ export default function App() {
           return inferenceUrl; // ✅ Inference video exists
         } catch {
           // fallback
-          return `http://localhost:8000/uploads/${encodeURIComponent(videoData.name)}`;
+          return `http://localhost:8000/${videoData.file_url}`;
         }
       }
 
-      return `http://localhost:8000/uploads/${encodeURIComponent(videoData.name)}`;
+      return `http://localhost:8000/${videoData.file_url}`;
     };
 
     (async () => {
@@ -131,13 +161,46 @@ export default function App() {
     })();
   }, [videoData]);
 
+  // --- Timed label metadata for overlay-only inference results ---
+  useEffect(() => {
+    const lastInference = videoData?.inferences?.at(-1);
+    if (!lastInference?.overlay_path || lastInference.output_path) {
+      setLabelSegments([]);
+      return;
+    }
+    axios
+      .get(`http://localhost:8000/${lastInference.overlay_path}`)
+      .then((res) => setLabelSegments(res.data.segments))
+      .catch((err) => console.error("Failed to fetch label overlay:", err));
+  }, [videoData]);
+
+  // --- Scrubbing sprites + proxy (built at upload) ---
+  useEffect(() => {
+    if (!videoData) return;
+    axios
+      .get(`http://localhost:8000/api/videos/${videoData.id}/previews`)
+      .then((res) => setPreviews(res.data))
+      .catch(() => setPreviews(null)); // uploads from before previews existed
+  }, [videoData?.id]);
+
+  const currentLabel = labelSegments.find(
+    (seg) => currentTime >= seg.start && currentTime < seg.end
+  );
+
   const getHeatmapSrc = () => {
     const lastInference = videoData?.inferences?.at(-1);
-    return lastInference?.heatmap_path
-      ? `http://localhost:8000/${lastInference.heatmap_path}`
+    const heatmapPath = lastInference?.heatmap_path;
+    return heatmapPath && (!heatmapPath.endsWith(".m3u8") || canPlayHls())
+      ? `http://localhost:8000/${heatmapPath}`
       : null;
   };
 
+  const hasCams = Boolean(videoData?.inferences?.at(-1)?.has_cams);
+
+  // HLS outputs (also while inference is still writing them) play through hls.js where needed
+  const mainVideoAttr = useHlsSource(videoRef, mainVideoSrc);
+  const heatmapVideoAttr = useHlsSource(heatmapRef, showHeatmap ? getHeatmapSrc() : null);
+
   // --- UI ---
   return (
     <div className="app-container">
@@ -157,7 +220,7 @@ export default function App() {
           >
             <video
               className="thumbnail-video"
-              src={`http://localhost:8000/uploads/${encodeURIComponent(v.name)}`}
+              src={`http://localhost:8000/${v.proxy_url || v.file_url}`}
               muted
               preload="metadata"
             />
@@ -180,48 +243,72 @@ export default function App() {
               <video
                 ref={videoRef}
                 className="base-video"
-                src={mainVideoSrc || ""}
+                src={mainVideoAttr}
                 controls
                 onTimeUpdate={handleTimeUpdate}
                 onPlay={() => heatmapRef.current && heatmapRef.current.play()}
                 onPause={() => heatmapRef.current && heatmapRef.current.pause()}
               />
 
+              {currentLabel && (
+                <div
+                  className={`label-overlay ${
+                    currentLabel.label === "Good" ? "label-good" : "label-bad"
+                  }`}
+                >
+                  {currentLabel.label} ({currentLabel.mean_probability.toFixed(2)})
+                </div>
+              )}
+
+              {/* Without stored maps, Grad-CAM is computed on demand for the part being watched */}
+              {showHeatmap && !getHeatmapSrc() && (
+                <CamOverlay videoRef={videoRef} videoId={videoData.id} onDemand={!hasCams} />
+              )}
+
               {showHeatmap && getHeatmapSrc() && (
                 <video
                   ref={heatmapRef}
                   className="heatmap-video-overlay"
-                  src={getHeatmapSrc()}
+                  src={heatmapVideoAttr}
                   muted
                 />
               )}
             </div>
 
-            {getHeatmapSrc() && (
-              <div className="toggle-btn-wrapper">
-                <button className="toggle-heatmap-btn" onClick={toggleHeatmap}>
-                  {showHeatmap
-                    ? "Hide Heatmap Overlay"
-                    : "Show Heatmap Overlay"}
-                </button>
-              </div>
-            )}
+            <ScrubPreview previews={previews} currentTime={currentTime} onSeek={handleSeek} />
+
+            <div className="toggle-btn-wrapper">
+              <button className="toggle-heatmap-btn" onClick={toggleHeatmap}>
+                {showHeatmap
+                  ? "Hide Heatmap Overlay"
+                  : getHeatmapSrc() || hasCams
+                  ? "Show Heatmap Overlay"
+                  : "Show Heatmap Overlay (on demand)"}
+              </button>
+            </div>
           </div>
 
           {/* --- Map --- */}
           <div className="map-wrapper">
             <VideoMap
               gpsPoints={videoData.gps_points}
+              segments={videoData.segments}
               currentTime={currentTime}
               onSeek={handleSeek}
+              onHover={setMapHoverTime}
             />
+            {mapHoverTime != null && previews && (
+              <div className="map-hover-preview">
+                <SpriteThumbnail previews={previews} time={mapHoverTime} />
+              </div>
+            )}
           </div>
 
           {/* --- Inference Panel --- */}
           <div className="inference-panel">
             <h3>Inference</h3>
             <button
-              onClick={handleRunInference}
+              onClick={() => handleRunInference()}
               disabled={inferenceStatus === "running"}
               className="inference-button"
             >
@@ -229,10 +316,22 @@ export default function App() {
                 ? "Running Inference..."
                 : "Run Inference + Heatmap"}
             </button>
+            {(videoData.segments?.length > 0 || videoData.gps_points?.length > 0) && (
+              <button
+                onClick={() => handleRunInference("sparse=true")}
+                disabled={inferenceStatus === "running"}
+                className="inference-button"
+              >
+                Color Map Only (fast)
+              </button>
+            )}
 
             {inferenceStatus === "running" && (
               <div className="progress-container">
-                <div className="progress-label">Processing...</div>
+                <div className="progress-label">
+                  Processing...
+                  {eta != null && ` ~${Math.ceil(eta)}s left`}
+                </div>
                 <div className="progress-bar">
                   <div
                     className="progress-fill"
@@ -270,6 +369,19 @@ export default function App() {
                       Generated at:{" "}
                       {new Date(inf.created_at).toLocaleString()}
                     </div>
+                    {inf.inference_profile && inf.inference_profile !== "default" && (
+                      <div className="inference-timestamp">
+                        Profile: {inf.inference_profile}
+                      </div>
+                    )}
+                    {inf.cascade && (
+                      <div className="inference-timestamp">
+                        Cascade: {(inf.cascade.escalated_fraction * 100).toFixed(1)}% of frames
+                        escalated
+                        {inf.cascade.label_agreement != null &&
+                          `, ${(inf.cascade.label_agreement * 100).toFixed(1)}% label agreement`}
+                      </div>
+                    )}
                   </li>
                 ))}
               </ul>
@@ -0,0 +1,128 @@
+import { useEffect, useRef } from "react";
+
+// Frames fetched per request; chunks are cached for the lifetime of the component.
+// On-demand chunks are computed by the server, so they are kept short.
+const CHUNK_FRAMES = 300;
+const ON_DEMAND_CHUNK_FRAMES = 30;
+
+// 256-entry JET lookup table (matches cv2.COLORMAP_JET used for heatmap videos)
+const JET = (() => {
+  const lut = new Uint8ClampedArray(256 * 3);
+  const clamp = (v) => Math.max(0, Math.min(1, v));
+  for (let i = 0; i < 256; i++) {
+    const x = i / 255;
+    lut[i * 3] = 255 * clamp(1.5 - Math.abs(4 * x - 3));
+    lut[i * 3 + 1] = 255 * clamp(1.5 - Math.abs(4 * x - 2));
+    lut[i * 3 + 2] = 255 * clamp(1.5 - Math.abs(4 * x - 1));
+  }
+  return lut;
+})();
+
+/**
+ * Composites stored low-resolution Grad-CAM maps over a playing video.
+ * Each frame's CAM is color-mapped at native size and upscaled by the
+ * browser (bilinear) onto a canvas stacked on top of the <video>.
+ * With onDemand, maps come from /gradcam, computed for the chunks watched.
+ */
+export default function CamOverlay({ videoRef, videoId, onDemand = false }) {
+  const canvasRef = useRef(null);
+
+  useEffect(() => {
+    const chunkFrames = onDemand ? ON_DEMAND_CHUNK_FRAMES : CHUNK_FRAMES;
+    const endpoint = onDemand ? "gradcam" : "cams";
+    const chunks = new Map(); // chunk index -> {start, data, h, w} | "loading"
+    let fps = null;
+    let metaLoading = false;
+    let total = Infinity;
+    let frameId;
+    let cancelled = false;
+
+    const small = document.createElement("canvas");
+    const smallCtx = small.getContext("2d");
+
+    const fetchCams = async (query) => {
+      const res = await fetch(`http://localhost:8000/api/videos/${videoId}/${endpoint}?${query}`);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const [, h, w] = res.headers.get("X-Cam-Shape").split(",").map(Number);
+      fps = Number(res.headers.get("X-Cam-Fps"));
+      total = Number(res.headers.get("X-Cam-Total-Frames"));
+      return { data: new Uint8Array(await res.arrayBuffer()), h, w };
+    };
+
+    const loadChunk = async (index) => {
+      chunks.set(index, "loading");
+      const start = index * chunkFrames;
+      try {
+        const chunk = await fetchCams(`start=${start}&end=${start + chunkFrames}`);
+        if (!cancelled) chunks.set(index, { start, ...chunk });
+      } catch (err) {
+        console.error("Failed to fetch CAMs:", err);
+      }
+    };
+
+    // On demand, the frame rate comes with the first map: ask for the frame on screen
+    const loadMeta = async (time) => {
+      metaLoading = true;
+      try {
+        await fetchCams(`start_time=${time}`);
+      } catch (err) {
+        console.error("Failed to fetch CAMs:", err);
+      }
+    };
+
+    const draw = () => {
+      frameId = requestAnimationFrame(draw);
+      const video = videoRef.current;
+      const canvas = canvasRef.current;
+      if (!video || !canvas) return;
+      if (onDemand && !fps) {
+        if (!metaLoading) loadMeta(video.currentTime);
+        return;
+      }
+
+      const frame = fps ? Math.min(Math.floor(video.currentTime * fps), total - 1) : 0;
+      const index = Math.floor(frame / chunkFrames);
+      const chunk = chunks.get(index);
+      if (chunk === undefined) {
+        loadChunk(index);
+        return;
+      }
+      if (chunk === "loading") return;
+      // Prefetch the next chunk before playback reaches it
+      const next = index + 1;
+      if (frame % chunkFrames > chunkFrames / 2 && next * chunkFrames < total && !chunks.has(next)) {
+        loadChunk(next);
+      }
+
+      const { data, h, w } = chunk;
+      const offset = (frame - chunk.start) * h * w;
+      if (offset < 0 || offset + h * w > data.length) return;
+
+      small.width = w;
+      small.height = h;
+      const image = smallCtx.createImageData(w, h);
+      for (let i = 0; i < h * w; i++) {
+        const v = data[offset + i];
+        image.data[i * 4] = JET[v * 3];
+        image.data[i * 4 + 1] = JET[v * 3 + 1];
+        image.data[i * 4 + 2] = JET[v * 3 + 2];
+        image.data[i * 4 + 3] = 255;
+      }
+      smallCtx.putImageData(image, 0, 0);
+
+      canvas.width = video.clientWidth;
+      canvas.height = video.clientHeight;
+      const ctx = canvas.getContext("2d");
+      ctx.imageSmoothingEnabled = true;
+      ctx.drawImage(small, 0, 0, canvas.width, canvas.height);
+    };
+
+    frameId = requestAnimationFrame(draw);
+    return () => {
+      cancelled = true;
+      cancelAnimationFrame(frameId);
+    };
+  }, [videoId, videoRef, onDemand]);
+
+  return <canvas ref={canvasRef} className="heatmap-video-overlay" />;
+}
@@ -0,0 +1,64 @@
+import React, { useState } from "react";
+
+const formatTime = (t) =>
+  `${Math.floor(t / 60)}:${String(Math.floor(t % 60)).padStart(2, "0")}`;
+
+/**
+ * One thumbnail cut out of the scrubbing sprite sheets
+ * (manifest from /api/videos/{id}/previews).
+ */
+export function SpriteThumbnail({ previews, time }) {
+  if (!previews?.count || time == null) return null;
+  const index = Math.min(previews.count - 1, Math.max(0, Math.floor(time / previews.interval)));
+  const perSheet = previews.columns * previews.rows;
+  const pos = index % perSheet;
+  const x = (pos % previews.columns) * previews.tile_width;
+  const y = Math.floor(pos / previews.columns) * previews.tile_height;
+  return (
+    <div
+      className="sprite-thumbnail"
+      style={{
+        width: previews.tile_width,
+        height: previews.tile_height,
+        backgroundImage: `url(http://localhost:8000/${previews.sheets[Math.floor(index / perSheet)]})`,
+        backgroundPosition: `-${x}px -${y}px`,
+      }}
+    />
+  );
+}
+
+/**
+ * Timeline under the video: hovering previews that moment from the sprite
+ * sheets, clicking seeks. The full-resolution video is never touched.
+ */
+export default function ScrubPreview({ previews, currentTime, onSeek }) {
+  const [hover, setHover] = useState(null); // {time, x}
+  const duration = previews?.duration;
+  if (!duration) return null;
+
+  const positionAt = (e) => {
+    const rect = e.currentTarget.getBoundingClientRect();
+    const x = Math.min(rect.width, Math.max(0, e.clientX - rect.left));
+    return { time: (x / rect.width) * duration, x };
+  };
+
+  return (
+    <div
+      className="scrub-bar"
+      onMouseMove={(e) => setHover(positionAt(e))}
+      onMouseLeave={() => setHover(null)}
+      onClick={(e) => onSeek(positionAt(e).time)}
+    >
+      <div
+        className="scrub-progress"
+        style={{ width: `${Math.min(100, (currentTime / duration) * 100)}%` }}
+      />
+      {hover && (
+        <div className="scrub-tooltip" style={{ left: hover.x }}>
+          <SpriteThumbnail previews={previews} time={hover.time} />
+          <div className="scrub-time">{formatTime(hover.time)}</div>
+        </div>
+      )}
+    </div>
+  );
+}
@@ -1,6 +1,19 @@
-import React, { useEffect, useRef } from 'react';
+import React, { useEffect, useMemo, useRef } from 'react';
+
+// Flatten simplified segments ([lat, lon, timestamp] vertices) back into points
+// for marker interpolation and click-to-seek. Boundary vertices are shared.
+function pointsFromSegments(segments) {
+  const points = [];
+  segments.forEach((seg) => {
+    seg.path.forEach(([lat, lon, timestamp], i) => {
+      if (i === 0 && points.length > 0) return;
+      points.push({ lat, lon, timestamp, highlight: seg.highlight });
+    });
+  });
+  return points;
+}
 
-export default function VideoMap({ gpsPoints, currentTime, onSeek }) {
+export default function VideoMap({ gpsPoints: rawGpsPoints, segments, currentTime, onSeek, onHover }) {
   const containerRef = useRef(null);
   const mapRef = useRef(null);
   const markerRef = useRef(null);
@@ -8,6 +21,11 @@ export default function VideoMap({ gpsPoints, currentTime, onSeek }) {
   const clickListenerRef = useRef(null);
   const hasCenteredRef = useRef(false); // 👈 prevents re-centering every render
 
+  const gpsPoints = useMemo(
+    () => (segments ? pointsFromSegments(segments) : rawGpsPoints),
+    [segments, rawGpsPoints]
+  );
+
   // Initialize map ONCE
   useEffect(() => {
     if (!containerRef.current || mapRef.current) return;
@@ -47,8 +65,19 @@ export default function VideoMap({ gpsPoints, currentTime, onSeek }) {
       hasCenteredRef.current = true;
     }
 
-    // Draw polylines
-    if (gpsPoints.length > 1) {
+    // Draw polylines: one per run-length-merged segment when available
+    if (segments) {
+      polylinesRef.current = segments.map((seg) =>
+        new window.google.maps.Polyline({
+          path: seg.path.map(([lat, lon]) => ({ lat, lng: lon })),
+          geodesic: true,
+          strokeColor: seg.highlight ? 'green' : 'red',
+          strokeOpacity: 1.0,
+          strokeWeight: 5,
+          map: mapRef.current,
+        })
+      );
+    } else if (gpsPoints.length > 1) {
       polylinesRef.current = gpsPoints.slice(0, gpsPoints.length - 1).map((point, i) => {
         const next = gpsPoints[i + 1];
         return new window.google.maps.Polyline({
@@ -80,24 +109,32 @@ export default function VideoMap({ gpsPoints, currentTime, onSeek }) {
       content: markerDiv,
     });
 
-    // Add click-to-seek
-    clickListenerRef.current = mapRef.current.addListener('click', (e) => {
-      const clickedLat = e.latLng.lat();
-      const clickedLng = e.latLng.lng();
-
-      let nearestPoint = gpsPoints[0];
+    const nearestPoint = (latLng) => {
+      let nearest = gpsPoints[0];
       let minDist = Infinity;
       gpsPoints.forEach((point) => {
-        const dist = Math.hypot(point.lat - clickedLat, point.lon - clickedLng);
+        const dist = Math.hypot(point.lat - latLng.lat(), point.lon - latLng.lng());
         if (dist < minDist) {
           minDist = dist;
-          nearestPoint = point;
+          nearest = point;
         }
       });
+      return nearest;
+    };
 
-      if (onSeek) onSeek(nearestPoint.timestamp);
+    // Add click-to-seek
+    clickListenerRef.current = mapRef.current.addListener('click', (e) => {
+      if (onSeek) onSeek(nearestPoint(e.latLng).timestamp);
     });
 
+    // Hovering the track previews that moment (sprite thumbnails, no video seek)
+    if (onHover) {
+      polylinesRef.current.forEach((line) => {
+        line.addListener('mousemove', (e) => onHover(nearestPoint(e.latLng).timestamp));
+        line.addListener('mouseout', () => onHover(null));
+      });
+    }
+
     return () => {
       polylinesRef.current.forEach((p) => p.setMap(null));
       polylinesRef.current = [];
@@ -110,7 +147,7 @@ export default function VideoMap({ gpsPoints, currentTime, onSeek }) {
         clickListenerRef.current = null;
       }
     };
-  }, [gpsPoints, onSeek]);
+  }, [gpsPoints, segments, onSeek, onHover]);
 
   // ✅ Only move marker with time, never reset map
   useEffect(() => {
@@ -0,0 +1,31 @@
+import { useEffect } from "react";
+import Hls from "hls.js";
+
+const isPlaylist = (src) => Boolean(src && src.endsWith(".m3u8"));
+
+const playsHlsNatively = () =>
+  document.createElement("video").canPlayType("application/vnd.apple.mpegurl") !== "";
+
+// Safari plays HLS natively; other browsers go through hls.js (Media Source Extensions)
+export const canPlayHls = () => playsHlsNatively() || Hls.isSupported();
+
+/**
+ * Plays `src` in the <video> behind `videoRef`. HLS playlists the browser
+ * cannot play itself are loaded through hls.js, which also follows a stream
+ * that is still being written. Returns the value for the element's src
+ * attribute (undefined while hls.js feeds the element).
+ */
+export default function useHlsSource(videoRef, src) {
+  const viaHlsJs = isPlaylist(src) && !playsHlsNatively() && Hls.isSupported();
+
+  useEffect(() => {
+    const video = videoRef.current;
+    if (!viaHlsJs || !video) return;
+    const hls = new Hls();
+    hls.loadSource(src);
+    hls.attachMedia(video);
+    return () => hls.destroy();
+  }, [videoRef, src, viaHlsJs]);
+
+  return viaHlsJs ? undefined : src || "";
+}